@@ -1,10 +1,9 @@
+import hmac
 import os
-from flask import Flask, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
 from .database import db
 from .config import Config
 from .api.auth import auth_bp
@@ -13,17 +12,34 @@ from .api.questions import questions_bp
 from .api.candidates import candidates_bp
 from .api.results import results_bp
 from .api.test import test_bp
+from .api.diagnostics import admin_required, diagnostics_bp
+from .utils.autosave import autosave_buffer
+from .utils.cache import answer_key_cache, exam_payload_cache
+from .utils.compression import compressor
+from .utils.ratelimit import public_link_guard
+from .utils.identity import identity_cache
+from .utils.hashing import password_hasher
+from .utils.metrics import request_metrics, runtime_samples
+from .utils.profiler import request_profiler
+from .utils.slow_queries import slow_query_log
+from .utils.json_provider import get_json_provider_class
+from .utils.scheduler import attempt_scheduler
+from .utils.schema import check_schema_revision
+from .utils.shards import exam_shards
+from .utils.replica import read_replica
+from .utils.archive import result_archive
+from .utils.purge import exam_purger
+from .utils.rescore import exam_rescorer
 import logging
 
-# Load environment variables
-load_dotenv()
+# Environment variables are loaded from .env by app.config
 
 # Initialize extensions
-migrate = Migrate()
 jwt = JWTManager()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
 logger = logging.getLogger(__name__)
 
 def create_app(config_class=Config):
@@ -55,9 +71,21 @@ def create_app(config_class=Config):
     except OSError:
         pass
 
+    # Client addresses as seen by the trusted reverse proxies
+    if app.config.get('TRUSTED_PROXY_COUNT', 0) > 0:
+        proxies = app.config['TRUSTED_PROXY_COUNT']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+
+    # Use the configured JSON provider (datetimes are written as ISO 8601)
+    app.json = get_json_provider_class(app.config.get('JSON_PROVIDER', 'orjson'))(app)
+
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
+    exam_shards.init_app(app)
+    if not app.config.get('FAST_STARTUP'):
+        # Flask-Migrate (and Alembic) are only needed by the flask db commands
+        from flask_migrate import Migrate
+        Migrate(app, db)
     
     # Configure CORS to allow requests from GitHub Pages and localhost
     CORS(app, resources={r"/api/*": {"origins": [
@@ -67,10 +95,18 @@ def create_app(config_class=Config):
     ]}})
     
     jwt.init_app(app)
-    
-    # Setup logging
-    logging.basicConfig(level=logging.INFO,
-                       format='%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+    # Metrics first so its after_request hook runs last and sees compressed sizes
+    request_metrics.init_app(app)
+    request_metrics.add_collector(runtime_samples)
+    autosave_buffer.init_app(app)
+    exam_payload_cache.init_app(app)
+    answer_key_cache.init_app(app)
+    compressor.init_app(app)
+    public_link_guard.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+    request_profiler.init_app(app)
+    slow_query_log.init_app(app)
     
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -79,6 +115,7 @@ def create_app(config_class=Config):
     app.register_blueprint(candidates_bp, url_prefix='/api/candidates')
     app.register_blueprint(results_bp, url_prefix='/api/results')
     app.register_blueprint(test_bp, url_prefix='/api/test')
+    app.register_blueprint(diagnostics_bp, url_prefix='/api/diagnostics')
 
     # Setup error handlers
     @app.errorhandler(422)
@@ -104,9 +141,50 @@ def create_app(config_class=Config):
     @app.route('/api/ping', methods=['GET'])
     def ping():
         return jsonify({"status": "success", "message": "pong"})
+
+    def render_metrics():
+        return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics():
+        if not request_metrics.enabled:
+            return jsonify({"error": "Metrics are disabled"}), 404
+        # Scrapers send the configured token; without one only administrators may read them
+        token = app.config.get('METRICS_TOKEN')
+        if not token:
+            return admin_required(render_metrics)()
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+            return jsonify({"error": "Invalid metrics token"}), 401
+        return render_metrics()
     
-    # Create database tables
+    # Create database tables, or only check the migration revision when starting fast
+    # (SCHEMA_CHECK is off for init_db.py, which creates or upgrades the schema itself)
     with app.app_context():
-        db.create_all()
+        if app.config.get('FAST_STARTUP'):
+            if app.config.get('SCHEMA_CHECK', True):
+                check_schema_revision()
+        else:
+            db.create_all()
 
-    return app 
\ No newline at end of file
+    # Start the exam timer, the replica snapshots, the archiver and the purge once the tables exist
+    attempt_scheduler.init_app(app)
+    read_replica.init_app(app)
+    result_archive.init_app(app)
+    exam_purger.init_app(app)
+    exam_rescorer.init_app(app)
+
+    return app
+
+
+def after_fork(app):
+    """
+    Make an app created before forking (gunicorn --preload) safe to use in a worker.
+
+    Database connections opened by the parent are dropped without closing them,
+    and the extensions reset their locks and start their background threads.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+    for extension in list(app.extensions.values()):
+        if hasattr(extension, 'after_fork'):
+            extension.after_fork()
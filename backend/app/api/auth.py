@@ -1,6 +1,8 @@
 from flask import request, jsonify, Blueprint
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from ..models.user import User
+from ..utils.hashing import HasherBusy, password_hasher
+from ..utils.identity import identity_cache
 from .. import db
 import logging
 
@@ -64,9 +66,24 @@ def login():
     user = User.query.filter_by(email=data['email']).first()
     
     # Check if user exists and password is correct
-    if not user or not user.check_password(data['password']):
+    try:
+        valid = user is not None and user.check_password(data['password'])
+    except HasherBusy:
+        logger.warning("Login rejected: password hashing queue is full")
+        return jsonify({'error': 'Server is busy, please try again shortly'}), 503, {'Retry-After': '1'}
+    
+    if not valid:
         return jsonify({'error': 'Invalid email or password'}), 401
     
+    # Transparently upgrade hashes made with outdated parameters
+    if user.needs_rehash():
+        try:
+            user.password_hash = password_hasher.hash_async(data['password'])
+            db.session.commit()
+            identity_cache.invalidate_user(user.id)
+        except HasherBusy:
+            logger.info(f"Skipping password rehash for user ID {user.id}: hashing queue is full")
+    
     # Generate access token - ensure identity is a string
     user_id_str = str(user.id)
     logger.info(f"Creating token for user ID: {user_id_str} (type: {type(user_id_str)})")
@@ -90,13 +107,13 @@ def get_current_user():
     if isinstance(user_id, str) and user_id.isdigit():
         user_id = int(user_id)
     
-    user = User.query.get(user_id)
+    user = identity_cache.get_user(user_id)
     
     if not user:
         logger.warning(f"User not found with ID: {user_id}")
         return jsonify({'error': 'User not found'}), 404
     
-    return jsonify(user.to_dict()), 200
+    return jsonify(user), 200
 
 
 @auth_bp.route('/validate-token', methods=['GET'])
@@ -111,16 +128,16 @@ def validate_token():
         if isinstance(user_id, str) and user_id.isdigit():
             user_id = int(user_id)
         
-        user = User.query.get(user_id)
+        user = identity_cache.get_user(user_id)
         
         if not user:
             logger.warning(f"Token validation failed: User not found with ID {user_id}")
             return jsonify({'valid': False, 'error': 'User not found'}), 404
             
-        logger.info(f"Token validation successful for user: {user.username}")
+        logger.info(f"Token validation successful for user: {user['username']}")
         return jsonify({
             'valid': True,
-            'user': user.to_dict()
+            'user': user
         }), 200
     except Exception as e:
         logger.error(f"Token validation error: {str(e)}")
@@ -1,15 +1,46 @@
-from flask import request, jsonify, Blueprint
+from flask import request, jsonify, Blueprint, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models.candidate import Candidate
 from ..models.exam import Exam
-from ..models.result import Result
+from ..utils.autosave import autosave_buffer, load_drafts
+from ..utils.cache import answer_key_cache, exam_payload_cache
+from ..utils.compression import compressor, gzip_splice
+from ..utils.dto import CandidateRow, exam_titles
+from ..utils.http_cache import not_modified, add_validators
+from ..utils.identity import identity_cache
+from .diagnostics import admin_required
+from ..utils.grading import record_submission
+from ..utils.purge import delete_candidate_rows
+from ..utils.links import is_signed_link, sign_link, verify_link
+from ..utils.ratelimit import public_link_guard
+from ..utils.replica import read_replica
+from ..utils.scheduler import attempt_scheduler, attempt_deadline
+from ..utils.shards import exam_shards, shard_of
 from .. import db
-import uuid
+from ..database import commit_keep_loaded
 from datetime import datetime
 
 # Create candidates blueprint
 candidates_bp = Blueprint('candidates', __name__)
 
+# Unauthenticated endpoints that take a candidate link
+PUBLIC_LINK_ENDPOINTS = {'access_exam', 'submit_exam', 'autosave_answers', 'resume_exam'}
+
+
+@candidates_bp.before_request
+def guard_public_links():
+    """Rate limit public link endpoints and reject recently seen invalid links."""
+    if request.endpoint is None or request.endpoint.rsplit('.', 1)[-1] not in PUBLIC_LINK_ENDPOINTS:
+        return None
+    return public_link_guard.check(request.view_args['unique_link'])
+
+
+@candidates_bp.route('/guard/stats', methods=['GET'])
+@admin_required
+def get_guard_stats():
+    """Get rejection counters of the public link guard."""
+    return jsonify(public_link_guard.stats()), 200
+
 @candidates_bp.route('', methods=['POST'])
 @jwt_required()
 def create_candidate():
@@ -24,11 +55,11 @@ def create_candidate():
             return jsonify({'error': 'Missing required field: exam_id'}), 400
         
         # Check if exam exists and belongs to user
-        exam = Exam.query.filter_by(id=data['exam_id'], creator_id=user_id).first()
-        if not exam:
+        if not identity_cache.owns_exam(user_id, data['exam_id']):
             return jsonify({'error': 'Exam not found or access denied'}), 404
         
         # Process each email
+        session = exam_shards.session(data['exam_id'], create=True)
         created_candidates = []
         failed_emails = []
         
@@ -41,10 +72,7 @@ def create_candidate():
             
             try:
                 # Check if candidate with this email already exists for this exam
-                existing_candidate = Candidate.query.filter_by(
-                    email=email,
-                    exam_id=data['exam_id']
-                ).first()
+                existing_candidate = _find_by_email(data['exam_id'], email)
                 
                 if existing_candidate:
                     failed_emails.append({
@@ -57,7 +85,7 @@ def create_candidate():
                 name = email.split('@')[0]
                 
                 # Generate unique link
-                unique_link = str(uuid.uuid4())
+                unique_link = exam_shards.new_link(data['exam_id'])
                 
                 # Create new candidate
                 candidate = Candidate(
@@ -73,7 +101,8 @@ def create_candidate():
                     candidate.invitation_sent = True
                     candidate.last_invited_at = datetime.utcnow()
                 
-                db.session.add(candidate)
+                session.add(candidate)
+                _issue_link(session, candidate)
                 created_candidates.append(candidate)
                 
             except Exception as e:
@@ -83,10 +112,11 @@ def create_candidate():
                 })
         
         # Commit all changes in one transaction
-        db.session.commit()
+        commit_keep_loaded(session)
         
         # Convert candidates to dictionaries for response
-        candidates_dict = [candidate.to_dict() for candidate in created_candidates]
+        exam_title = exam_titles(db.session, [data['exam_id']]).get(data['exam_id'])
+        candidates_dict = [candidate.to_dict(exam_title=exam_title) for candidate in created_candidates]
         
         return jsonify({
             'message': f'Created {len(created_candidates)} candidates ({len(failed_emails)} failed)',
@@ -102,21 +132,17 @@ def create_candidate():
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
         # Check if exam exists and belongs to user
-        exam = Exam.query.filter_by(id=data['exam_id'], creator_id=user_id).first()
-        if not exam:
+        if not identity_cache.owns_exam(user_id, data['exam_id']):
             return jsonify({'error': 'Exam not found or access denied'}), 404
         
         # Check if candidate with this email already exists for this exam
-        existing_candidate = Candidate.query.filter_by(
-            email=data['email'],
-            exam_id=data['exam_id']
-        ).first()
+        existing_candidate = _find_by_email(data['exam_id'], data['email'])
         
         if existing_candidate:
             return jsonify({'error': 'A candidate with this email already exists for this exam'}), 400
         
         # Generate unique link
-        unique_link = str(uuid.uuid4())
+        unique_link = exam_shards.new_link(data['exam_id'])
         
         # Create new candidate
         candidate = Candidate(
@@ -132,13 +158,15 @@ def create_candidate():
             candidate.invitation_sent = True
             candidate.last_invited_at = datetime.utcnow()
         
-        db.session.add(candidate)
-        db.session.commit()
+        session = exam_shards.session(data['exam_id'], create=True)
+        session.add(candidate)
+        _issue_link(session, candidate)
+        commit_keep_loaded(session)
         
         return jsonify({
             'message': 'Candidate created successfully',
             'candidate': candidate.to_dict(),
-            'unique_link': f"/exam/{unique_link}"
+            'unique_link': f"/exam/{candidate.unique_link}"
         }), 201
 
 
@@ -148,13 +176,10 @@ def get_candidate(candidate_id):
     """Get a specific candidate."""
     user_id = get_jwt_identity()
     
-    # Join Candidate with Exam to check permissions
-    candidate = Candidate.query.join(Exam).filter(
-        Candidate.id == candidate_id,
-        Exam.creator_id == user_id
-    ).first()
+    # Check permissions through the cached exam owner
+    candidate = exam_shards.session_for_id(candidate_id).get(Candidate, candidate_id)
     
-    if not candidate:
+    if not candidate or not identity_cache.owns_exam(user_id, candidate.exam_id):
         return jsonify({'error': 'Candidate not found or access denied'}), 404
     
     return jsonify(candidate.to_dict()), 200
@@ -167,9 +192,13 @@ def get_candidates():
     user_id = get_jwt_identity()
     
     # Get all candidates across all exams owned by the user
-    candidates = Candidate.query.join(Exam).filter(Exam.creator_id == user_id).all()
+    replica = read_replica.session()
+    titles = dict(replica.query(Exam.id, Exam.title).filter(Exam.creator_id == user_id, Exam.deleted_at.is_(None)))
+    candidates = exam_shards.fan_out(
+        titles, lambda session: CandidateRow.load(session, Candidate.exam_id.in_(titles), titles=titles), main=replica
+    )
     
-    return jsonify([candidate.to_dict() for candidate in candidates]), 200
+    return jsonify(candidates), 200
 
 
 @candidates_bp.route('/exams/<int:exam_id>/candidates', methods=['GET'])
@@ -179,12 +208,15 @@ def get_exam_candidates(exam_id):
     user_id = get_jwt_identity()
     
     # Check if exam exists and belongs to user
-    exam = Exam.query.filter_by(id=exam_id, creator_id=user_id).first()
-    if not exam:
+    if not identity_cache.owns_exam(user_id, exam_id):
         return jsonify({'error': 'Exam not found or access denied'}), 404
     
-    candidates = Candidate.query.filter_by(exam_id=exam_id).all()
-    return jsonify([candidate.to_dict() for candidate in candidates]), 200
+    replica = read_replica.session()
+    titles = exam_titles(replica, [exam_id])
+    candidates = exam_shards.fan_out(
+        [exam_id], lambda session: CandidateRow.load(session, Candidate.exam_id == exam_id, titles=titles), main=replica
+    )
+    return jsonify(candidates), 200
 
 
 @candidates_bp.route('/<int:candidate_id>', methods=['DELETE'])
@@ -193,17 +225,19 @@ def delete_candidate(candidate_id):
     """Delete a candidate."""
     user_id = get_jwt_identity()
     
-    # Join Candidate with Exam to check permissions
-    candidate = Candidate.query.join(Exam).filter(
-        Candidate.id == candidate_id,
-        Exam.creator_id == user_id
-    ).first()
+    # Check permissions through the cached exam owner
+    session = exam_shards.session_for_id(candidate_id)
+    candidate = session.get(Candidate, candidate_id)
     
-    if not candidate:
+    if not candidate or not identity_cache.owns_exam(user_id, candidate.exam_id):
         return jsonify({'error': 'Candidate not found or access denied'}), 404
     
-    db.session.delete(candidate)
-    db.session.commit()
+    # Set-based deletes of the candidate's result, answers and drafts instead of loading them
+    delete_candidate_rows(session, candidate_id)
+    session.commit()
+    if session is not db.session:
+        db.session.commit()
+    autosave_buffer.pop(candidate_id)
     
     return jsonify({'message': 'Candidate deleted successfully'}), 200
 
@@ -214,22 +248,20 @@ def send_invitation(candidate_id):
     """Send or resend an invitation to a candidate."""
     user_id = get_jwt_identity()
     
-    # Join Candidate with Exam to check permissions
-    candidate = Candidate.query.join(Exam).filter(
-        Candidate.id == candidate_id,
-        Exam.creator_id == user_id
-    ).first()
+    # Check permissions through the cached exam owner
+    session = exam_shards.session_for_id(candidate_id)
+    candidate = session.get(Candidate, candidate_id)
     
-    if not candidate:
+    if not candidate or not identity_cache.owns_exam(user_id, candidate.exam_id):
         return jsonify({'error': 'Candidate not found or access denied'}), 404
     
     # If the candidate doesn't have a unique link, generate one
     if not candidate.unique_link:
-        candidate.unique_link = str(uuid.uuid4())
+        candidate.unique_link = exam_shards.new_link(candidate.exam_id)
     
     # Update invitation timestamp
     candidate.last_invited_at = datetime.utcnow()
-    db.session.commit()
+    commit_keep_loaded(session)
     
     # In a real application, you would send an email here
     # For this example, we'll just return the link
@@ -241,111 +273,196 @@ def send_invitation(candidate_id):
     }), 200
 
 
+@candidates_bp.route('/<int:candidate_id>/reissue-link', methods=['POST'])
+@jwt_required()
+def reissue_link(candidate_id):
+    """Give a candidate a new link, revoking the old one (e.g. after it leaked)."""
+    user_id = get_jwt_identity()
+    
+    # Check permissions through the cached exam owner
+    session = exam_shards.session_for_id(candidate_id)
+    candidate = session.get(Candidate, candidate_id)
+    
+    if not candidate or not identity_cache.owns_exam(user_id, candidate.exam_id):
+        return jsonify({'error': 'Candidate not found or access denied'}), 404
+    
+    _reissue_link(candidate)
+    candidate.updated_at = datetime.utcnow()
+    commit_keep_loaded(session)
+    
+    return jsonify({
+        'message': 'Link reissued successfully',
+        'candidate': candidate.to_dict(),
+        'unique_link': f"/exam/{candidate.unique_link}"
+    }), 200
+
+
+def _find_by_email(exam_id, email):
+    """Return a candidate of an exam by email, looking in every database that can hold it."""
+    candidates = exam_shards.fan_out(
+        [exam_id], lambda session: session.query(Candidate).filter_by(email=email, exam_id=exam_id).limit(1).all()
+    )
+    return candidates[0] if candidates else None
+
+
+def _find_candidate(session, unique_link):
+    """Resolve a candidate link, rejecting forged signed links without a query."""
+    candidate = _lookup_candidate(session, unique_link)
+    if candidate is None:
+        public_link_guard.remember_invalid(unique_link)
+    return candidate
+
+
+def _lookup_candidate(session, unique_link):
+    if is_signed_link(unique_link):
+        ids = verify_link(unique_link)
+        if ids is None:
+            return None
+        
+        # The signature proves the ids, so a primary key lookup is enough; the
+        # link version and the stored link must still match so reissued links revoke old ones
+        candidate = session.get(Candidate, ids[0])
+        if (not candidate or candidate.exam_id != ids[1] or candidate.link_version != ids[2]
+                or candidate.unique_link != unique_link):
+            return None
+        return candidate
+    
+    return session.query(Candidate).filter_by(unique_link=unique_link).first()
+
+
+def _issue_link(session, candidate):
+    """Give a new candidate a signed link if signed links are enabled."""
+    if current_app.config.get('SIGNED_LINKS'):
+        session.flush()
+        candidate.unique_link = sign_link(candidate.id, candidate.exam_id, candidate.link_version)
+
+
+def _reissue_link(candidate):
+    """Replace a candidate's link, revoking the old one."""
+    candidate.link_version += 1
+    if is_signed_link(candidate.unique_link):
+        candidate.unique_link = sign_link(candidate.id, candidate.exam_id, candidate.link_version)
+    else:
+        candidate.unique_link = exam_shards.new_link(candidate.exam_id)
+
+
+# The public views below are split into a lookup and a body taking the
+# session, so the async views in candidates_async run the same code
+
 @candidates_bp.route('/access/<string:unique_link>', methods=['GET'])
 def access_exam(unique_link):
     """Access an exam using a unique link."""
-    candidate = Candidate.query.filter_by(unique_link=unique_link).first()
+    session = exam_shards.session_for_link(unique_link)
+    candidate = _find_candidate(session, unique_link)
     
     if not candidate:
         return jsonify({'error': 'Invalid exam link'}), 404
     
+    return _access_exam(session, candidate, exam_payload_cache.get_entry(candidate.exam_id))
+
+
+def _access_exam(session, candidate, entry):
+    error = _start_attempt(session, candidate, entry)
+    return error if error is not None else _access_response(candidate, entry)
+
+
+def _start_attempt(session, candidate, entry):
     # Check if the exam is active
-    exam = Exam.query.get(candidate.exam_id)
-    if not exam or not exam.is_active:
+    exam = entry.data if entry else None
+    if not exam or not exam['is_active']:
         return jsonify({'error': 'This exam is not active'}), 403
     
     # Check if the candidate has already completed the test
     if candidate.is_test_completed:
         return jsonify({'error': 'You have already completed this exam'}), 403
     
+    # Close attempts that ran out of time but were not auto-submitted yet
+    if attempt_scheduler.is_expired(candidate.test_start_time, exam['duration_minutes']):
+        _expire_attempt(session, candidate, exam['duration_minutes'])
+        return jsonify({'error': 'The time limit for this exam has expired'}), 403
+    
     # If this is the first access, set the start time
     if not candidate.test_start_time:
         candidate.test_start_time = datetime.utcnow()
-        db.session.commit()
-    
-    return jsonify({
-        'message': 'Exam access granted',
-        'exam': exam.to_dict(include_questions=True),
-        'candidate': candidate.to_dict()
-    }), 200
+        commit_keep_loaded(session)
+        attempt_scheduler.schedule(candidate.id, attempt_deadline(candidate.test_start_time, exam['duration_minutes']))
+    return None
+
+
+def _access_response(candidate, entry):
+    # No database access, so the async view builds it in a thread
+    exam = entry.data
+    
+    # The payload only changes with the exam version or the candidate row
+    etag = f"access-{candidate.id}-v{exam['version']}-{candidate.updated_at.strftime('%Y%m%d%H%M%S%f')}"
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+    
+    # Splice the cached exam JSON (and its precompressed form) into the
+    # response so only the small candidate part is encoded per request
+    prefix = b'{"message":"Exam access granted","exam":'
+    suffix = b',"candidate":' + current_app.json.dumps(candidate.to_dict(exam_title=exam['title'])).encode('utf-8') + b'}'
+    if compressor.accepts_gzip():
+        body = gzip_splice([(prefix, None), (entry.json, entry.deflated(compressor.level)), (suffix, None)], compressor.level)
+        response = current_app.response_class(body, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+    else:
+        response = current_app.response_class(prefix + entry.json + suffix, mimetype='application/json')
+    return add_validators(response, etag), 200
+
+
+def _expire_attempt(session, candidate, duration_minutes):
+    """Auto-submit an attempt from its drafts once its time limit has passed."""
+    deadline = attempt_deadline(candidate.test_start_time, duration_minutes)
+    attempt_scheduler.discard(candidate.id)
+    attempt_scheduler.finalize([(candidate.id, deadline)], session=session)
 
 
 @candidates_bp.route('/submit/<string:unique_link>', methods=['POST'])
 def submit_exam(unique_link):
     """Submit exam answers and process results."""
-    candidate = Candidate.query.filter_by(unique_link=unique_link).first()
+    session = exam_shards.session_for_link(unique_link)
+    candidate = _find_candidate(session, unique_link)
     
     if not candidate:
         return jsonify({'error': 'Invalid exam link'}), 404
     
+    return _submit_exam(session, candidate, request.get_json())
+
+
+def _submit_exam(session, candidate, data):
     # Check if the candidate has already completed the test
     if candidate.is_test_completed:
         return jsonify({'error': 'You have already completed this exam'}), 403
     
-    # Get the exam
-    exam = Exam.query.get(candidate.exam_id)
+    # Get the exam's answer key
+    exam = answer_key_cache.get_key(candidate.exam_id, session)
     if not exam:
         return jsonify({'error': 'Exam not found'}), 404
     
+    # Reject submissions that arrive after the time limit plus grace period
+    if attempt_scheduler.is_expired(candidate.test_start_time, exam.duration_minutes):
+        _expire_attempt(session, candidate, exam.duration_minutes)
+        return jsonify({'error': 'The time limit for this exam has expired'}), 403
+    
     # Process submitted answers
-    data = request.get_json()
     if 'answers' not in data:
         return jsonify({'error': 'No answers provided'}), 400
     
-    # Calculate score
-    total_points = 0
-    earned_points = 0
-    
-    for question in exam.questions:
-        total_points += question.points
-        
-        # Check if the question was answered
-        if str(question.id) in data['answers']:
-            answer = data['answers'][str(question.id)]
-            
-            # Process answer based on question type
-            if question.question_type == 'multiple_choice':
-                # For multiple choice, check if selected options match correct options
-                correct_options = [opt.id for opt in question.options if opt.is_correct]
-                if set(answer) == set(correct_options):
-                    earned_points += question.points
-            elif question.question_type == 'single_choice':
-                # For single choice, check if selected option is correct
-                for option in question.options:
-                    if option.id == answer and option.is_correct:
-                        earned_points += question.points
-                        break
-            elif question.question_type == 'true_false':
-                # For true/false, check if answer matches correct option
-                correct_option = next((opt.id for opt in question.options if opt.is_correct), None)
-                if answer == correct_option:
-                    earned_points += question.points
-            elif question.question_type == 'text':
-                # For text questions, store the answer for manual review
-                # We won't automatically score text questions
-                pass
-    
-    # Calculate percentage score
-    percentage_score = (earned_points / total_points * 100) if total_points > 0 else 0
-    
-    # Determine if passed based on exam's passing score
-    passed = percentage_score >= exam.passing_score
-    
-    # Create a result record
-    result = Result(
-        candidate_id=candidate.id,
-        exam_id=exam.id,
-        score=percentage_score,
-        passed=passed,
-        answers=data['answers']
-    )
+    # Start from the autosaved drafts (including unflushed ones) and let the
+    # submitted answers win
+    answers = load_drafts(candidate.id, session, drain=True)
+    answers.update(data['answers'])
     
-    # Update candidate record
-    candidate.is_test_completed = True
-    candidate.test_end_time = datetime.utcnow()
+    result = record_submission(candidate, exam, answers, session=session)
+    if result is None:
+        session.rollback()
+        return jsonify({'error': 'You have already completed this exam'}), 403
     
-    db.session.add(result)
-    db.session.commit()
+    commit_keep_loaded(session)
+    attempt_scheduler.discard(candidate.id)
     
     return jsonify({
         'message': 'Exam submitted successfully',
@@ -353,6 +470,62 @@ def submit_exam(unique_link):
     }), 200
 
 
+@candidates_bp.route('/autosave/<string:unique_link>', methods=['PUT'])
+def autosave_answers(unique_link):
+    """Buffer draft answers for an exam in progress."""
+    session = exam_shards.session_for_link(unique_link)
+    candidate = _find_candidate(session, unique_link)
+    
+    if not candidate:
+        return jsonify({'error': 'Invalid exam link'}), 404
+    
+    return _autosave_answers(session, candidate, request.get_json())
+
+
+def _autosave_answers(session, candidate, data):
+    if candidate.is_test_completed:
+        return jsonify({'error': 'You have already completed this exam'}), 403
+    
+    if not data or not isinstance(data.get('answers'), dict):
+        return jsonify({'error': 'No answers provided'}), 400
+    
+    exam = answer_key_cache.get_key(candidate.exam_id, session)
+    if not exam:
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    try:
+        autosave_buffer.put(candidate.id, data['answers'], {question.id for question in exam.questions})
+    except ValueError:
+        return jsonify({'error': 'Answers must be keyed by the ids of the questions of the exam'}), 400
+    
+    return jsonify({
+        'message': 'Answers saved',
+        'saved': len(data['answers'])
+    }), 202
+
+
+@candidates_bp.route('/resume/<string:unique_link>', methods=['GET'])
+def resume_exam(unique_link):
+    """Return the saved draft answers for an exam in progress."""
+    session = exam_shards.session_for_link(unique_link)
+    candidate = _find_candidate(session, unique_link)
+    
+    if not candidate:
+        return jsonify({'error': 'Invalid exam link'}), 404
+    
+    return _resume_exam(session, candidate)
+
+
+def _resume_exam(session, candidate):
+    if candidate.is_test_completed:
+        return jsonify({'error': 'You have already completed this exam'}), 403
+    
+    return jsonify({
+        'answers': load_drafts(candidate.id, session),
+        'test_start_time': candidate.test_start_time
+    }), 200
+
+
 @candidates_bp.route('/<int:candidate_id>', methods=['PUT'])
 @jwt_required()
 def update_candidate(candidate_id):
@@ -360,21 +533,16 @@ def update_candidate(candidate_id):
     user_id = get_jwt_identity()
     data = request.get_json()
     
-    # Join Candidate with Exam to check permissions
-    candidate = Candidate.query.join(Exam).filter(
-        Candidate.id == candidate_id,
-        Exam.creator_id == user_id
-    ).first()
+    # Check permissions through the cached exam owner
+    session = exam_shards.session_for_id(candidate_id)
+    candidate = session.get(Candidate, candidate_id)
     
-    if not candidate:
+    if not candidate or not identity_cache.owns_exam(user_id, candidate.exam_id):
         return jsonify({'error': 'Candidate not found or access denied'}), 404
     
     # Check if email has changed and if it's already taken
     if 'email' in data and data['email'] != candidate.email:
-        existing_candidate = Candidate.query.filter_by(
-            email=data['email'],
-            exam_id=candidate.exam_id
-        ).first()
+        existing_candidate = _find_by_email(candidate.exam_id, data['email'])
         
         if existing_candidate and existing_candidate.id != candidate_id:
             return jsonify({'error': 'A candidate with this email already exists for this exam'}), 400
@@ -389,11 +557,18 @@ def update_candidate(candidate_id):
     # Update exam if provided
     if 'exam_id' in data:
         # Verify the exam belongs to the user
-        new_exam = Exam.query.filter_by(id=data['exam_id'], creator_id=user_id).first()
-        if not new_exam:
+        if not identity_cache.owns_exam(user_id, data['exam_id']):
             return jsonify({'error': 'Exam not found or access denied'}), 404
         
+        # A sharded candidate's rows live in the shard of its exam
+        if shard_of(candidate.id) is not None and data['exam_id'] != candidate.exam_id:
+            return jsonify({'error': 'Candidates cannot be moved to another exam, create a new candidate instead'}), 400
+        
         candidate.exam_id = data['exam_id']
+        
+        # Signed links encode the exam, so they have to be reissued
+        if is_signed_link(candidate.unique_link):
+            _reissue_link(candidate)
     
     # Handle invitation status
     if 'send_invitation' in data and data['send_invitation']:
@@ -401,7 +576,7 @@ def update_candidate(candidate_id):
         candidate.last_invited_at = datetime.utcnow()
     
     candidate.updated_at = datetime.utcnow()
-    db.session.commit()
+    commit_keep_loaded(session)
     
     return jsonify({
         'message': 'Candidate updated successfully',
@@ -0,0 +1,70 @@
+import asyncio
+from flask import request, jsonify
+from ..utils.async_db import async_db
+from ..utils.cache import exam_payload_cache
+from ..utils.shards import exam_shards
+from .candidates import (_find_candidate, _start_attempt, _access_response, _submit_exam, _autosave_answers,
+                         _resume_exam)
+
+# Async versions of the public candidate views, keyed by the endpoint they
+# replace when the app is served by app.asgi; the sync views stay registered
+# for WSGI servers and the routing
+ASYNC_VIEWS = {}
+
+
+def async_view(endpoint):
+    """Register a coroutine as the async version of a blueprint endpoint."""
+    def decorator(view):
+        ASYNC_VIEWS[endpoint] = view
+        return view
+    return decorator
+
+
+@async_view('candidates.access_exam')
+async def access_exam(unique_link):
+    """Access an exam using a unique link."""
+    async with async_db.session(exam_shards.link_exam(unique_link)) as session:
+        candidate = await session.run_sync(_find_candidate, unique_link)
+        if not candidate:
+            return jsonify({'error': 'Invalid exam link'}), 404
+
+        entry = await exam_payload_cache.get_entry_async(candidate.exam_id, session, async_db.session)
+        error = await session.run_sync(_start_attempt, candidate, entry)
+    if error is not None:
+        return error
+
+    # Encoding and compressing the payload is CPU work, kept off the event loop
+    return await asyncio.to_thread(_access_response, candidate, entry)
+
+
+@async_view('candidates.submit_exam')
+async def submit_exam(unique_link):
+    """Submit exam answers and process results."""
+    async with async_db.session(exam_shards.link_exam(unique_link)) as session:
+        candidate = await session.run_sync(_find_candidate, unique_link)
+        if not candidate:
+            return jsonify({'error': 'Invalid exam link'}), 404
+
+        return await session.run_sync(_submit_exam, candidate, request.get_json())
+
+
+@async_view('candidates.autosave_answers')
+async def autosave_answers(unique_link):
+    """Buffer draft answers for an exam in progress."""
+    async with async_db.session(exam_shards.link_exam(unique_link)) as session:
+        candidate = await session.run_sync(_find_candidate, unique_link)
+        if not candidate:
+            return jsonify({'error': 'Invalid exam link'}), 404
+
+        return await session.run_sync(_autosave_answers, candidate, request.get_json())
+
+
+@async_view('candidates.resume_exam')
+async def resume_exam(unique_link):
+    """Return the saved draft answers for an exam in progress."""
+    async with async_db.session(exam_shards.link_exam(unique_link)) as session:
+        candidate = await session.run_sync(_find_candidate, unique_link)
+        if not candidate:
+            return jsonify({'error': 'Invalid exam link'}), 404
+
+        return await session.run_sync(_resume_exam, candidate)
@@ -0,0 +1,60 @@
+from functools import wraps
+from flask import jsonify, Blueprint, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..utils.identity import identity_cache
+from ..utils.profiler import request_profiler
+from ..utils.slow_queries import slow_query_log
+
+# Create diagnostics blueprint
+diagnostics_bp = Blueprint('diagnostics', __name__)
+
+
+def admin_required(view):
+    """Require a JWT of an administrator."""
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        user = identity_cache.get_user(get_jwt_identity())
+        if not user or not user['is_admin']:
+            return jsonify({'error': 'Administrator access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@diagnostics_bp.route('/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    """List the stored request profiles, newest first."""
+    return jsonify({
+        'enabled': request_profiler.enabled,
+        'profiles': request_profiler.list_profiles()
+    }), 200
+
+
+@diagnostics_bp.route('/profiles/<name>', methods=['GET'])
+@admin_required
+def download_profile(name):
+    """Download a stored profile in collapsed-stack format."""
+    path = request_profiler.profile_path(name)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=name)
+
+
+@diagnostics_bp.route('/slow-queries', methods=['GET'])
+@admin_required
+def get_slow_queries():
+    """Summarize the recorded slow queries by fingerprint, costliest first."""
+    return jsonify({
+        'enabled': slow_query_log.enabled,
+        'threshold_ms': slow_query_log.threshold * 1000,
+        'queries': slow_query_log.summary()
+    }), 200
+
+
+@diagnostics_bp.route('/slow-queries', methods=['DELETE'])
+@admin_required
+def reset_slow_queries():
+    """Forget the recorded slow queries."""
+    slow_query_log.reset()
+    return jsonify({'message': 'Slow query log cleared'}), 200
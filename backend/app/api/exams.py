@@ -1,8 +1,20 @@
+from datetime import datetime
 from flask import request, jsonify, Blueprint
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import selectinload
 from ..models.exam import Exam
 from ..models.question import Question, Option
+from ..models.rescore import RescoreJob
+from ..utils.cache import invalidate_exam
+from ..utils.cloning import copy_exam, prepare_exam_change, snapshot_of
+from ..utils.dto import ExamRow
+from ..utils.http_cache import exam_validators, not_modified, add_validators
+from ..utils.identity import identity_cache
+from ..utils.purge import exam_purger
+from ..utils.rescore import exam_rescorer
+from ..utils.scheduler import attempt_scheduler
 from .. import db
+from ..database import commit_keep_loaded
 
 # Create exams blueprint
 exams_bp = Blueprint('exams', __name__)
@@ -12,8 +24,10 @@ exams_bp = Blueprint('exams', __name__)
 def get_exams():
     """Get all exams for the authenticated user."""
     user_id = get_jwt_identity()
-    exams = Exam.query.filter_by(creator_id=user_id).all()
-    return jsonify([exam.to_dict() for exam in exams]), 200
+    # Question counts come from the same query instead of loading every exam's questions
+    exams = ExamRow.load(db.session, Exam.creator_id == user_id, Exam.deleted_at.is_(None),
+                         Exam.source_version.is_(None))
+    return jsonify(exams), 200
 
 
 @exams_bp.route('/<int:exam_id>', methods=['GET'])
@@ -21,12 +35,20 @@ def get_exams():
 def get_exam(exam_id):
     """Get a specific exam by ID."""
     user_id = get_jwt_identity()
-    exam = Exam.query.filter_by(id=exam_id, creator_id=user_id).first()
     
-    if not exam:
+    # Revalidation only needs the version counter, not the exam itself
+    validators = exam_validators(exam_id)
+    if not validators or not identity_cache.owns_exam(user_id, exam_id):
         return jsonify({'error': 'Exam not found'}), 404
     
-    return jsonify(exam.to_dict()), 200
+    version, updated_at = validators
+    etag = f'exam-{exam_id}-v{version}'
+    unchanged = not_modified(etag, updated_at)
+    if unchanged:
+        return unchanged
+    
+    exam = db.session.get(Exam, exam_id)
+    return add_validators(jsonify(exam.to_dict()), etag, updated_at), 200
 
 
 @exams_bp.route('', methods=['POST'])
@@ -42,13 +64,12 @@ def create_exam():
             return jsonify({'error': 'Invalid authentication token'}), 401
             
         # Check if user exists
-        from ..models.user import User
-        user = User.query.get(user_id)
+        user = identity_cache.get_user(user_id)
         if not user:
             print(f"User with ID {user_id} not found")
             return jsonify({'error': 'User not found'}), 404
             
-        print(f"User found: {user.username}")
+        print(f"User found: {user['username']}")
         
         # Get and validate request data
         data = request.get_json()
@@ -84,7 +105,7 @@ def create_exam():
         )
         
         db.session.add(exam)
-        db.session.commit()
+        commit_keep_loaded()
         
         print(f"Exam created successfully: {exam.id}")
         
@@ -104,11 +125,15 @@ def create_exam():
 def update_exam(exam_id):
     """Update an existing exam."""
     user_id = get_jwt_identity()
-    exam = Exam.query.filter_by(id=exam_id, creator_id=user_id).first()
+    exam = Exam.query.filter_by(id=exam_id, creator_id=user_id, deleted_at=None).first()
     
     if not exam:
         return jsonify({'error': 'Exam not found'}), 404
     
+    # Keep a snapshot of the version graded results point at
+    if not prepare_exam_change(exam_id):
+        return jsonify({'error': 'Exam versions are read-only, clone the version to change it'}), 409
+    
     data = request.get_json()
     
     # Update exam fields
@@ -123,9 +148,24 @@ def update_exam(exam_id):
     if 'is_randomized' in data:
         exam.is_randomized = data['is_randomized']
     if 'is_active' in data:
+        # The archive tier counts inactive days from the deactivation
+        if exam.is_active and not data['is_active']:
+            exam.deactivated_at = datetime.utcnow()
+        elif data['is_active']:
+            exam.deactivated_at = None
         exam.is_active = data['is_active']
     
-    db.session.commit()
+    # Graded results pass or fail against the new passing score
+    rescore = exam_rescorer.request(exam.id) if 'passing_score' in data else None
+    
+    commit_keep_loaded()
+    invalidate_exam(exam.id)
+    if rescore:
+        exam_rescorer.wake()
+    
+    # Move the deadlines of attempts in progress if the time limit changed
+    if 'duration_minutes' in data:
+        attempt_scheduler.reschedule_exam(exam.id, exam.duration_minutes)
     
     return jsonify({
         'message': 'Exam updated successfully',
@@ -138,13 +178,25 @@ def update_exam(exam_id):
 def delete_exam(exam_id):
     """Delete an exam."""
     user_id = get_jwt_identity()
-    exam = Exam.query.filter_by(id=exam_id, creator_id=user_id).first()
+    exam = Exam.query.filter_by(id=exam_id, creator_id=user_id, deleted_at=None).first()
     
     if not exam:
         return jsonify({'error': 'Exam not found'}), 404
     
-    db.session.delete(exam)
+    # Hide the exam and its snapshots at once; their rows are deleted in the background by exam_purger
+    now = datetime.utcnow()
+    exam.deleted_at = now
+    exam.is_active = False
+    snapshot_ids = [snapshot_id for snapshot_id, in db.session.query(Exam.id).filter(
+        Exam.source_exam_id == exam_id, Exam.source_version.isnot(None), Exam.deleted_at.is_(None)
+    )]
+    if snapshot_ids:
+        Exam.query.filter(Exam.id.in_(snapshot_ids)).update({'deleted_at': now}, synchronize_session=False)
     db.session.commit()
+    for deleted_id in [exam_id] + snapshot_ids:
+        invalidate_exam(deleted_id)
+        identity_cache.invalidate_exam_owner(deleted_id)
+    exam_purger.wake()
     
     return jsonify({'message': 'Exam deleted successfully'}), 200
 
@@ -154,10 +206,112 @@ def delete_exam(exam_id):
 def get_exam_questions(exam_id):
     """Get all questions for a specific exam."""
     user_id = get_jwt_identity()
-    exam = Exam.query.filter_by(id=exam_id, creator_id=user_id).first()
+    
+    validators = exam_validators(exam_id)
+    if not validators or not identity_cache.owns_exam(user_id, exam_id):
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    version, updated_at = validators
+    etag = f'exam-{exam_id}-questions-v{version}'
+    unchanged = not_modified(etag, updated_at)
+    if unchanged:
+        return unchanged
+    
+    questions = Question.query.filter_by(exam_id=exam_id).options(selectinload(Question.options)).all()
+    response = jsonify([question.to_dict(include_correct_answers=True) for question in questions])
+    return add_validators(response, etag, updated_at), 200 
+
+@exams_bp.route('/<int:exam_id>/clone', methods=['POST'])
+@jwt_required()
+def clone_exam(exam_id):
+    """Copy an exam with its questions and options into a new, editable exam."""
+    user_id = get_jwt_identity()
+    exam = Exam.query.filter_by(id=exam_id, creator_id=user_id, deleted_at=None).first()
+    
+    if not exam:
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    copy = copy_exam(exam, user_id, title=data.get('title'))
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Exam cloned successfully',
+        'exam': ExamRow.load(db.session, Exam.id == copy.id)[0]
+    }), 201
+
+
+@exams_bp.route('/<int:exam_id>/versions', methods=['GET'])
+@jwt_required()
+def get_exam_versions(exam_id):
+    """List the read-only snapshots of an exam, oldest version first."""
+    user_id = get_jwt_identity()
+    
+    if not identity_cache.owns_exam(user_id, exam_id):
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    versions = ExamRow.load(db.session, Exam.source_exam_id == exam_id, Exam.source_version.isnot(None),
+                            Exam.deleted_at.is_(None))
+    versions.sort(key=lambda version: version.source_version)
+    return jsonify(versions), 200
+
+
+@exams_bp.route('/<int:exam_id>/versions', methods=['POST'])
+@jwt_required()
+def create_exam_version(exam_id):
+    """Snapshot the current version of an exam, or return its existing snapshot."""
+    user_id = get_jwt_identity()
+    exam = Exam.query.filter_by(id=exam_id, creator_id=user_id, deleted_at=None).first()
     
     if not exam:
         return jsonify({'error': 'Exam not found'}), 404
+    if exam.source_version is not None:
+        return jsonify({'error': 'Exam versions are read-only, clone the version to change it'}), 409
+    
+    snapshot = snapshot_of(exam.id, exam.version)
+    created = snapshot is None
+    if created:
+        snapshot = copy_exam(exam, user_id, snapshot=True)
+        db.session.commit()
+    
+    return jsonify({
+        'message': 'Exam version created successfully' if created else 'Exam version already exists',
+        'exam': ExamRow.load(db.session, Exam.id == snapshot.id)[0]
+    }), 201 if created else 200
+
+
+@exams_bp.route('/<int:exam_id>/rescore', methods=['POST'])
+@jwt_required()
+def rescore_exam(exam_id):
+    """Queue a re-score of an exam's results against its current questions."""
+    user_id = get_jwt_identity()
+    
+    if not identity_cache.owns_exam(user_id, exam_id):
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    job = exam_rescorer.request(exam_id)
+    if job is None:
+        return jsonify({'message': 'Exam has no results to re-score'}), 200
+    db.session.commit()
+    exam_rescorer.wake()
+    
+    return jsonify({
+        'message': 'Re-score queued',
+        'job': job.to_dict()
+    }), 202
+
+
+@exams_bp.route('/<int:exam_id>/rescore', methods=['GET'])
+@jwt_required()
+def get_rescore_status(exam_id):
+    """Get the progress of an exam's latest re-score."""
+    user_id = get_jwt_identity()
+    
+    if not identity_cache.owns_exam(user_id, exam_id):
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    job = RescoreJob.query.filter_by(exam_id=exam_id).order_by(RescoreJob.id.desc()).first()
+    if not job:
+        return jsonify({'error': 'Exam has not been re-scored'}), 404
     
-    questions = Question.query.filter_by(exam_id=exam_id).all()
-    return jsonify([question.to_dict(include_correct_answers=True) for question in questions]), 200 
\ No newline at end of file
+    return jsonify(job.to_dict()), 200
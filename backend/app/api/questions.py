@@ -1,8 +1,15 @@
 from flask import request, jsonify, Blueprint
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import selectinload
 from ..models.question import Question, Option
 from ..models.exam import Exam
+from ..utils.cache import invalidate_exam
+from ..utils.cloning import move_answers_to_snapshots, prepare_exam_change
+from ..utils.grading import MAX_CHOICE_OPTIONS
+from ..utils.identity import identity_cache
+from ..utils.rescore import exam_rescorer
 from .. import db
+from ..database import commit_keep_loaded
 
 # Create questions blueprint
 questions_bp = Blueprint('questions', __name__)
@@ -18,8 +25,10 @@ def get_all_questions():
     question_type = request.args.get('question_type')
     search_text = request.args.get('search')
     
-    # Start with a query that joins with exams to check permissions
-    query = Question.query.join(Exam).filter(Exam.creator_id == user_id)
+    # Start with a query that joins with exams to check permissions and get their titles
+    query = (db.session.query(Question, Exam.title).join(Exam)
+             .filter(Exam.creator_id == user_id, Exam.deleted_at.is_(None))
+             .options(selectinload(Question.options)))
     
     # Apply filters if provided
     if exam_id:
@@ -36,14 +45,9 @@ def get_all_questions():
     
     # Add exam title to each question
     result = []
-    for question in questions:
+    for question, exam_title in questions:
         question_dict = question.to_dict(include_correct_answers=True)
-        
-        # Add exam title
-        exam = Exam.query.get(question.exam_id)
-        if exam:
-            question_dict['exam_title'] = exam.title
-        
+        question_dict['exam_title'] = exam_title
         result.append(question_dict)
     
     return jsonify(result), 200
@@ -62,10 +66,13 @@ def create_question():
             return jsonify({'error': f'Missing required field: {field}'}), 400
     
     # Check if exam exists and belongs to user
-    exam = Exam.query.filter_by(id=data['exam_id'], creator_id=user_id).first()
-    if not exam:
+    if not identity_cache.owns_exam(user_id, data['exam_id']):
         return jsonify({'error': 'Exam not found or access denied'}), 404
     
+    # Keep a snapshot of the version graded results point at
+    if not prepare_exam_change(data['exam_id']):
+        return jsonify({'error': 'Exam versions are read-only, clone the version to change it'}), 409
+    
     # Validate question type
     valid_types = ['single_choice', 'multiple_choice', 'true_false', 'text']
     if data['question_type'] not in valid_types:
@@ -93,6 +100,8 @@ def create_question():
     options = data.get('options', [])
     if not options and question.question_type in ['single_choice', 'multiple_choice', 'true_false']:
         return jsonify({'error': 'Options are required for this question type'}), 400
+    if len(options) > MAX_CHOICE_OPTIONS:
+        return jsonify({'error': f'A question can have at most {MAX_CHOICE_OPTIONS} options'}), 400
     
     for option_data in options:
         option = Option(
@@ -102,7 +111,12 @@ def create_question():
         question.options.append(option)
     
     db.session.add(question)
-    db.session.commit()
+    # Scores of graded results count the new question's points
+    rescore = exam_rescorer.request(question.exam_id)
+    commit_keep_loaded()
+    invalidate_exam(question.exam_id)
+    if rescore:
+        exam_rescorer.wake()
     
     return jsonify({
         'message': 'Question created successfully',
@@ -115,13 +129,10 @@ def get_question(question_id):
     """Get a specific question by ID."""
     user_id = get_jwt_identity()
     
-    # Join Question with Exam to check permissions
-    question = Question.query.join(Exam).filter(
-        Question.id == question_id,
-        Exam.creator_id == user_id
-    ).first()
+    # Check permissions through the cached exam owner
+    question = db.session.get(Question, question_id)
     
-    if not question:
+    if not question or not identity_cache.owns_exam(user_id, question.exam_id):
         return jsonify({'error': 'Question not found or access denied'}), 404
     
     return jsonify(question.to_dict(include_correct_answers=True)), 200
@@ -132,15 +143,16 @@ def update_question(question_id):
     """Update an existing question."""
     user_id = get_jwt_identity()
     
-    # Join Question with Exam to check permissions
-    question = Question.query.join(Exam).filter(
-        Question.id == question_id,
-        Exam.creator_id == user_id
-    ).first()
+    # Check permissions through the cached exam owner
+    question = db.session.get(Question, question_id)
     
-    if not question:
+    if not question or not identity_cache.owns_exam(user_id, question.exam_id):
         return jsonify({'error': 'Question not found or access denied'}), 404
     
+    # Keep a snapshot of the version graded results point at
+    if not prepare_exam_change(question.exam_id):
+        return jsonify({'error': 'Exam versions are read-only, clone the version to change it'}), 409
+    
     data = request.get_json()
     
     # Update question fields
@@ -165,6 +177,9 @@ def update_question(question_id):
     
     # Update options if provided
     if 'options' in data:
+        if len(data['options']) > MAX_CHOICE_OPTIONS:
+            return jsonify({'error': f'A question can have at most {MAX_CHOICE_OPTIONS} options'}), 400
+        
         # Remove existing options
         for option in question.options:
             db.session.delete(option)
@@ -177,7 +192,16 @@ def update_question(question_id):
             )
             question.options.append(option)
     
+    # Scores of graded results follow the new points and answer key
+    rescore = None
+    if 'points' in data or 'question_type' in data or 'options' in data:
+        rescore = exam_rescorer.request(question.exam_id)
+    
+    # A plain commit, so the options collection is reloaded without the deleted ones
     db.session.commit()
+    invalidate_exam(question.exam_id)
+    if rescore:
+        exam_rescorer.wake()
     
     return jsonify({
         'message': 'Question updated successfully',
@@ -190,17 +214,29 @@ def delete_question(question_id):
     """Delete a question."""
     user_id = get_jwt_identity()
     
-    # Join Question with Exam to check permissions
-    question = Question.query.join(Exam).filter(
-        Question.id == question_id,
-        Exam.creator_id == user_id
-    ).first()
+    # Check permissions through the cached exam owner
+    question = db.session.get(Question, question_id)
     
-    if not question:
+    if not question or not identity_cache.owns_exam(user_id, question.exam_id):
         return jsonify({'error': 'Question not found or access denied'}), 404
     
+    # Keep a snapshot of the version graded results point at
+    if not prepare_exam_change(question.exam_id):
+        return jsonify({'error': 'Exam versions are read-only, clone the version to change it'}), 409
+    
+    # Graded results keep their answers, on the snapshot of the version they were graded against
+    if not move_answers_to_snapshots(question):
+        db.session.rollback()
+        return jsonify({'error': 'Question has answers of results graded before exam versions were kept, '
+                                 'so it cannot be deleted'}), 409
+    
+    exam_id = question.exam_id
     db.session.delete(question)
+    rescore = exam_rescorer.request(exam_id)
     db.session.commit()
+    invalidate_exam(exam_id)
+    if rescore:
+        exam_rescorer.wake()
     
     return jsonify({'message': 'Question deleted successfully'}), 200
 
@@ -218,10 +254,13 @@ def bulk_create_questions():
         return jsonify({'error': 'Questions must be provided as a list'}), 400
     
     # Check if exam exists and belongs to user
-    exam = Exam.query.filter_by(id=data['exam_id'], creator_id=user_id).first()
-    if not exam:
+    if not identity_cache.owns_exam(user_id, data['exam_id']):
         return jsonify({'error': 'Exam not found or access denied'}), 404
     
+    # Keep a snapshot of the version graded results point at
+    if not prepare_exam_change(data['exam_id']):
+        return jsonify({'error': 'Exam versions are read-only, clone the version to change it'}), 409
+    
     created_questions = []
     
     try:
@@ -259,6 +298,8 @@ def bulk_create_questions():
             options = q_data.get('options', [])
             if not options and question.question_type in ['single_choice', 'multiple_choice', 'true_false']:
                 return jsonify({'error': 'Options are required for this question type'}), 400
+            if len(options) > MAX_CHOICE_OPTIONS:
+                return jsonify({'error': f'A question can have at most {MAX_CHOICE_OPTIONS} options'}), 400
             
             for option_data in options:
                 option = Option(
@@ -270,7 +311,11 @@ def bulk_create_questions():
             db.session.add(question)
             created_questions.append(question)
         
-        db.session.commit()
+        rescore = exam_rescorer.request(data['exam_id'])
+        commit_keep_loaded()
+        invalidate_exam(data['exam_id'])
+        if rescore:
+            exam_rescorer.wake()
         
         return jsonify({
             'message': f'Successfully created {len(created_questions)} questions',
@@ -1,27 +1,51 @@
 from flask import request, jsonify, Blueprint
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models.result import Result
+from ..models.result import Result, Answer
+from ..models.archive import ArchivedResult
 from ..models.candidate import Candidate
 from ..models.exam import Exam
+from ..models.rescore import ScoreAudit
+from ..utils.dto import ResultRow
+from ..utils.identity import identity_cache
+from ..utils.replica import read_replica
+from ..utils.shards import exam_shards
 from .. import db
+from ..database import commit_keep_loaded
 
 # Create results blueprint
 results_bp = Blueprint('results', __name__)
 
+
+def _archived_result(result_id):
+    """Return the result from the archive tier, for results of archived exams."""
+    return db.session.get(ArchivedResult, result_id)
+
+
+def _archived_conflict(user_id, result_id, message):
+    """Answer a change to a result that is not live: 409 if it is archived, 404 otherwise."""
+    archived = _archived_result(result_id)
+    if not archived or not identity_cache.owns_exam(user_id, archived.exam_id):
+        return jsonify({'error': message}), 404
+    return jsonify({'error': 'Result is archived, restore its exam with `flask archive restore` to change it'}), 409
+
+
 @results_bp.route('', methods=['GET'])
 @jwt_required()
 def get_all_results():
     """Get all results for exams created by the authenticated user."""
     user_id = get_jwt_identity()
     
-    # Join the tables to filter results that belong to exams created by this user
-    results = Result.query.join(
-        Exam, Result.exam_id == Exam.id
-    ).filter(
-        Exam.creator_id == user_id
-    ).all()
-    
-    return jsonify([result.to_dict() for result in results]), 200
+    # Filter results that belong to exams created by this user, in every exam shard
+    replica = read_replica.session()
+    exam_ids = [exam_id for exam_id, in replica.query(Exam.id).filter(
+        Exam.creator_id == user_id, Exam.deleted_at.is_(None)
+    )]
+    results = exam_shards.fan_out(
+        exam_ids, lambda session: ResultRow.load(session, Result.exam_id.in_(exam_ids)), main=replica
+    )
+    results += ResultRow.load_archived(replica, ArchivedResult.exam_id.in_(exam_ids))
+    
+    return jsonify(results), 200
 
 
 @results_bp.route('/exams/<int:exam_id>', methods=['GET'])
@@ -31,12 +55,14 @@ def get_exam_results(exam_id):
     user_id = get_jwt_identity()
     
     # Verify the exam belongs to the authenticated user
-    exam = Exam.query.filter_by(id=exam_id, creator_id=user_id).first()
-    if not exam:
+    if not identity_cache.owns_exam(user_id, exam_id):
         return jsonify({'error': 'Exam not found or access denied'}), 404
     
-    results = Result.query.filter_by(exam_id=exam_id).all()
-    return jsonify([result.to_dict() for result in results]), 200
+    replica = read_replica.session()
+    results = exam_shards.fan_out([exam_id], lambda session: ResultRow.load(session, Result.exam_id == exam_id),
+                                  main=replica)
+    results += ResultRow.load_archived(replica, ArchivedResult.exam_id == exam_id)
+    return jsonify(results), 200
 
 
 @results_bp.route('/<int:result_id>', methods=['GET'])
@@ -45,20 +71,32 @@ def get_result(result_id):
     """Get a specific result."""
     user_id = get_jwt_identity()
     
-    # Join the tables to verify the result belongs to an exam created by this user
-    result = Result.query.join(
-        Exam, Result.exam_id == Exam.id
-    ).filter(
-        Result.id == result_id,
-        Exam.creator_id == user_id
-    ).first()
+    # Check permissions through the cached exam owner
+    session = exam_shards.session_for_id(result_id)
+    result = session.get(Result, result_id) or _archived_result(result_id)
     
-    if not result:
+    if not result or not identity_cache.owns_exam(user_id, result.exam_id):
         return jsonify({'error': 'Result not found or access denied'}), 404
     
     return jsonify(result.to_dict()), 200
 
 
+@results_bp.route('/<int:result_id>/audit', methods=['GET'])
+@jwt_required()
+def get_result_audit(result_id):
+    """Get the score changes re-scores made to a result, oldest first."""
+    user_id = get_jwt_identity()
+    
+    session = exam_shards.session_for_id(result_id)
+    result = session.get(Result, result_id) or _archived_result(result_id)
+    
+    if not result or not identity_cache.owns_exam(user_id, result.exam_id):
+        return jsonify({'error': 'Result not found or access denied'}), 404
+    
+    audits = ScoreAudit.query.filter_by(result_id=result_id).order_by(ScoreAudit.id).all()
+    return jsonify([audit.to_dict() for audit in audits]), 200
+
+
 @results_bp.route('/candidates/<int:candidate_id>', methods=['GET'])
 @jwt_required()
 def get_candidate_results(candidate_id):
@@ -66,18 +104,15 @@ def get_candidate_results(candidate_id):
     user_id = get_jwt_identity()
     
     # Verify the candidate belongs to an exam created by the authenticated user
-    candidate = Candidate.query.join(
-        Exam, Candidate.exam_id == Exam.id
-    ).filter(
-        Candidate.id == candidate_id,
-        Exam.creator_id == user_id
-    ).first()
-    
-    if not candidate:
+    session = exam_shards.session_for_id(candidate_id)
+    candidate = session.get(Candidate, candidate_id)
+    
+    if not candidate or not identity_cache.owns_exam(user_id, candidate.exam_id):
         return jsonify({'error': 'Candidate not found or access denied'}), 404
     
-    results = Result.query.filter_by(candidate_id=candidate_id).all()
-    return jsonify([result.to_dict() for result in results]), 200
+    results = ResultRow.load(session, Result.candidate_id == candidate_id)
+    results += ResultRow.load_archived(read_replica.session(), ArchivedResult.candidate_id == candidate_id)
+    return jsonify(results), 200
 
 
 @results_bp.route('/<int:result_id>/review', methods=['PUT'])
@@ -86,15 +121,13 @@ def update_result_review(result_id):
     """Update manual review scores and feedback for a result."""
     user_id = get_jwt_identity()
     
-    # Verify the result belongs to an exam created by this user
-    result = Result.query.join(
-        Exam, Result.exam_id == Exam.id
-    ).filter(
-        Result.id == result_id,
-        Exam.creator_id == user_id
-    ).first()
+    # Check permissions through the cached exam owner
+    session = exam_shards.session_for_id(result_id)
+    result = session.get(Result, result_id)
     
     if not result:
+        return _archived_conflict(user_id, result_id, 'Result not found or access denied')
+    if not identity_cache.owns_exam(user_id, result.exam_id):
         return jsonify({'error': 'Result not found or access denied'}), 404
     
     data = request.get_json()
@@ -112,7 +145,7 @@ def update_result_review(result_id):
         # TODO: Implement score recalculation logic
         pass
     
-    db.session.commit()
+    commit_keep_loaded(session)
     
     return jsonify({
         'message': 'Result updated successfully',
@@ -125,12 +158,13 @@ def update_result_review(result_id):
 def evaluate_open_ended(result_id):
     """Evaluate open-ended answers for a result."""
     user_id = get_jwt_identity()
-    result = Result.query.join(Exam).filter(
-        Result.id == result_id,
-        Exam.creator_id == user_id
-    ).first()
+    # Check permissions through the cached exam owner
+    session = exam_shards.session_for_id(result_id)
+    result = session.get(Result, result_id)
     
     if not result:
+        return _archived_conflict(user_id, result_id, 'Result not found')
+    if not identity_cache.owns_exam(user_id, result.exam_id):
         return jsonify({'error': 'Result not found'}), 404
     
     data = request.get_json()
@@ -145,14 +179,14 @@ def evaluate_open_ended(result_id):
         if not answer_id or points_awarded is None:
             continue
         
-        answer = Answer.query.filter_by(id=answer_id, result_id=result_id).first()
+        answer = session.query(Answer).filter_by(id=answer_id, result_id=result_id).first()
         
         if not answer or answer.question.question_type != 'open_ended':
             continue
         
         answer.evaluate_open_ended(points_awarded)
     
-    db.session.commit()
+    session.commit()
     
     # Recalculate score
     result.calculate_score()
@@ -160,7 +194,7 @@ def evaluate_open_ended(result_id):
     if 'feedback' in data:
         result.feedback = data['feedback']
     
-    db.session.commit()
+    commit_keep_loaded(session)
     
     # TODO: Send email notification to candidate
     
@@ -175,12 +209,11 @@ def evaluate_open_ended(result_id):
 def export_result(result_id):
     """Export a result to PDF or Excel."""
     user_id = get_jwt_identity()
-    result = Result.query.join(Exam).filter(
-        Result.id == result_id,
-        Exam.creator_id == user_id
-    ).first()
+    # Check permissions through the cached exam owner
+    session = exam_shards.session_for_id(result_id)
+    result = session.get(Result, result_id) or _archived_result(result_id)
     
-    if not result:
+    if not result or not identity_cache.owns_exam(user_id, result.exam_id):
         return jsonify({'error': 'Result not found'}), 404
     
     # TODO: Implement export functionality
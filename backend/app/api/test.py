@@ -9,6 +9,9 @@ from ..models.exam import Exam
 from ..models.candidate import Candidate
 from ..models.question import Question
 from ..models.result import Result
+from ..models.archive import ArchivedResult
+from ..utils.replica import read_replica
+from ..utils.shards import exam_shards
 
 # Create test blueprint
 test_bp = Blueprint('test', __name__)
@@ -59,13 +62,16 @@ def system_info():
         db_connected = False
         print(f"Database connection error: {e}")
     
-    # Get application stats
+    # Get application stats (candidates and results are counted in every exam shard)
+    replica = read_replica.session()
+    exam_ids = [exam_id for exam_id, in replica.query(Exam.id).filter(Exam.deleted_at.is_(None))]
     stats = {
-        'users': User.query.count(),
-        'exams': Exam.query.count(),
-        'candidates': Candidate.query.count(),
-        'questions': Question.query.count(),
-        'results': Result.query.count()
+        'users': replica.query(User).count(),
+        'exams': len(exam_ids),
+        'candidates': sum(exam_shards.fan_out(exam_ids, lambda session: [session.query(Candidate).count()], main=replica)),
+        'questions': replica.query(Question).count(),
+        'results': sum(exam_shards.fan_out(exam_ids, lambda session: [session.query(Result).count()], main=replica))
+                   + replica.query(ArchivedResult).count()
     }
     
     # System information
@@ -78,7 +84,8 @@ def system_info():
         'database': {
             'connected': db_connected,
             'type': db_type,
-            'version': db_version
+            'version': db_version,
+            'read_replica': {'lag_seconds': round(read_replica.lag(), 3)} if read_replica.enabled else None
         },
         'stats': stats
     }
@@ -0,0 +1,180 @@
+"""
+ASGI entry point serving the public candidate endpoints asynchronously.
+
+Requests for an endpoint in ASYNC_VIEWS go through Flask's usual request
+handling (guards, hooks, error handlers) with the view awaited on the event
+loop, so thousands of candidates polling or autosaving only cost a coroutine
+each. The before and after request hooks (rate limiting, compression,
+metrics) run in worker threads, so their file and CPU work does not hold up
+the loop. Every other route, the admin API included, is the unchanged WSGI app
+run in a thread pool by asgiref.
+
+Run it with e.g. ``uvicorn asgi:app`` from the backend directory. The
+database has to be a file or a server, an in-memory SQLite database is not
+shared with the async engine.
+"""
+import asyncio
+import io
+import logging
+import sys
+from asgiref.wsgi import WsgiToAsgi
+from flask import request
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
+from . import create_app
+from .api.candidates_async import ASYNC_VIEWS
+from .config import Config
+from .utils.async_db import async_db
+
+logger = logging.getLogger(__name__)
+
+# Set in the environ of requests handled by an async view
+ASYNC_ENVIRON_KEY = 'exam.async_view'
+
+
+def build_environ(scope, body):
+    """Build a WSGI environ from an ASGI HTTP scope and the request body."""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        ASYNC_ENVIRON_KEY: True,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope['headers']:
+        name = name.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = f"HTTP_{name.upper().replace('-', '_')}"
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class AsyncCandidateApp:
+    """ASGI application dispatching async candidate views and passing everything else to WSGI."""
+
+    def __init__(self, app, views):
+        self.app = app
+        self.views = views
+        self.wsgi = WsgiToAsgi(app)
+        self.url_map = app.url_map
+        # Async requests skip app.wsgi_app, so apply the app's ProxyFix settings to their environ here
+        proxies = app.config.get('TRUSTED_PROXY_COUNT', 0)
+        self._proxy_fix = ProxyFix(lambda environ, start_response: environ, x_for=proxies, x_proto=proxies) \
+            if proxies > 0 else None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http' or not self._is_async(scope):
+            return await self.wsgi(scope, receive, send)
+
+        body = await self._read_body(receive)
+        environ = build_environ(scope, body)
+        if self._proxy_fix is not None:
+            environ = self._proxy_fix(environ, None)
+        response = await self._dispatch(environ)
+        await self._send_response(environ, response, send)
+
+    def _is_async(self, scope):
+        adapter = self.url_map.bind('localhost', script_name=scope.get('root_path') or None)
+        try:
+            endpoint, _ = adapter.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return False
+        return endpoint in self.views
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    async def _dispatch(self, environ):
+        """Run the Flask request pipeline with the async view awaited in place of the sync one."""
+        app = self.app
+        ctx = app.request_context(environ)
+        error = None
+        ctx.push()
+        try:
+            try:
+                # Threads run in a copy of the context, so they see the request context pushed here
+                rv = await asyncio.to_thread(app.preprocess_request)
+                if rv is None:
+                    if request.routing_exception is not None:
+                        request.raise_routing_exception()
+                    rv = await self.views[request.endpoint](**request.view_args)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = await asyncio.to_thread(self._finalize, rv)
+        except Exception as e:
+            error = e
+            response = app.handle_exception(e)
+        finally:
+            ctx.pop(error)
+        return response
+
+    def _finalize(self, rv):
+        return self.app.process_response(self.app.make_response(rv))
+
+    async def _send_response(self, environ, response, send):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+        iterable = response(environ, start_response)
+        try:
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            for chunk in iterable:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_db.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(config_class=Config):
+    """Create the Flask app and wrap it for serving under ASGI."""
+    app = create_app(config_class)
+    async_db.init_app(app)
+    logger.info(f"Serving {', '.join(sorted(ASYNC_VIEWS))} asynchronously")
+    return AsyncCandidateApp(app, ASYNC_VIEWS)
@@ -9,6 +9,7 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///exam_system.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')  # 'orjson' or 'default'
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key')
     
     # Email config
@@ -19,6 +20,116 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
 
+    # Autosave config (seconds between draft flushes, 0 disables the flusher thread)
+    AUTOSAVE_FLUSH_INTERVAL = float(os.environ.get('AUTOSAVE_FLUSH_INTERVAL', 3))
+
+    # Exam timer config
+    EXAM_SCHEDULER_ENABLED = os.environ.get('EXAM_SCHEDULER_ENABLED', 'True') == 'True'
+    EXAM_GRACE_SECONDS = int(os.environ.get('EXAM_GRACE_SECONDS', 60))
+    EXAM_FINALIZE_BATCH_SIZE = int(os.environ.get('EXAM_FINALIZE_BATCH_SIZE', 100))
+
+    # Candidate link config (signed links skip the link lookup on access)
+    SIGNED_LINKS = os.environ.get('SIGNED_LINKS', 'False') == 'True'
+    LINK_SIGNING_KEY = os.environ.get('LINK_SIGNING_KEY')
+
+    # Exam delivery payload and answer key caches (entries are checked against the exam's
+    # version once per request; CACHE_SHARED_STORE=sqlite shares them between workers
+    # through a memory-mapped file, by default instance/cache.db)
+    EXAM_CACHE_SIZE = int(os.environ.get('EXAM_CACHE_SIZE', 256))
+    EXAM_CACHE_TTL = int(os.environ.get('EXAM_CACHE_TTL', 300))
+    CACHE_SHARED_STORE = os.environ.get('CACHE_SHARED_STORE', 'none')
+    CACHE_SHARED_PATH = os.environ.get('CACHE_SHARED_PATH')
+    CACHE_MMAP_SIZE = int(os.environ.get('CACHE_MMAP_SIZE', 64 * 2 ** 20))
+
+    # Response compression (brotli is used when the brotli package is installed)
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'True') == 'True'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+
+    # Reverse proxies in front of the app (1 on Render); the client IP is taken from
+    # the X-Forwarded-For entry the outermost of them added
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+
+    # Public exam link protection (RATE_LIMIT_STORE=sqlite shares counters between workers)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True') == 'True'
+    RATE_LIMIT_WINDOW = int(os.environ.get('RATE_LIMIT_WINDOW', 60))
+    RATE_LIMIT_PER_IP = int(os.environ.get('RATE_LIMIT_PER_IP', 300))
+    RATE_LIMIT_PER_LINK = int(os.environ.get('RATE_LIMIT_PER_LINK', 60))
+    RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')
+    NEGATIVE_CACHE_SIZE = int(os.environ.get('NEGATIVE_CACHE_SIZE', 10000))
+    NEGATIVE_CACHE_TTL = int(os.environ.get('NEGATIVE_CACHE_TTL', 600))
+
+    # User and exam owner cache for JWT-protected endpoints (0 disables)
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 30))
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 4096))
+
+    # Password hashing (Werkzeug's default method unless set; weaker hashes are upgraded on login)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+    # Request metrics served in the Prometheus format at /api/metrics, to scrapers sending
+    # METRICS_TOKEN as a bearer token, or to administrators when no token is set
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Request profiling (profiles of sampled or slow requests are kept in a ring on disk)
+    PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', 'False') == 'True'
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))
+    PROFILE_SLOW_MS = int(os.environ.get('PROFILE_SLOW_MS', 1000))
+    PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.01))
+    PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 200))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')
+
+    # Slow query log (plans are captured once per statement fingerprint)
+    SLOW_QUERY_ENABLED = os.environ.get('SLOW_QUERY_ENABLED', 'True') == 'True'
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'True') == 'True'
+
+    # Startup (FAST_STARTUP checks the migration revision instead of running create_all
+    # and skips Flask-Migrate, so flask db commands need it off; DEFER_BACKGROUND_TASKS
+    # leaves thread start-up to after_fork, which gunicorn.conf.py sets when preloading)
+    FAST_STARTUP = os.environ.get('FAST_STARTUP', 'False') == 'True'
+    DEFER_BACKGROUND_TASKS = os.environ.get('DEFER_BACKGROUND_TASKS', 'False') == 'True'
+
+    # Per-exam SQLite shards for candidates, results, answers and drafts (EXAM_SHARD_DIR
+    # defaults to instance/shards; at most EXAM_SHARD_MAX_OPEN shards keep open connections)
+    EXAM_SHARDING = os.environ.get('EXAM_SHARDING', 'False') == 'True'
+    EXAM_SHARD_DIR = os.environ.get('EXAM_SHARD_DIR')
+    EXAM_SHARD_MAX_OPEN = int(os.environ.get('EXAM_SHARD_MAX_OPEN', 64))
+
+    # Read replica for admin listings and reports: a Postgres standby, or a SQLite snapshot
+    # of the main database refreshed every READ_REPLICA_SNAPSHOT_INTERVAL seconds (0 when
+    # it is kept up to date elsewhere); reads lagging more than READ_REPLICA_MAX_LAG
+    # seconds, or of requests sending X-Read-Your-Writes, go to the main database
+    READ_REPLICA_URI = os.environ.get('READ_REPLICA_URI')
+    READ_REPLICA_SNAPSHOT_INTERVAL = float(os.environ.get('READ_REPLICA_SNAPSHOT_INTERVAL', 10))
+    READ_REPLICA_MAX_LAG = float(os.environ.get('READ_REPLICA_MAX_LAG', 30))
+
+    # Archive tier: results and answers of exams inactive for ARCHIVE_AFTER_DAYS days
+    # (0 disables it) move to archived_results, checked every ARCHIVE_INTERVAL seconds
+    # and moved ARCHIVE_CHUNK_SIZE results per transaction; see `flask archive`
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 0))
+    ARCHIVE_INTERVAL = float(os.environ.get('ARCHIVE_INTERVAL', 3600))
+    ARCHIVE_CHUNK_SIZE = int(os.environ.get('ARCHIVE_CHUNK_SIZE', 500))
+
+    # Deleted exams are hidden at once and their rows deleted by a background thread every
+    # PURGE_INTERVAL seconds, PURGE_CHUNK_SIZE rows per transaction; see `flask purge`
+    PURGE_INTERVAL = float(os.environ.get('PURGE_INTERVAL', 30))
+    PURGE_CHUNK_SIZE = int(os.environ.get('PURGE_CHUNK_SIZE', 1000))
+
+    # Results are re-scored by a background thread after points or answer keys change, every
+    # RESCORE_INTERVAL seconds, RESCORE_CHUNK_SIZE results per transaction; jobs without
+    # progress for RESCORE_STALE_AFTER seconds are taken over; see `flask rescore`
+    RESCORE_INTERVAL = float(os.environ.get('RESCORE_INTERVAL', 60))
+    RESCORE_CHUNK_SIZE = int(os.environ.get('RESCORE_CHUNK_SIZE', 1000))
+    RESCORE_STALE_AFTER = float(os.environ.get('RESCORE_STALE_AFTER', 600))
+
+    # Async serving of the candidate endpoints (asgi.py); defaults to DATABASE_URL
+    # with its async driver, e.g. sqlite+aiosqlite or postgresql+asyncpg
+    ASYNC_DATABASE_URI = os.environ.get('ASYNC_DATABASE_URI')
+
 class DevelopmentConfig(Config):
     """Development config."""
     DEBUG = True
@@ -27,6 +138,12 @@ class TestingConfig(Config):
     """Testing config."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    AUTOSAVE_FLUSH_INTERVAL = 0
+    EXAM_SCHEDULER_ENABLED = False
+    RATE_LIMIT_ENABLED = False
+    ARCHIVE_INTERVAL = 0
+    PURGE_INTERVAL = 0
+    RESCORE_INTERVAL = 0
 
 class ProductionConfig(Config):
     """Production config."""
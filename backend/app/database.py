@@ -1,4 +1,24 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import scoped_session
 
 # Initialize database
-db = SQLAlchemy() 
\ No newline at end of file
+db = SQLAlchemy()
+
+
+def commit_keep_loaded(session=None):
+    """
+    Commit without expiring the loaded objects, for handlers that serialize them right after.
+
+    A regular commit expires every object, so the to_dict() that follows
+    reloads each one with another SELECT. Values the database computes
+    (SQL expressions, server defaults) are still reloaded on access.
+    """
+    session = session if session is not None else db.session
+    if isinstance(session, scoped_session):
+        session = session()
+    previous = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        session.commit()
+    finally:
+        session.expire_on_commit = previous
@@ -3,4 +3,7 @@ from app.models.user import User
 from app.models.exam import Exam
 from app.models.question import Question, Option
 from app.models.candidate import Candidate
-from app.models.result import Result, Answer 
\ No newline at end of file
+from app.models.result import Result, Answer 
+from app.models.draft import DraftAnswer
+from app.models.archive import ArchivedResult
+from app.models.rescore import RescoreJob, ScoreAudit
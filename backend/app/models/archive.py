@@ -0,0 +1,78 @@
+import json
+import zlib
+from datetime import datetime
+from .. import db
+
+# Answer fields packed into ArchivedResult.answers, in order
+ANSWER_FIELDS = ('id', 'selected_mask', 'text_response', 'is_correct', 'earned_points', 'created_at',
+                 'updated_at', 'question_id')
+
+
+def pack_answers(rows):
+    """Pack answer rows (tuples in ANSWER_FIELDS order) into compressed JSON."""
+    data = [[value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows]
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack_answers(blob):
+    """Return the answer rows packed by pack_answers as dictionaries."""
+    answers = []
+    for row in json.loads(zlib.decompress(blob)) if blob else []:
+        answer = dict(zip(ANSWER_FIELDS, row))
+        for field in ('created_at', 'updated_at'):
+            if answer[field] is not None:
+                answer[field] = datetime.fromisoformat(answer[field])
+        answers.append(answer)
+    return answers
+
+
+class ArchivedResult(db.Model):
+    """Result of an archived exam, with its answers packed into one compressed column."""
+    __tablename__ = 'archived_results'
+
+    # Same id as the result had before it was archived (64-bit, as ids of exam shards)
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    score = db.Column(db.Float, nullable=True)
+    passed = db.Column(db.Boolean, nullable=True)
+    feedback = db.Column(db.Text, nullable=True)
+    exam_version = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    answers = db.Column(db.LargeBinary, nullable=True)  # see pack_answers
+
+    # Candidates stay where they are (possibly in an exam shard), so there is no foreign key
+    candidate_id = db.Column(db.BigInteger, nullable=False, index=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    def to_dict(self, include_answers=False):
+        """Convert the archived result to the dictionary of the result it was."""
+        result = {
+            'id': self.id,
+            'score': self.score,
+            'passed': self.passed,
+            'feedback': self.feedback,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'candidate_id': self.candidate_id,
+            'exam_id': self.exam_id,
+            'exam_version': self.exam_version
+        }
+
+        if include_answers:
+            result['answers'] = [{
+                'id': answer['id'],
+                'selected_mask': answer['selected_mask'],
+                'text_response': answer['text_response'],
+                'is_correct': answer['is_correct'],
+                'earned_points': answer['earned_points'],
+                'created_at': answer['created_at'],
+                'updated_at': answer['updated_at'],
+                'result_id': self.id,
+                'question_id': answer['question_id']
+            } for answer in unpack_answers(self.answers)]
+
+        return result
+
+    def __repr__(self):
+        return f'<ArchivedResult {self.id}>'
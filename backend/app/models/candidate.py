@@ -10,6 +10,7 @@ class Candidate(db.Model):
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=False)
     unique_link = db.Column(db.String(100), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
+    link_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Signed into the link, bumped to reissue it
     is_test_completed = db.Column(db.Boolean, default=False)
     test_start_time = db.Column(db.DateTime, nullable=True)
     test_end_time = db.Column(db.DateTime, nullable=True)
@@ -19,7 +20,7 @@ class Candidate(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Foreign keys
-    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # Relationships
     result = db.relationship('Result', backref='candidate', lazy=True, uselist=False)
@@ -40,15 +41,16 @@ class Candidate(db.Model):
         """Check if the candidate has completed the exam."""
         return self.is_test_completed
 
-    def to_dict(self):
+    def to_dict(self, exam_title=None):
         """Convert candidate object to dictionary."""
         from app.models.exam import Exam
         
-        # Get the exam title if available
-        exam_title = None
-        exam = Exam.query.filter_by(id=self.exam_id).first()
-        if exam:
-            exam_title = exam.title
+        # Get the exam title if available and not already known (from the
+        # identity map when the exam is already loaded)
+        if exam_title is None:
+            exam = db.session.get(Exam, self.exam_id)
+            if exam:
+                exam_title = exam.title
             
         return {
             'id': self.id,
@@ -59,11 +61,11 @@ class Candidate(db.Model):
             'has_started': self.has_started,
             'has_completed': self.has_completed,
             'invitation_sent': self.invitation_sent,
-            'last_invited_at': self.last_invited_at.isoformat() if self.last_invited_at else None,
-            'test_start_time': self.test_start_time.isoformat() if self.test_start_time else None,
-            'test_end_time': self.test_end_time.isoformat() if self.test_end_time else None,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
+            'last_invited_at': self.last_invited_at,
+            'test_start_time': self.test_start_time,
+            'test_end_time': self.test_end_time,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'exam_id': self.exam_id,
             'exam_title': exam_title
         }
@@ -0,0 +1,25 @@
+from datetime import datetime
+from .. import db
+
+class DraftAnswer(db.Model):
+    """Autosaved answer for an exam that has not been submitted yet."""
+    __tablename__ = 'draft_answers'
+    __table_args__ = (
+        db.UniqueConstraint('candidate_id', 'question_id', name='uq_draft_answers_candidate_question'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    answer = db.Column(db.Text, nullable=True)  # JSON encoded answer value
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Foreign keys
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidates.id', ondelete='CASCADE'), nullable=False, index=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), nullable=False)
+
+    def __init__(self, candidate_id, question_id, answer=None):
+        self.candidate_id = candidate_id
+        self.question_id = question_id
+        self.answer = answer
+
+    def __repr__(self):
+        return f'<DraftAnswer {self.candidate_id}:{self.question_id}>'
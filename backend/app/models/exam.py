@@ -1,10 +1,16 @@
 from datetime import datetime
+from itertools import chain
 import uuid
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from .. import db
 
 class Exam(db.Model):
     """Exam model for defining tests."""
     __tablename__ = 'exams'
+    __table_args__ = (
+        db.UniqueConstraint('source_exam_id', 'source_version', name='uq_exams_source_version'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -15,6 +21,16 @@ class Exam(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Incremented whenever the exam or its questions change, used for ETags
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # When the exam was last deactivated, and when its results were moved to the archive
+    deactivated_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=True)
+    # Deleted exams are hidden at once and their rows purged in the background (see utils.purge)
+    deleted_at = db.Column(db.DateTime, nullable=True, index=True)
+    # Exam this one was cloned from; source_version is set on read-only snapshots of that version
+    source_exam_id = db.Column(db.Integer, db.ForeignKey('exams.id', ondelete='SET NULL'), nullable=True, index=True)
+    source_version = db.Column(db.Integer, nullable=True)
     
     # Foreign keys
     creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -32,9 +48,9 @@ class Exam(db.Model):
         self.is_randomized = is_randomized
         self.creator_id = creator_id
 
-    def to_dict(self):
+    def to_dict(self, include_questions=False):
         """Convert exam object to dictionary."""
-        return {
+        result = {
             'id': self.id,
             'title': self.title,
             'description': self.description,
@@ -42,11 +58,45 @@ class Exam(db.Model):
             'passing_score': self.passing_score,
             'is_randomized': self.is_randomized,
             'is_active': self.is_active,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'creator_id': self.creator_id,
+            'version': self.version,
+            'source_exam_id': self.source_exam_id,
+            'source_version': self.source_version,
             'question_count': len(self.questions)
         }
+        
+        if include_questions:
+            questions = sorted(self.questions, key=lambda q: (q.order is None, q.order, q.id))
+            result['questions'] = [question.to_dict() for question in questions]
+        
+        return result
 
     def __repr__(self):
-        return f'<Exam {self.title}>' 
\ No newline at end of file
+        return f'<Exam {self.title}>'
+
+
+@event.listens_for(Session, 'before_flush')
+def bump_exam_versions(session, flush_context, instances):
+    """Increment the version of every exam whose fields, questions or options change in this flush."""
+    from app.models.question import Question, Option
+    
+    exam_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Exam):
+            if obj in session.dirty and session.is_modified(obj, include_collections=False):
+                obj.version = Exam.version + 1
+        elif isinstance(obj, Question):
+            exam_ids.add(obj.exam_id)
+        elif isinstance(obj, Option):
+            question = obj.question
+            exam_ids.add(question.exam_id if question is not None else None)
+    
+    exam_ids.discard(None)
+    if exam_ids:
+        session.execute(
+            Exam.__table__.update()
+            .where(Exam.__table__.c.id.in_(exam_ids))
+            .values(version=Exam.__table__.c.version + 1, updated_at=datetime.utcnow())
+        )
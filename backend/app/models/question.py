@@ -12,15 +12,17 @@ class Question(db.Model):
     order = db.Column(db.Integer, nullable=True)  # For non-randomized exams
     # Make explanation column nullable and with a server default
     explanation = db.Column(db.Text, nullable=True, server_default='')
+    source_question_id = db.Column(db.Integer, nullable=True)  # Question this one was copied from
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Foreign keys
-    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # Relationships
     options = db.relationship('Option', backref='question', lazy=True, cascade='all, delete-orphan')
-    answers = db.relationship('Answer', backref='question', lazy=True)
+    # Deleted with the question, as answers.question_id cascades (SQLite runs without foreign key enforcement)
+    answers = db.relationship('Answer', backref='question', lazy=True, cascade='all, delete-orphan')
 
     def __init__(self, text, question_type, points, exam_id, explanation='', order=None):
         self.text = text
@@ -39,8 +41,8 @@ class Question(db.Model):
             'points': self.points,
             'order': self.order,
             'exam_id': self.exam_id,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
         
         # Try to access explanation, but don't fail if column doesn't exist yet
@@ -49,9 +51,9 @@ class Question(db.Model):
         except:
             result['explanation'] = ''
         
-        # Include options
+        # Include options, in the order answer bitmasks refer to
         options_list = []
-        for option in self.options:
+        for option in self.ordered_options:
             option_dict = {
                 'id': option.id,
                 'text': option.text,
@@ -64,6 +66,21 @@ class Question(db.Model):
         result['options'] = options_list
         return result
 
+    @property
+    def ordered_options(self):
+        """Options in display order; bit i of an answer's selected_mask stands for the i-th."""
+        return sorted(self.options, key=lambda option: (option.order is None, option.order, option.id))
+
+    @property
+    def option_ids(self):
+        """Ids of the options in display order."""
+        return tuple(option.id for option in self.ordered_options)
+
+    @property
+    def correct_mask(self):
+        """Bitmask of the correct options."""
+        return sum(1 << index for index, option in enumerate(self.ordered_options) if option.is_correct)
+
     def __repr__(self):
         return f'<Question {self.id}>'
 
@@ -76,11 +93,12 @@ class Option(db.Model):
     text = db.Column(db.Text, nullable=False)
     is_correct = db.Column(db.Boolean, default=False)
     order = db.Column(db.Integer, nullable=True)
+    source_option_id = db.Column(db.Integer, nullable=True)  # Option this one was copied from
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Foreign keys
-    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), nullable=False, index=True)
 
     def __init__(self, text, is_correct=False, question_id=None, order=None):
         self.text = text
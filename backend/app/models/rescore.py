@@ -0,0 +1,74 @@
+from datetime import datetime
+from .. import db
+
+
+class RescoreJob(db.Model):
+    """Re-scoring of an exam's results after its points or answer key changed."""
+    __tablename__ = 'rescore_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)  # pending, running, done
+    exam_version = db.Column(db.Integer, nullable=True)  # Version the results are re-scored against
+    total = db.Column(db.Integer, nullable=False, default=0)
+    done = db.Column(db.Integer, nullable=False, default=0)
+    changed = db.Column(db.Integer, nullable=False, default=0)  # Results whose score or pass changed
+    requested_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # Progress heartbeat
+
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    def to_dict(self):
+        """Convert the job to a dictionary."""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'exam_version': self.exam_version,
+            'total': self.total,
+            'done': self.done,
+            'changed': self.changed,
+            'requested_at': self.requested_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'exam_id': self.exam_id
+        }
+
+    def __repr__(self):
+        return f'<RescoreJob {self.id}>'
+
+
+class ScoreAudit(db.Model):
+    """Score of a result before and after a re-score changed it."""
+    __tablename__ = 'score_audits'
+
+    id = db.Column(db.Integer, primary_key=True)
+    old_score = db.Column(db.Float, nullable=True)
+    new_score = db.Column(db.Float, nullable=True)
+    old_passed = db.Column(db.Boolean, nullable=True)
+    new_passed = db.Column(db.Boolean, nullable=True)
+    old_version = db.Column(db.Integer, nullable=True)
+    new_version = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Results may live in an exam shard, so there is no foreign key to them
+    result_id = db.Column(db.BigInteger, nullable=False, index=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('rescore_jobs.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    def to_dict(self):
+        """Convert the audit entry to a dictionary."""
+        return {
+            'id': self.id,
+            'old_score': self.old_score,
+            'new_score': self.new_score,
+            'old_passed': self.old_passed,
+            'new_passed': self.new_passed,
+            'old_version': self.old_version,
+            'new_version': self.new_version,
+            'created_at': self.created_at,
+            'result_id': self.result_id,
+            'job_id': self.job_id
+        }
+
+    def __repr__(self):
+        return f'<ScoreAudit {self.id}>'
@@ -9,12 +9,13 @@ class Result(db.Model):
     score = db.Column(db.Float, nullable=True)  # Percentage
     passed = db.Column(db.Boolean, nullable=True)
     feedback = db.Column(db.Text, nullable=True)  # For manual evaluation
+    exam_version = db.Column(db.Integer, nullable=True)  # Exam version the result was graded against
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Foreign keys
-    candidate_id = db.Column(db.Integer, db.ForeignKey('candidates.id'), nullable=False)
-    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidates.id', ondelete='CASCADE'), nullable=False, index=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id', ondelete='CASCADE'), nullable=False, index=True)
     
     # Relationships
     answers = db.relationship('Answer', backref='result', lazy=True, cascade='all, delete-orphan')
@@ -46,10 +47,11 @@ class Result(db.Model):
             'score': self.score,
             'passed': self.passed,
             'feedback': self.feedback,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'candidate_id': self.candidate_id,
-            'exam_id': self.exam_id
+            'exam_id': self.exam_id,
+            'exam_version': self.exam_version
         }
         
         if include_answers:
@@ -66,7 +68,8 @@ class Answer(db.Model):
     __tablename__ = 'answers'
 
     id = db.Column(db.Integer, primary_key=True)
-    selected_option_id = db.Column(db.Integer, db.ForeignKey('options.id'), nullable=True)  # For multiple-choice
+    # Chosen options of a choice question: bit i stands for the i-th of Question.ordered_options
+    selected_mask = db.Column(db.BigInteger, nullable=True)
     text_response = db.Column(db.Text, nullable=True)  # For open-ended
     is_correct = db.Column(db.Boolean, nullable=True)  # For multiple-choice
     earned_points = db.Column(db.Float, nullable=True)  # Points earned for this answer
@@ -74,35 +77,36 @@ class Answer(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Foreign keys
-    result_id = db.Column(db.Integer, db.ForeignKey('results.id'), nullable=False)
-    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
-    
-    # Relationships
-    selected_option = db.relationship('Option', foreign_keys=[selected_option_id], lazy=True)
+    result_id = db.Column(db.Integer, db.ForeignKey('results.id', ondelete='CASCADE'), nullable=False, index=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), nullable=False, index=True)
 
-    def __init__(self, result_id, question_id, selected_option_id=None, text_response=None):
+    def __init__(self, result_id, question_id, selected_mask=None, text_response=None):
         self.result_id = result_id
         self.question_id = question_id
-        self.selected_option_id = selected_option_id
+        self.selected_mask = selected_mask
         self.text_response = text_response
         
-        # Automatically evaluate multiple-choice answers
-        if selected_option_id and not text_response:
-            self.evaluate_multiple_choice()
+        # Automatically evaluate choice answers
+        if selected_mask is not None and not text_response:
+            self.evaluate_choice()
         
-    def evaluate_multiple_choice(self):
-        """Evaluate if the selected option is correct for multiple-choice questions."""
-        if self.selected_option_id and self.question.question_type == 'multiple_choice':
-            option = next((o for o in self.question.options if o.id == self.selected_option_id), None)
-            if option:
-                self.is_correct = option.is_correct
-                self.earned_points = self.question.points if self.is_correct else 0
-            else:
-                self.is_correct = False
-                self.earned_points = 0
-        else:
+    @property
+    def selected_options(self):
+        """The chosen options, in display order."""
+        mask = self.selected_mask or 0
+        return [option for index, option in enumerate(self.question.ordered_options) if mask >> index & 1]
+
+    def evaluate_choice(self):
+        """Evaluate a choice answer by comparing its mask with the correct options' mask."""
+        from app.utils.grading import is_correct_choice
+        
+        is_correct = is_correct_choice(self.question, self.selected_mask)
+        if is_correct is None:
             self.is_correct = None
             self.earned_points = None
+        else:
+            self.is_correct = is_correct
+            self.earned_points = self.question.points if is_correct else 0
 
     def evaluate_open_ended(self, points_awarded):
         """Manually evaluate open-ended answers."""
@@ -114,12 +118,12 @@ class Answer(db.Model):
         """Convert answer object to dictionary."""
         return {
             'id': self.id,
-            'selected_option_id': self.selected_option_id,
+            'selected_mask': self.selected_mask,
             'text_response': self.text_response,
             'is_correct': self.is_correct,
             'earned_points': self.earned_points,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'result_id': self.result_id,
             'question_id': self.question_id
         }
@@ -1,6 +1,6 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from .. import db
+from ..utils.hashing import password_hasher
 
 class User(db.Model):
     """User model for administrators who can create and manage exams."""
@@ -20,12 +20,23 @@ class User(db.Model):
     def __init__(self, email, username, password, is_admin=False):
         self.email = email
         self.username = username
-        self.password_hash = generate_password_hash(password)
+        self.set_password(password)
         self.is_admin = is_admin
 
+    def set_password(self, password):
+        """Hash and store a password with the configured method."""
+        self.password_hash = password_hasher.hash(password)
+
     def check_password(self, password):
-        """Check if the provided password matches the stored hash."""
-        return check_password_hash(self.password_hash, password)
+        """Check if the provided password matches the stored hash.
+
+        Runs on the bounded hashing pool and raises HasherBusy when it is full.
+        """
+        return password_hasher.verify(self.password_hash, password)
+
+    def needs_rehash(self):
+        """Check if the stored hash is weaker than the configured hashing method."""
+        return password_hasher.needs_rehash(self.password_hash)
 
     def to_dict(self):
         """Convert user object to dictionary."""
@@ -34,8 +45,8 @@ class User(db.Model):
             'email': self.email,
             'username': self.username,
             'is_admin': self.is_admin,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
 
     def __repr__(self):
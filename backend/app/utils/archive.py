@@ -0,0 +1,256 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, insert, select
+from .. import db
+from ..models.archive import ArchivedResult, pack_answers, unpack_answers
+from ..models.exam import Exam
+from ..models.result import Result, Answer
+from .shards import exam_shards, shard_of
+
+logger = logging.getLogger(__name__)
+
+# Columns copied between results and archived_results
+RESULT_COLUMNS = ('id', 'score', 'passed', 'feedback', 'created_at', 'updated_at', 'candidate_id', 'exam_id',
+                  'exam_version')
+
+# Answer columns in the order pack_answers stores them, followed by the result id
+_ANSWER_SELECT = (Answer.id, Answer.selected_mask, Answer.text_response, Answer.is_correct,
+                  Answer.earned_points, Answer.created_at, Answer.updated_at, Answer.question_id, Answer.result_id)
+
+
+class ResultArchive:
+    """
+    Archive tier for the results and answers of exams nobody takes any more.
+
+    Once an exam has been inactive for ARCHIVE_AFTER_DAYS days, a background
+    thread moves its results into archived_results, one row per result with
+    the answers packed into a compressed column, in transactions of
+    ARCHIVE_CHUNK_SIZE results. The live results and answers tables only
+    keep the exams in use. The results API reads archived results
+    transparently; `flask archive restore` moves an exam's results back.
+
+    Every chunk first removes what an interrupted run may have left of it,
+    so archiving or restoring an exam can be run again after a failure.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.after_days = 0
+        self.interval = 3600
+        self.chunk_size = 500
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the archive commands and start the sweeper thread if archiving is enabled."""
+        self.app = app
+        self.after_days = app.config.get('ARCHIVE_AFTER_DAYS', 0)
+        self.interval = app.config.get('ARCHIVE_INTERVAL', 3600)
+        self.chunk_size = app.config.get('ARCHIVE_CHUNK_SIZE', 500)
+        app.extensions['result_archive'] = self
+        app.cli.add_command(archive_cli)
+        if self.enabled and not app.config.get('DEFER_BACKGROUND_TASKS', False):
+            self.start()
+
+    @property
+    def enabled(self):
+        return self.after_days > 0 and self.interval > 0
+
+    def after_fork(self):
+        """Start the sweeper thread in a forked worker."""
+        self._stop = threading.Event()
+        self._thread = None
+        if self.enabled:
+            self.start()
+
+    def start(self):
+        """Start the background sweeper thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='result-archiver', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    self.sweep()
+            except Exception as e:
+                logger.error(f"Result archiving failed: {str(e)}")
+
+    def due_exams(self, now=None):
+        """Return the ids of exams inactive for ARCHIVE_AFTER_DAYS days whose results are not archived yet."""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.after_days)
+        return [exam_id for exam_id, in db.session.query(Exam.id).filter(
+            Exam.is_active == False,  # noqa: E712
+            Exam.deleted_at.is_(None),
+            Exam.deactivated_at <= cutoff,
+            Exam.archived_at.is_(None)
+        ).order_by(Exam.id)]
+
+    def sweep(self):
+        """Archive every due exam and return the number of results moved."""
+        return sum(self.archive_exam(exam_id) for exam_id in self.due_exams())
+
+    def archive_exam(self, exam_id, resume=False):
+        """
+        Move the results and answers of an exam into the archive.
+
+        The exam is claimed by setting its archived_at, so workers sweeping at
+        the same time archive each exam once. resume archives an exam that is
+        already marked, e.g. after an interrupted run. Returns the number of
+        results moved.
+        """
+        now = datetime.utcnow()
+        claimed = db.session.query(Exam).filter(Exam.id == exam_id, Exam.archived_at.is_(None)).update(
+            {'archived_at': now}, synchronize_session=False
+        )
+        db.session.commit()
+        if not claimed and not resume:
+            return 0
+
+        session = exam_shards.session(exam_id)
+        moved = 0
+        try:
+            while True:
+                moved += self._archive_chunk(session, exam_id, now)
+                if moved % self.chunk_size or not session.execute(
+                    select(Result.id).where(Result.exam_id == exam_id).limit(1)
+                ).first():
+                    break
+        except Exception:
+            session.rollback()
+            db.session.rollback()
+            if claimed:
+                # Let the next sweep try again
+                db.session.query(Exam).filter(Exam.id == exam_id).update({'archived_at': None},
+                                                                         synchronize_session=False)
+                db.session.commit()
+            raise
+
+        logger.info(f"Archived {moved} results of exam {exam_id}")
+        return moved
+
+    def _archive_chunk(self, session, exam_id, now):
+        results = session.execute(
+            select(*(getattr(Result, column) for column in RESULT_COLUMNS))
+            .where(Result.exam_id == exam_id).order_by(Result.id).limit(self.chunk_size)
+        ).all()
+        if not results:
+            return 0
+        ids = [row.id for row in results]
+
+        answers = {}
+        for row in session.execute(select(*_ANSWER_SELECT).where(Answer.result_id.in_(ids)).order_by(Answer.id)):
+            answers.setdefault(row.result_id, []).append(tuple(row)[:-1])
+
+        db.session.execute(delete(ArchivedResult).where(ArchivedResult.id.in_(ids)))
+        db.session.execute(insert(ArchivedResult), [
+            dict(zip(RESULT_COLUMNS, row), answers=pack_answers(answers.get(row.id, [])), archived_at=now)
+            for row in results
+        ])
+        if session is not db.session:
+            # The archive is committed before the shard rows go, so a failure in
+            # between leaves copies that the next run replaces, never a loss
+            db.session.commit()
+
+        session.execute(delete(Answer).where(Answer.result_id.in_(ids)).execution_options(synchronize_session=False))
+        session.execute(delete(Result).where(Result.id.in_(ids)).execution_options(synchronize_session=False))
+        session.commit()
+        return len(results)
+
+    def restore_exam(self, exam_id):
+        """
+        Move the archived results of an exam back into the results and answers tables.
+
+        Results go back to the database their id belongs to. The exam's
+        deactivation time is reset, so a still inactive exam is only archived
+        again after another ARCHIVE_AFTER_DAYS days. Returns the number of
+        results restored.
+        """
+        restored = 0
+        while True:
+            archived = db.session.query(ArchivedResult).filter(ArchivedResult.exam_id == exam_id).order_by(
+                ArchivedResult.id
+            ).limit(self.chunk_size).all()
+            if not archived:
+                break
+
+            shards = {}
+            for row in archived:
+                shards.setdefault(shard_of(row.id), []).append(row)
+            for shard_id, rows in shards.items():
+                self._restore_rows(exam_shards.session(shard_id, create=True), rows)
+
+            db.session.execute(delete(ArchivedResult).where(ArchivedResult.id.in_([row.id for row in archived])))
+            db.session.commit()
+            restored += len(archived)
+
+        now = datetime.utcnow()
+        db.session.query(Exam).filter(Exam.id == exam_id).update({
+            'archived_at': None,
+            'deactivated_at': db.case((Exam.is_active == False, now), else_=None)  # noqa: E712
+        }, synchronize_session=False)
+        db.session.commit()
+        logger.info(f"Restored {restored} results of exam {exam_id}")
+        return restored
+
+    def _restore_rows(self, session, rows):
+        ids = [row.id for row in rows]
+        # Rows left by an interrupted restore
+        session.execute(delete(Answer).where(Answer.result_id.in_(ids)).execution_options(synchronize_session=False))
+        session.execute(delete(Result).where(Result.id.in_(ids)).execution_options(synchronize_session=False))
+
+        session.execute(insert(Result), [{column: getattr(row, column) for column in RESULT_COLUMNS} for row in rows])
+        answers = [dict(answer, result_id=row.id) for row in rows for answer in unpack_answers(row.answers)]
+        if answers:
+            session.execute(insert(Answer), answers)
+        if session is not db.session:
+            # Committed before the archive rows are removed, like when archiving
+            session.commit()
+
+
+# Shared result archive, bound to the app in create_app
+result_archive = ResultArchive()
+
+archive_cli = AppGroup('archive', help='Move the results of inactive exams into the archive and back.')
+
+
+@archive_cli.command('run')
+@click.option('--exam', 'exam_ids', type=int, multiple=True,
+              help='Archive this inactive exam now, or finish an interrupted run (repeatable).')
+def archive_command(exam_ids):
+    """Archive the results of exams inactive for ARCHIVE_AFTER_DAYS days."""
+    if not exam_ids:
+        if result_archive.after_days <= 0:
+            raise click.UsageError('ARCHIVE_AFTER_DAYS is not set, pass the exams to archive with --exam')
+        exam_ids = result_archive.due_exams()
+
+    for exam_id in exam_ids:
+        exam = db.session.get(Exam, exam_id)
+        if exam is None or exam.deleted_at is not None:
+            raise click.BadParameter(f'Exam {exam_id} does not exist', param_hint='--exam')
+        if exam.is_active:
+            raise click.BadParameter(f'Exam {exam_id} is active, deactivate it first', param_hint='--exam')
+        click.echo(f'Archived {result_archive.archive_exam(exam_id, resume=True)} results of exam {exam_id}')
+
+
+@archive_cli.command('restore')
+@click.argument('exam_id', type=int)
+def restore_command(exam_id):
+    """Move the archived results of an exam back into the live tables."""
+    exam = db.session.get(Exam, exam_id)
+    if exam is None or exam.deleted_at is not None:
+        raise click.BadParameter(f'Exam {exam_id} does not exist', param_hint='EXAM_ID')
+    click.echo(f'Restored {result_archive.restore_exam(exam_id)} results of exam {exam_id}')
@@ -0,0 +1,78 @@
+from .. import db
+from .shards import SHARDED_MODELS, exam_shards
+
+# Async drivers used in place of the configured sync ones
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def async_database_url(url):
+    """Return the async driver variant of a SQLAlchemy URL, e.g. sqlite+aiosqlite for sqlite."""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver is known for '{backend}' databases, set ASYNC_DATABASE_URI")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """
+    Async engine and sessions for the views served under ASGI (see app.asgi).
+
+    The engine points at the same database as db.engine, through an async
+    driver (aiosqlite or asyncpg) unless ASYNC_DATABASE_URI names one. Views
+    run the regular ORM code against it with AsyncSession.run_sync, so only
+    the waits on the database yield to the event loop.
+    """
+
+    def __init__(self, app=None):
+        self.engine = None
+        self._sessionmaker = None
+        self._shard_engines = {}  # exam id -> async engine of the exam's shard
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Create the async engine for an app."""
+        try:
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        except ImportError as e:
+            raise RuntimeError('The async serving mode needs greenlet and an async driver, '
+                               'e.g. pip install greenlet aiosqlite') from e
+
+        url = app.config.get('ASYNC_DATABASE_URI')
+        if not url:
+            with app.app_context():
+                url = async_database_url(db.engine.url)
+        self.engine = create_async_engine(url)
+        # Loaded rows stay usable after a commit without being queried again
+        self._sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+        app.extensions['async_db'] = self
+
+    def session(self, exam_id=None):
+        """
+        Return a new AsyncSession, to be used as an async context manager.
+
+        With exam sharding (see ExamShards), passing an exam with a shard binds
+        the sharded models to that shard.
+        """
+        if exam_id is None or not exam_shards.exists(exam_id):
+            return self._sessionmaker()
+        engine = self._shard_engines.get(exam_id)
+        if engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            # Creates the shard tables if they are missing
+            exam_shards.engine(exam_id)
+            engine = self._shard_engines[exam_id] = create_async_engine(f'sqlite+aiosqlite:///{exam_shards.path(exam_id)}')
+        return self._sessionmaker(binds={model: engine for model in SHARDED_MODELS})
+
+    async def dispose(self):
+        for engine in [self.engine, *self._shard_engines.values()]:
+            if engine is not None:
+                await engine.dispose()
+        self._shard_engines = {}
+
+
+# Shared async database, bound to the app in app.asgi.create_asgi_app
+async_db = AsyncDatabase()
@@ -0,0 +1,227 @@
+import atexit
+import json
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .. import db
+from ..models.candidate import Candidate
+from ..models.draft import DraftAnswer
+from .shards import exam_shards, shard_of
+
+logger = logging.getLogger(__name__)
+
+# Flushes an answer may fail in before it is dropped
+MAX_FLUSH_ATTEMPTS = 3
+
+
+class AnswerBuffer:
+    """
+    In-memory buffer that coalesces autosaved answers before they hit the database.
+
+    Writes are keyed by (candidate_id, question_id) so repeated saves of the same
+    question overwrite each other (last write wins). A background thread flushes
+    the buffer to the draft_answers table in one transaction every
+    AUTOSAVE_FLUSH_INTERVAL seconds, skipping candidates who have submitted
+    meanwhile. Answers of a failed flush are retried with the next one, up
+    to MAX_FLUSH_ATTEMPTS times.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 0
+        self._pending = {}  # candidate_id -> {question_id: (answer_json, saved_at, failed_flushes)}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the buffer to an app and start the flusher thread if enabled."""
+        self.app = app
+        self.interval = app.config.get('AUTOSAVE_FLUSH_INTERVAL', 0)
+        app.extensions['autosave'] = self
+        if self.interval > 0 and not app.config.get('DEFER_BACKGROUND_TASKS', False):
+            self.start()
+
+    def after_fork(self):
+        """Reset the locks and start the flusher thread in a forked worker."""
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.interval > 0:
+            self.start()
+
+    def start(self):
+        """Start the background flusher thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='autosave-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the flusher thread and write out anything still pending."""
+        self._stop.set()
+        if self.app is not None:
+            with self.app.app_context():
+                self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                logger.error(f"Autosave flush failed: {str(e)}")
+
+    def put(self, candidate_id, answers, question_ids):
+        """
+        Buffer answers (keyed by question id) for a candidate.
+
+        Raises ValueError, buffering nothing, if a key is not one of
+        question_ids, the ids of the questions of the candidate's exam.
+        """
+        now = datetime.utcnow()
+        encoded = {int(question_id): (json.dumps(value), now, 0) for question_id, value in answers.items()}
+        if not encoded.keys() <= question_ids:
+            raise ValueError('Answers must be keyed by the ids of the questions of the exam')
+        with self._lock:
+            self._pending.setdefault(candidate_id, {}).update(encoded)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def pending_for(self, candidate_id):
+        """Return the buffered answers of a candidate without removing them."""
+        with self._lock:
+            entries = dict(self._pending.get(candidate_id, {}))
+        return {str(question_id): json.loads(entry[0]) for question_id, entry in entries.items()}
+
+    def pop(self, candidate_id):
+        """
+        Remove and return the buffered answers of a candidate.
+
+        Waits for a flush in progress, so the answers it took are in the
+        draft table when this returns and no flush writes them afterwards.
+        """
+        with self._flush_lock, self._lock:
+            entries = self._pending.pop(candidate_id, {})
+        return {str(question_id): json.loads(entry[0]) for question_id, entry in entries.items()}
+
+    def flush(self):
+        """Write all buffered answers to the draft table, in one transaction per exam shard."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            shards = {}
+            for candidate_id, entries in batch.items():
+                shards.setdefault(shard_of(candidate_id), {})[candidate_id] = entries
+
+            written, failed = 0, None
+            for exam_id, shard_batch in shards.items():
+                session = exam_shards.session(exam_id)
+                rows = [
+                    {'candidate_id': candidate_id, 'question_id': question_id, 'answer': value, 'updated_at': saved_at}
+                    for candidate_id, entries in shard_batch.items()
+                    for question_id, (value, saved_at, _) in entries.items()
+                ]
+                try:
+                    self._upsert(session, rows)
+                    discarded = self._discard_completed(session, list(shard_batch))
+                    session.commit()
+                    written += len(rows) - discarded
+                except Exception as e:
+                    session.rollback()
+                    self._requeue(shard_batch)
+                    failed = e
+            if failed is not None:
+                raise failed
+            return written
+
+    def _requeue(self, batch):
+        # Put a failed batch back without clobbering answers saved since the swap,
+        # dropping the answers that failed too often
+        dropped = 0
+        with self._lock:
+            for candidate_id, entries in batch.items():
+                for question_id, (value, saved_at, failures) in entries.items():
+                    if failures + 1 >= MAX_FLUSH_ATTEMPTS:
+                        dropped += 1
+                        continue
+                    self._pending.setdefault(candidate_id, {}).setdefault(question_id, (value, saved_at, failures + 1))
+        if dropped:
+            logger.warning(f"Dropped {dropped} autosaved answers after {MAX_FLUSH_ATTEMPTS} failed flushes")
+
+    def _discard_completed(self, session, candidate_ids):
+        # A candidate may have submitted since buffering, through another worker whose
+        # submission could not drain this buffer, so their drafts are deleted again
+        completed = select(Candidate.id).where(Candidate.id.in_(candidate_ids), Candidate.is_test_completed.is_(True))
+        result = session.execute(DraftAnswer.__table__.delete().where(DraftAnswer.candidate_id.in_(completed)))
+        return result.rowcount
+
+    def _upsert(self, session, rows):
+        table = DraftAnswer.__table__
+        dialect = session.get_bind(DraftAnswer).dialect.name
+
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['candidate_id', 'question_id'],
+                set_={'answer': stmt.excluded.answer, 'updated_at': stmt.excluded.updated_at}
+            )
+            session.execute(stmt, rows)
+            return
+
+        # Generic fallback: replace the affected keys
+        for row in rows:
+            table_filter = (table.c.candidate_id == row['candidate_id']) & (table.c.question_id == row['question_id'])
+            session.execute(table.delete().where(table_filter))
+        session.execute(table.insert(), rows)
+
+
+def load_drafts(candidate_id, session=None, drain=False):
+    """
+    Return the saved drafts of a candidate merged with buffered answers.
+
+    With drain the buffered answers are removed first, for a submission
+    that deletes the drafts, so no flush can write them back afterwards.
+    """
+    buffered = autosave_buffer.pop(candidate_id) if drain else None
+    rows = (session or db.session).query(DraftAnswer.question_id, DraftAnswer.answer).filter_by(candidate_id=candidate_id).all()
+    drafts = {str(question_id): json.loads(answer) for question_id, answer in rows if answer is not None}
+    drafts.update(buffered if drain else autosave_buffer.pending_for(candidate_id))
+    return drafts
+
+
+def load_drafts_bulk(candidate_ids, session=None):
+    """Return {candidate_id: drafts} for several candidates in one query, draining their buffers."""
+    drafts = {candidate_id: {} for candidate_id in candidate_ids}
+    if not candidate_ids:
+        return drafts
+
+    buffered = {candidate_id: autosave_buffer.pop(candidate_id) for candidate_id in candidate_ids}
+    rows = (session or db.session).query(DraftAnswer.candidate_id, DraftAnswer.question_id, DraftAnswer.answer).filter(
+        DraftAnswer.candidate_id.in_(candidate_ids)
+    ).all()
+    for candidate_id, question_id, answer in rows:
+        if answer is not None:
+            drafts[candidate_id][str(question_id)] = json.loads(answer)
+
+    for candidate_id in candidate_ids:
+        drafts[candidate_id].update(buffered[candidate_id])
+    return drafts
+
+
+# Shared buffer, bound to the app in create_app
+autosave_buffer = AnswerBuffer()
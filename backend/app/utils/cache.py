@@ -0,0 +1,390 @@
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app, g, has_app_context
+from sqlalchemy.orm import selectinload
+from .. import db
+from ..models.exam import Exam
+from ..models.question import Question
+from .compression import deflate_fragment
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after a fixed time."""
+
+    def __init__(self, maxsize=256, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return a cached value, or default if it is missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry if full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a value if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every value."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# What the exam stamp query returns for an exam
+ExamStamp = namedtuple('ExamStamp', 'version creator_id updated_at')
+
+
+class ExamVersions:
+    """
+    Version counters of exams, read at most once per exam per request.
+
+    Exam.version is bumped in the same transaction as any change to an exam,
+    its questions or its options (see bump_exam_versions), so a cached value
+    built from version N is current exactly while the row still says N. The
+    counter is read with the owner and the modification time in one narrow
+    query and memoized on flask.g, so every worker sees a change on its next
+    request without a round trip per cached key.
+    """
+
+    def lookup(self, exam_id, session=None):
+        """Return the ExamStamp of an exam, or None if the exam does not exist or is deleted."""
+        exam_id = int(exam_id)
+        stamps = self._request_stamps()
+        if exam_id in stamps:
+            return stamps[exam_id]
+
+        row = (session or db.session).query(Exam.version, Exam.creator_id, Exam.updated_at).filter(
+            Exam.id == exam_id, Exam.deleted_at.is_(None)
+        ).first()
+        stamp = stamps[exam_id] = ExamStamp(*row) if row else None
+        return stamp
+
+    def version(self, exam_id, session=None):
+        """Return the version counter of an exam, or None if the exam does not exist."""
+        stamp = self.lookup(exam_id, session)
+        return stamp.version if stamp is not None else None
+
+    def forget(self, exam_id):
+        """Read the exam's counter again on its next lookup in this request."""
+        self._request_stamps().pop(int(exam_id), None)
+
+    def _request_stamps(self):
+        if not has_app_context():
+            return {}
+        stamps = g.get('_exam_stamps')
+        if stamps is None:
+            stamps = g._exam_stamps = {}
+        return stamps
+
+
+# Shared exam version reader
+exam_versions = ExamVersions()
+
+
+class SQLiteCacheStore:
+    """
+    Shared cache tier in a memory-mapped SQLite file.
+
+    The gunicorn workers of a node read values the others already built
+    straight from the shared mapping of the file instead of rebuilding them.
+    Each value is stored with its version, and a value is only replaced by
+    one of the same or a newer version.
+    """
+
+    def __init__(self, path, mmap_size=64 * 2 ** 20):
+        self.path = path
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS entries (name TEXT, key TEXT, version INTEGER, value BLOB, '
+                     'PRIMARY KEY (name, key))')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+            self._local.conn = conn
+        return conn
+
+    def after_fork(self):
+        # SQLite connections must not be shared with a forked process
+        self._local = threading.local()
+
+    def get(self, name, key, version):
+        row = self._connect().execute(
+            'SELECT value FROM entries WHERE name = ? AND key = ? AND version = ?', (name, str(key), version)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, name, key, version, value):
+        self._connect().execute(
+            'INSERT INTO entries (name, key, version, value) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (name, key) DO UPDATE SET version = excluded.version, value = excluded.value '
+            'WHERE excluded.version >= entries.version',
+            (name, str(key), version, value)
+        )
+
+    def delete(self, name, key):
+        self._connect().execute('DELETE FROM entries WHERE name = ? AND key = ?', (name, str(key)))
+
+
+def shared_store(app):
+    """Return the shared cache tier configured for an app, or None for process-local caches only."""
+    if 'cache_store' not in app.extensions:
+        store = None
+        if app.config.get('CACHE_SHARED_STORE') == 'sqlite':
+            path = app.config.get('CACHE_SHARED_PATH') or os.path.join(app.instance_path, 'cache.db')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            store = SQLiteCacheStore(path, app.config.get('CACHE_MMAP_SIZE', 64 * 2 ** 20))
+        app.extensions['cache_store'] = store
+    return app.extensions['cache_store']
+
+
+class VersionedCache:
+    """
+    Two-tier cache of values built from an exam at a given version.
+
+    Lookups pass the exam's current version (see exam_versions) and only
+    return a value built from that version: first from the process-local LRU
+    tier, then from the shared tier if one is configured. Stale values are
+    never returned, so invalidation needs no messages between workers.
+    """
+
+    def __init__(self, name, maxsize=256, ttl=300):
+        self.name = name
+        self.local = TTLCache(maxsize, ttl)  # key -> (version, value)
+        self.store = None
+
+    def configure(self, app, maxsize, ttl):
+        """Size the local tier and attach the app's shared tier."""
+        self.local = TTLCache(maxsize, ttl)
+        self.store = shared_store(app)
+
+    def after_fork(self):
+        if self.store is not None:
+            self.store.after_fork()
+
+    def dumps(self, value):
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+    def get(self, key, version):
+        """Return the value built from this version, or None."""
+        entry = self.local.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        if self.store is not None:
+            data = self.store.get(self.name, key, version)
+            if data is not None:
+                try:
+                    value = self.loads(data)
+                except Exception:
+                    # Written by an older release in another format; rebuilt by the caller
+                    return None
+                self.local.set(key, (version, value))
+                return value
+        return None
+
+    def set(self, key, version, value):
+        """Store a value built from a version in both tiers."""
+        self.local.set(key, (version, value))
+        if self.store is not None:
+            self.store.set(self.name, key, version, self.dumps(value))
+
+    def delete(self, key):
+        """Remove a value from both tiers."""
+        self.local.delete(key)
+        if self.store is not None:
+            self.store.delete(self.name, key)
+
+    def clear(self):
+        """Remove every value from the local tier."""
+        self.local.clear()
+
+    def __len__(self):
+        return len(self.local)
+
+
+class ExamPayload:
+    """Delivery payload of an exam together with its encoded forms."""
+
+    __slots__ = ('data', 'json', '_deflated')
+
+    def __init__(self, data, json=None):
+        self.data = data
+        self.json = json if json is not None else current_app.json.dumps(data).encode('utf-8')
+        self._deflated = None
+
+    @classmethod
+    def from_json(cls, json):
+        """Rebuild a payload from its encoded JSON."""
+        return cls(current_app.json.loads(json), json)
+
+    def deflated(self, level=6):
+        """Return the JSON as spliceable deflate blocks, compressing it on first use."""
+        if self._deflated is None:
+            self._deflated = deflate_fragment(self.json, level)
+        return self._deflated
+
+
+class ExamPayloadCache(VersionedCache):
+    """Cache of serialized exam delivery payloads, keyed by exam id."""
+
+    def __init__(self, maxsize=256, ttl=300):
+        super().__init__('exam_payload', maxsize, ttl)
+        self._loading = {}  # (exam id, version) -> asyncio task loading the entry
+
+    def init_app(self, app):
+        """Size the cache from the app config."""
+        self.configure(app, app.config.get('EXAM_CACHE_SIZE', 256), app.config.get('EXAM_CACHE_TTL', 300))
+        app.extensions['exam_payload_cache'] = self
+
+    def dumps(self, entry):
+        # Only the JSON is shared, the other forms are rebuilt from it
+        return entry.json
+
+    def loads(self, data):
+        return ExamPayload.from_json(data)
+
+    def get_entry(self, exam_id, session=None):
+        """Return the cached ExamPayload of an exam, or None if the exam does not exist."""
+        version = exam_versions.version(exam_id, session)
+        if version is None:
+            return None
+        entry = self.get(exam_id, version)
+        if entry is not None:
+            return entry
+
+        exam = (session or db.session).get(Exam, exam_id)
+        if not exam:
+            return None
+
+        entry = ExamPayload(exam.to_dict(include_questions=True))
+        # An exam loaded earlier in the session may predate the counter just read
+        self.set(exam_id, min(version, exam.version), entry)
+        return entry
+
+    async def get_entry_async(self, exam_id, session, session_factory):
+        """
+        Return the cached ExamPayload of an exam from async code.
+
+        The version is checked in the caller's AsyncSession. A miss is loaded
+        in its own session from session_factory (an async sessionmaker), and
+        concurrent misses of the same exam version wait for that single load
+        instead of each querying the database.
+        """
+        version = await session.run_sync(lambda sync_session: exam_versions.version(exam_id, sync_session))
+        if version is None:
+            return None
+        entry = self.get(exam_id, version)
+        if entry is not None:
+            return entry
+
+        loading = self._loading.get((exam_id, version))
+        if loading is None:
+            loading = self._loading[exam_id, version] = asyncio.ensure_future(self._load_async(exam_id, session_factory))
+            loading.add_done_callback(lambda _: self._loading.pop((exam_id, version), None))
+        # A cancelled request must not cancel the load other requests wait on
+        return await asyncio.shield(loading)
+
+    async def _load_async(self, exam_id, session_factory):
+        async with session_factory() as session:
+            return await session.run_sync(lambda sync_session: self.get_entry(exam_id, sync_session))
+
+    def get_payload(self, exam_id):
+        """Return the delivery payload of an exam (with questions), or None if it does not exist."""
+        entry = self.get_entry(exam_id)
+        return entry.data if entry is not None else None
+
+
+# Grading view of an exam, with the same attributes grade_answers and
+# record_submission read from the models
+# (version is the exam version graded against)
+AnswerKey = namedtuple('AnswerKey', 'id duration_minutes passing_score questions version')
+# (option_ids in display order, correct_mask precomputed over them)
+KeyQuestion = namedtuple('KeyQuestion', 'id question_type points option_ids correct_mask')
+
+
+class AnswerKeyCache(VersionedCache):
+    """Cache of the answer keys used to grade submissions, keyed by exam id."""
+
+    def __init__(self, maxsize=256, ttl=300):
+        super().__init__('answer_key', maxsize, ttl)
+
+    def init_app(self, app):
+        """Size the cache from the app config."""
+        self.configure(app, app.config.get('EXAM_CACHE_SIZE', 256), app.config.get('EXAM_CACHE_TTL', 300))
+        app.extensions['answer_key_cache'] = self
+
+    def get_key(self, exam_id, session=None):
+        """Return the AnswerKey of an exam, or None if the exam does not exist."""
+        version = exam_versions.version(exam_id, session)
+        if version is None:
+            return None
+        key = self.get(exam_id, version)
+        if key is not None:
+            return key
+
+        exam = (session or db.session).query(Exam).options(
+            selectinload(Exam.questions).selectinload(Question.options)
+        ).filter(Exam.id == exam_id).first()
+        if not exam:
+            return None
+
+        key = AnswerKey(exam.id, exam.duration_minutes, exam.passing_score, tuple(
+            KeyQuestion(question.id, question.question_type, question.points, question.option_ids,
+                        question.correct_mask)
+            for question in exam.questions
+        ), exam.version)
+        self.set(exam_id, min(version, exam.version), key)
+        return key
+
+
+# Shared caches, bound to the app in create_app
+exam_payload_cache = ExamPayloadCache()
+answer_key_cache = AnswerKeyCache()
+
+
+def invalidate_exam(exam_id):
+    """
+    Drop cached data for an exam after it or its questions changed.
+
+    Other workers notice the change through the exam's version counter; this
+    frees the entries and makes the rest of the request read the new version.
+    """
+    exam_versions.forget(exam_id)
+    exam_payload_cache.delete(int(exam_id))
+    answer_key_cache.delete(int(exam_id))
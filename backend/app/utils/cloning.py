@@ -0,0 +1,147 @@
+"""
+Exam clones and version snapshots, copied server-side.
+
+An exam is copied with one INSERT ... SELECT for its questions and one for
+their options, whatever the number of questions. Each copied question
+keeps the id it was copied from in source_question_id, and the options
+are inserted by joining on it, which remaps their question ids without a
+round trip per row. Copies of options keep source_option_id the same way.
+
+A snapshot is a read-only copy of an exam at one version (source_version).
+Results record the version they were graded against, and the first change
+to an exam after a result was graded against its current version snapshots
+that version first, so graded results keep a copy of the questions and
+options they were graded with. Deleting a question moves the answers of
+graded results to the snapshots' copies of it.
+"""
+from datetime import datetime
+from sqlalchemy import literal, select, update
+from .. import db
+from ..models.archive import ArchivedResult
+from ..models.exam import Exam
+from ..models.question import Question, Option
+from ..models.result import Result, Answer
+from .shards import exam_shards
+
+# Columns copied from the source rows; ids, parents and timestamps are set on the copy
+QUESTION_COLUMNS = ('text', 'question_type', 'points', 'order', 'explanation')
+OPTION_COLUMNS = ('text', 'is_correct', 'order')
+
+
+def copy_exam(exam, creator_id, title=None, snapshot=False, session=None):
+    """
+    Copy an exam with its questions and options in the session's transaction.
+
+    Args:
+        exam: Exam to copy
+        creator_id: Owner of the copy
+        title (str, optional): Title of the copy, by default the source title
+        snapshot (bool): Make a read-only snapshot of the exam's current
+            version instead of an editable, active clone
+
+    Returns:
+        Exam: The copy, flushed but not committed
+    """
+    session = session or db.session
+    copy = Exam(
+        title=title or exam.title,
+        description=exam.description,
+        duration_minutes=exam.duration_minutes,
+        passing_score=exam.passing_score,
+        is_randomized=exam.is_randomized,
+        creator_id=creator_id
+    )
+    copy.is_active = not snapshot
+    copy.source_exam_id = exam.id
+    copy.source_version = exam.version if snapshot else None
+    session.add(copy)
+    session.flush()
+
+    now = datetime.utcnow()
+    questions = Question.__table__
+    session.execute(questions.insert().from_select(
+        QUESTION_COLUMNS + ('exam_id', 'source_question_id', 'created_at', 'updated_at'),
+        select(*(questions.c[column] for column in QUESTION_COLUMNS),
+               literal(copy.id), questions.c.id, literal(now), literal(now))
+        .where(questions.c.exam_id == exam.id).order_by(questions.c.id)
+    ))
+
+    options = Option.__table__
+    copies = questions.alias('copies')
+    session.execute(options.insert().from_select(
+        OPTION_COLUMNS + ('question_id', 'source_option_id', 'created_at', 'updated_at'),
+        select(*(options.c[column] for column in OPTION_COLUMNS),
+               copies.c.id, options.c.id, literal(now), literal(now))
+        .join_from(options, copies, copies.c.source_question_id == options.c.question_id)
+        .where(copies.c.exam_id == copy.id).order_by(options.c.id)
+    ))
+    return copy
+
+
+def snapshot_of(exam_id, version, session=None):
+    """Return the snapshot of an exam at a version, or None."""
+    return (session or db.session).query(Exam).filter(
+        Exam.source_exam_id == exam_id, Exam.source_version == version, Exam.deleted_at.is_(None)
+    ).first()
+
+
+def is_graded(exam_id, version):
+    """Check if a result, live or archived, was graded against a version of an exam."""
+    graded = exam_shards.session(exam_id).query(Result.id).filter(
+        Result.exam_id == exam_id, Result.exam_version == version
+    ).first()
+    return graded is not None or db.session.query(ArchivedResult.id).filter(
+        ArchivedResult.exam_id == exam_id, ArchivedResult.exam_version == version
+    ).first() is not None
+
+
+def prepare_exam_change(exam_id):
+    """
+    Snapshot an exam's current version before a change, if results were graded against it.
+
+    Call before changing the exam or its questions; the snapshot is committed
+    with the change. Returns False if the exam is itself a snapshot, which
+    cannot be changed.
+    """
+    exam = db.session.get(Exam, exam_id)
+    if exam is None:
+        return True
+    if exam.source_version is not None:
+        return False
+    if snapshot_of(exam.id, exam.version) is None and is_graded(exam.id, exam.version):
+        copy_exam(exam, exam.creator_id, snapshot=True)
+    return True
+
+
+def move_answers_to_snapshots(question):
+    """
+    Point the answers to a question at its copy in the snapshot of the version each result was graded against.
+
+    Call after prepare_exam_change and before deleting the question. Returns
+    False, without moving anything, if some answers belong to results of a
+    version without a snapshot (results graded before versions were kept).
+    """
+    exam_id = question.exam_id
+    session = exam_shards.session(exam_id)
+    versions = {version for version, in session.query(Result.exam_version).join(Answer, Answer.result_id == Result.id)
+                .filter(Answer.question_id == question.id).distinct()}
+    if not versions:
+        return True
+    if None in versions:
+        return False
+    copies = dict(db.session.query(Exam.source_version, Question.id).join(Question, Question.exam_id == Exam.id).filter(
+        Exam.source_exam_id == exam_id, Exam.source_version.in_(versions), Exam.deleted_at.is_(None),
+        Question.source_question_id == question.id
+    ).all())
+    if set(copies) != versions:
+        return False
+
+    for version, copy_id in copies.items():
+        graded = select(Result.id).where(Result.exam_id == exam_id, Result.exam_version == version)
+        session.execute(update(Answer).where(Answer.question_id == question.id, Answer.result_id.in_(graded))
+                        .values(question_id=copy_id).execution_options(synchronize_session=False))
+    if session is not db.session:
+        # A shard commits on its own, so the copies are committed before its answers point at them
+        db.session.commit()
+        session.commit()
+    return True
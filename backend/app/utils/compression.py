@@ -0,0 +1,160 @@
+import gzip
+import struct
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Gzip member header: magic, deflate, no flags, no mtime, no extra flags, unknown OS
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/csv', 'text/css', 'application/javascript'}
+
+
+def deflate_fragment(data, level=6):
+    """
+    Compress data into raw deflate blocks that can be spliced into a larger stream.
+
+    The blocks end with a full flush, so they are byte aligned and do not refer
+    back to anything before them. A fragment compressed once can be placed
+    between other fragments of a gzip response without recompressing it.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+
+def gzip_splice(fragments, level=6):
+    """
+    Build a gzip body from (raw_bytes, deflated_bytes_or_None) fragments.
+
+    Fragments without precompressed bytes are compressed on the fly. The CRC
+    and length in the trailer are computed over the raw bytes.
+    """
+    crc = 0
+    size = 0
+    parts = [GZIP_HEADER]
+    for raw, deflated in fragments:
+        crc = zlib.crc32(raw, crc)
+        size += len(raw)
+        parts.append(deflated if deflated is not None else deflate_fragment(raw, level))
+
+    # An empty final block terminates the deflate stream
+    parts.append(zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS).flush(zlib.Z_FINISH))
+    parts.append(struct.pack('<II', crc & 0xffffffff, size & 0xffffffff))
+    return b''.join(parts)
+
+
+# Input size after which streamed output is flushed to the client
+STREAM_FLUSH_BYTES = 16 * 1024
+
+
+def _encoded_chunks(chunks):
+    for chunk in chunks:
+        yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    pending = 0
+    for chunk in _encoded_chunks(chunks):
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        # Sync flush now and then so a slow generator still reaches the client
+        if pending >= STREAM_FLUSH_BYTES:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if data:
+            yield data
+    yield compressor.flush(zlib.Z_FINISH)
+
+
+def _brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    pending = 0
+    for chunk in _encoded_chunks(chunks):
+        data = compressor.process(chunk)
+        pending += len(chunk)
+        if pending >= STREAM_FLUSH_BYTES:
+            data += compressor.flush()
+            pending = 0
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class Compressor:
+    """
+    Compresses responses according to the client's Accept-Encoding.
+
+    Brotli is used when the optional brotli package is installed and preferred
+    by the client, gzip otherwise. Buffered responses below COMPRESS_MIN_SIZE
+    are sent as-is. Streamed responses are compressed chunk by chunk.
+    Responses that already carry a Content-Encoding are left alone.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.min_size = 1024
+        self.level = 6
+        self.brotli_quality = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the compression hook on the app."""
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 5)
+        app.extensions['compressor'] = self
+        app.after_request(self.compress_response)
+
+    def negotiate(self):
+        """Return the best encoding the client accepts ('br', 'gzip') or None."""
+        if not self.enabled:
+            return None
+        offers = ['br', 'gzip'] if brotli is not None else ['gzip']
+        return request.accept_encodings.best_match(offers)
+
+    def accepts_gzip(self):
+        """Check if the client accepts gzip."""
+        return self.enabled and request.accept_encodings['gzip'] > 0
+
+    def compress_response(self, response):
+        if (not self.enabled
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            chunks = response.response
+            if encoding == 'br':
+                response.response = _brotli_stream(chunks, self.brotli_quality)
+            else:
+                response.response = _gzip_stream(chunks, self.level)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            if encoding == 'br':
+                response.set_data(brotli.compress(data, quality=self.brotli_quality))
+            else:
+                response.set_data(gzip.compress(data, self.level, mtime=0))
+
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+# Shared compressor, bound to the app in create_app
+compressor = Compressor()
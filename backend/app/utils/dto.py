@@ -0,0 +1,144 @@
+"""
+Read path for admin listings: plain rows turned into slotted dataclasses.
+
+Listing thousands of candidates or results as ORM entities pays for the
+identity map, change tracking and an autoflush before every query, only to
+turn each entity into a dictionary. The loaders here select just the
+columns the response needs, with autoflush off, and build small dataclasses
+that the JSON providers serialize directly. Each DTO has the same fields,
+in the same order, as the to_dict() of its model.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import ClassVar, Optional
+from sqlalchemy import func, select
+from ..models.archive import ArchivedResult
+from ..models.candidate import Candidate
+from ..models.exam import Exam
+from ..models.question import Question
+from ..models.result import Result
+
+
+def _rows(session, columns, criteria, order_by=None, group_by=None, outerjoin=None):
+    stmt = select(*columns).where(*criteria).execution_options(autoflush=False)
+    if outerjoin is not None:
+        stmt = stmt.outerjoin(*outerjoin)
+    if group_by is not None:
+        stmt = stmt.group_by(*group_by)
+    if order_by is not None:
+        stmt = stmt.order_by(*order_by)
+    return session.execute(stmt).all()
+
+
+def exam_titles(session, exam_ids):
+    """Return the titles of exams by id, in one query."""
+    if not exam_ids:
+        return {}
+    return dict(session.execute(
+        select(Exam.id, Exam.title).where(Exam.id.in_(set(exam_ids))).execution_options(autoflush=False)
+    ).all())
+
+
+@dataclass(slots=True)
+class CandidateRow:
+    """A candidate as listed to the exam owner."""
+    id: int
+    name: str
+    email: str
+    unique_link: str
+    is_test_completed: Optional[bool]
+    has_started: bool
+    has_completed: Optional[bool]
+    invitation_sent: Optional[bool]
+    last_invited_at: Optional[datetime]
+    test_start_time: Optional[datetime]
+    test_end_time: Optional[datetime]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    exam_id: int
+    exam_title: Optional[str]
+
+    columns: ClassVar[tuple] = (
+        Candidate.id, Candidate.name, Candidate.email, Candidate.unique_link, Candidate.is_test_completed,
+        Candidate.invitation_sent, Candidate.last_invited_at, Candidate.test_start_time, Candidate.test_end_time,
+        Candidate.created_at, Candidate.updated_at, Candidate.exam_id,
+    )
+
+    @classmethod
+    def load(cls, session, *criteria, titles=None):
+        """Load the candidates matching the criteria; titles maps exam ids to titles (see exam_titles)."""
+        titles = titles or {}
+        return [
+            cls(row_id, name, email, link, completed, started is not None, completed, invited, invited_at,
+                started, ended, created_at, updated_at, exam_id, titles.get(exam_id))
+            for (row_id, name, email, link, completed, invited, invited_at, started, ended, created_at, updated_at,
+                 exam_id) in _rows(session, cls.columns, criteria, order_by=(Candidate.id,))
+        ]
+
+
+@dataclass(slots=True)
+class ResultRow:
+    """A result without its answers."""
+    id: int
+    score: Optional[float]
+    passed: Optional[bool]
+    feedback: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    candidate_id: int
+    exam_id: int
+    exam_version: Optional[int]
+
+    columns: ClassVar[tuple] = (
+        Result.id, Result.score, Result.passed, Result.feedback, Result.created_at, Result.updated_at,
+        Result.candidate_id, Result.exam_id, Result.exam_version,
+    )
+    archived_columns: ClassVar[tuple] = (
+        ArchivedResult.id, ArchivedResult.score, ArchivedResult.passed, ArchivedResult.feedback,
+        ArchivedResult.created_at, ArchivedResult.updated_at, ArchivedResult.candidate_id, ArchivedResult.exam_id,
+        ArchivedResult.exam_version,
+    )
+
+    @classmethod
+    def load(cls, session, *criteria):
+        """Load the results matching the criteria."""
+        return [cls(*row) for row in _rows(session, cls.columns, criteria, order_by=(Result.id,))]
+
+    @classmethod
+    def load_archived(cls, session, *criteria):
+        """Load the archived results matching the criteria (on ArchivedResult columns)."""
+        return [cls(*row) for row in _rows(session, cls.archived_columns, criteria, order_by=(ArchivedResult.id,))]
+
+
+@dataclass(slots=True)
+class ExamRow:
+    """An exam with its question count, without the questions."""
+    id: int
+    title: str
+    description: Optional[str]
+    duration_minutes: int
+    passing_score: float
+    is_randomized: Optional[bool]
+    is_active: Optional[bool]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    creator_id: int
+    version: int
+    source_exam_id: Optional[int]
+    source_version: Optional[int]
+    question_count: int
+
+    columns: ClassVar[tuple] = (
+        Exam.id, Exam.title, Exam.description, Exam.duration_minutes, Exam.passing_score, Exam.is_randomized,
+        Exam.is_active, Exam.created_at, Exam.updated_at, Exam.creator_id, Exam.version, Exam.source_exam_id,
+        Exam.source_version,
+    )
+
+    @classmethod
+    def load(cls, session, *criteria):
+        """Load the exams matching the criteria, counting their questions in the same query."""
+        columns = cls.columns + (func.count(Question.id),)
+        return [
+            cls(*row) for row in _rows(session, columns, criteria, order_by=(Exam.id,), group_by=(Exam.id,),
+                                       outerjoin=(Question, Question.exam_id == Exam.id))
+        ]
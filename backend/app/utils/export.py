@@ -2,6 +2,7 @@ import csv
 import io
 import json
 from datetime import datetime
+from .grading import CHOICE_TYPES
 
 def export_to_csv(result):
     """
@@ -35,8 +36,8 @@ def export_to_csv(result):
     for answer in result.answers:
         question = answer.question
         
-        if question.question_type == 'multiple_choice':
-            answer_text = answer.selected_option.text if answer.selected_option else 'No answer'
+        if question.question_type in CHOICE_TYPES:
+            answer_text = ', '.join(option.text for option in answer.selected_options) or 'No answer'
             is_correct = 'Yes' if answer.is_correct else 'No'
         else:  # open_ended
             answer_text = answer.text_response or 'No answer'
@@ -109,14 +110,10 @@ def export_to_json(result):
             }
         }
         
-        if question.question_type == 'multiple_choice':
-            if answer.selected_option:
-                answer_data['answer']['selected_option'] = {
-                    'id': answer.selected_option.id,
-                    'text': answer.selected_option.text
-                }
-            else:
-                answer_data['answer']['selected_option'] = None
+        if question.question_type in CHOICE_TYPES:
+            answer_data['answer']['selected_options'] = [
+                {'id': option.id, 'text': option.text} for option in answer.selected_options
+            ]
         else:  # open_ended
             answer_data['answer']['text_response'] = answer.text_response
         
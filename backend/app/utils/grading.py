@@ -0,0 +1,160 @@
+from datetime import datetime
+from sqlalchemy.orm.attributes import set_committed_value
+from .. import db
+from ..models.candidate import Candidate
+from ..models.draft import DraftAnswer
+from ..models.result import Result, Answer
+
+# Question types answered by choosing options, stored as a bitmask (Answer.selected_mask)
+CHOICE_TYPES = ('single_choice', 'multiple_choice', 'true_false')
+# One bit per option in a signed 64-bit column
+MAX_CHOICE_OPTIONS = 63
+
+
+def selection_mask(option_ids, selected):
+    """
+    Return the bitmask of chosen options, bit i standing for option_ids[i].
+
+    Returns None if one of the chosen ids is not an option of the question.
+    """
+    mask = 0
+    for option_id in selected:
+        if isinstance(option_id, bool) or option_id not in option_ids:
+            return None
+        mask |= 1 << option_ids.index(option_id)
+    return mask
+
+
+def is_correct_choice(question, mask):
+    """
+    Grade a choice answer by comparing masks with the question's correct_mask.
+
+    Multiple choice needs exactly the correct options, single choice any
+    correct option, and true/false the first correct option. Returns None
+    for questions that are not choice questions.
+    """
+    if question.question_type not in CHOICE_TYPES:
+        return None
+    if mask is None:
+        return False
+    correct_mask = question.correct_mask
+    if question.question_type == 'multiple_choice':
+        return mask == correct_mask
+    if question.question_type == 'single_choice':
+        return mask & (mask - 1) == 0 and mask & correct_mask != 0
+    return correct_mask != 0 and mask == correct_mask & -correct_mask
+
+
+def grade_answers(exam, answers):
+    """
+    Grade a set of submitted answers against an exam.
+
+    Choice answers are reduced to a bitmask over the question's options in
+    display order and compared with the precomputed mask of correct options.
+
+    Args:
+        exam: Exam model instance or its cached AnswerKey
+        answers (dict): Answers keyed by question id (as string)
+
+    Returns:
+        tuple: (earned_points, total_points, answer_rows) where answer_rows is a
+        list of dictionaries describing the Answer rows to store
+    """
+    total_points = 0
+    earned_points = 0
+    answer_rows = []
+
+    for question in exam.questions:
+        total_points += question.points
+
+        # Check if the question was answered
+        if str(question.id) not in answers:
+            continue
+
+        answer = answers[str(question.id)]
+        row = {
+            'question_id': question.id,
+            'selected_mask': None,
+            'text_response': None,
+            'is_correct': None,
+            'earned_points': None
+        }
+
+        # Process answer based on question type
+        if question.question_type in CHOICE_TYPES:
+            # Multiple choice answers a list of option ids, the other choice types a single id
+            if question.question_type == 'multiple_choice':
+                selected = answer if isinstance(answer, list) else None
+            else:
+                selected = [answer] if isinstance(answer, int) and not isinstance(answer, bool) else None
+            if selected is not None:
+                row['selected_mask'] = selection_mask(question.option_ids, selected)
+            row['is_correct'] = is_correct_choice(question, row['selected_mask'])
+        elif question.question_type == 'text':
+            # For text questions, store the answer for manual review
+            # We won't automatically score text questions
+            row['text_response'] = answer if isinstance(answer, str) else None
+
+        if row['is_correct'] is not None:
+            row['earned_points'] = question.points if row['is_correct'] else 0
+            earned_points += row['earned_points']
+
+        answer_rows.append(row)
+
+    return earned_points, total_points, answer_rows
+
+
+def record_submission(candidate, exam, answers, end_time=None, session=None):
+    """
+    Grade answers and store the result for a candidate.
+
+    The candidate's drafts are removed in the same transaction. The caller is
+    responsible for committing the session.
+
+    Args:
+        candidate: Candidate model instance
+        exam: Exam model instance or its cached AnswerKey
+        answers (dict): Answers keyed by question id (as string)
+        end_time (datetime, optional): Completion time, defaults to now
+        session (Session, optional): Session to use instead of db.session
+
+    Returns:
+        Result: The new result, or None if the candidate was already completed
+    """
+    end_time = end_time or datetime.utcnow()
+    session = session or db.session
+
+    # Claim the attempt so concurrent submissions cannot create two results
+    claimed = session.query(Candidate).filter_by(id=candidate.id, is_test_completed=False).update(
+        {'is_test_completed': True, 'test_end_time': end_time},
+        synchronize_session=False
+    )
+    if not claimed:
+        return None
+
+    earned_points, total_points, answer_rows = grade_answers(exam, answers)
+
+    # Calculate percentage score
+    percentage_score = (earned_points / total_points * 100) if total_points > 0 else 0
+
+    # Create a result record
+    result = Result(candidate_id=candidate.id, exam_id=exam.id)
+    result.exam_version = exam.version
+    result.score = percentage_score
+    result.passed = percentage_score >= exam.passing_score
+
+    for row in answer_rows:
+        answer = Answer(None, row['question_id'], text_response=row['text_response'])
+        answer.selected_mask = row['selected_mask']
+        answer.is_correct = row['is_correct']
+        answer.earned_points = row['earned_points']
+        result.answers.append(answer)
+
+    session.add(result)
+    session.query(DraftAnswer).filter_by(candidate_id=candidate.id).delete(synchronize_session=False)
+
+    # Keep the in-session candidate consistent with the claim above
+    set_committed_value(candidate, 'is_test_completed', True)
+    set_committed_value(candidate, 'test_end_time', end_time)
+
+    return result
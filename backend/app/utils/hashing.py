@@ -0,0 +1,121 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Memory-hard methods rank above iterated ones; within a method a higher cost is stronger
+_METHOD_RANK = {'pbkdf2': 1, 'scrypt': 2}
+
+
+def _strength(password_hash):
+    """Return a comparable (rank, cost) for the method a hash was made with."""
+    method, *args = password_hash.split('$', 1)[0].split(':')
+    rank = _METHOD_RANK.get(method, 0)
+    try:
+        if method == 'pbkdf2':
+            cost = int(args[1])
+        elif method == 'scrypt':
+            cost = int(args[0]) * int(args[1]) * int(args[2])
+        else:
+            cost = 0
+    except (IndexError, ValueError):
+        # Werkzeug's own defaults for a method given without parameters
+        return rank, 0
+    return rank, cost
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full or a hash did not finish in time."""
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords on a bounded thread pool.
+
+    Password hashing is deliberately slow, so a burst of logins must not tie up
+    every request worker. At most PASSWORD_HASH_WORKERS hashes run at once and at
+    most PASSWORD_HASH_QUEUE more may wait; anything beyond that is rejected
+    immediately with HasherBusy so the caller can answer 503. With
+    PASSWORD_HASH_WORKERS set to 0 hashing runs inline in the request thread.
+    """
+
+    def __init__(self, app=None):
+        self.method = None
+        self.timeout = 10
+        self.workers = 0
+        self.queue = 0
+        self._strength = None
+        self._executor = None
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the method and pool size from the app config."""
+        # None keeps Werkzeug's default method, which follows its releases
+        self.method = app.config.get('PASSWORD_HASH_METHOD') or None
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        self.queue = app.config.get('PASSWORD_HASH_QUEUE', 16)
+
+        # Werkzeug fills in defaults (e.g. iterations), so take the strength from a real hash
+        self._strength = None
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._start_pool()
+
+        app.extensions['password_hasher'] = self
+
+    def after_fork(self):
+        """Replace the pool inherited from the parent process in a forked worker."""
+        self._start_pool()
+
+    def _start_pool(self):
+        if self.workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hasher')
+            self._slots = threading.BoundedSemaphore(self.workers + self.queue)
+        else:
+            self._executor = None
+            self._slots = None
+
+    def _run(self, func, *args):
+        if self._executor is None:
+            return func(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Password hashing queue is full')
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HasherBusy('Password hashing timed out')
+
+    def hash(self, password):
+        """Hash a password with the configured method, inline."""
+        if self.method is None:
+            return generate_password_hash(password)
+        return generate_password_hash(password, method=self.method)
+
+    def hash_async(self, password):
+        """Hash a password with the configured method on the pool."""
+        return self._run(self.hash, password)
+
+    def verify(self, password_hash, password):
+        """Check a password against a hash on the pool."""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Check if a hash was made with a weaker method or lower cost than configured."""
+        if self._strength is None:
+            self._strength = _strength(self.hash(''))
+        return _strength(password_hash) < self._strength
+
+
+# Shared hasher, bound to the app in create_app
+password_hasher = PasswordHasher()
@@ -0,0 +1,35 @@
+from flask import request, make_response
+from .cache import exam_versions
+
+
+def exam_validators(exam_id):
+    """Return (version, updated_at) of an exam from its stamp for this request, or None if missing."""
+    stamp = exam_versions.lookup(exam_id)
+    return (stamp.version, stamp.updated_at) if stamp else None
+
+
+def not_modified(etag, last_modified=None):
+    """
+    Return a 304 response if the request's validators match, otherwise None.
+
+    If-None-Match takes precedence over If-Modified-Since as required by RFC 9110.
+    """
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        matched = last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    else:
+        matched = False
+
+    if not matched:
+        return None
+    return add_validators(make_response('', 304), etag, last_modified)
+
+
+def add_validators(response, etag, last_modified=None):
+    """Attach ETag/Last-Modified headers and require clients to revalidate."""
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
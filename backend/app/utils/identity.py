@@ -0,0 +1,80 @@
+from flask import g, has_app_context
+from .. import db
+from ..models.user import User
+from .cache import TTLCache, exam_versions
+
+
+class IdentityCache:
+    """
+    Cache of user records and exam owners for JWT-protected endpoints.
+
+    Users are memoized on flask.g for the current request and in a short-TTL
+    process cache shared by requests. Exam owners come from the exam stamp
+    that exam_versions reads once per request, so ownership checks only need
+    the owner id of an exam instead of joining Exam on every query, and a
+    deleted or transferred exam is seen by every worker on its next request.
+    """
+
+    def __init__(self, app=None):
+        self.users = TTLCache(0, 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Size the user cache from the app config (a TTL of 0 disables it)."""
+        ttl = app.config.get('IDENTITY_CACHE_TTL', 30)
+        size = app.config.get('IDENTITY_CACHE_SIZE', 4096) if ttl > 0 else 0
+        self.users = TTLCache(size, ttl)
+        app.extensions['identity_cache'] = self
+
+    def _request_cache(self, name):
+        if not has_app_context():
+            return {}
+        cache = g.get(name)
+        if cache is None:
+            cache = {}
+            setattr(g, name, cache)
+        return cache
+
+    def get_user(self, user_id):
+        """Return the dictionary of a user, or None if the user does not exist."""
+        user_id = int(user_id)
+        request_cache = self._request_cache('_identity_users')
+        if user_id in request_cache:
+            return request_cache[user_id]
+
+        user_dict = self.users.get(user_id)
+        if user_dict is None:
+            user = db.session.get(User, user_id)
+            user_dict = user.to_dict() if user else None
+            if user_dict is not None:
+                self.users.set(user_id, user_dict)
+
+        request_cache[user_id] = user_dict
+        return user_dict
+
+    def get_exam_owner(self, exam_id):
+        """Return the creator id of an exam, or None if the exam does not exist."""
+        stamp = exam_versions.lookup(exam_id)
+        return stamp.creator_id if stamp is not None else None
+
+    def owns_exam(self, user_id, exam_id):
+        """Check if a user created an exam."""
+        try:
+            owner_id = self.get_exam_owner(exam_id)
+        except (TypeError, ValueError):
+            return False
+        return owner_id is not None and str(owner_id) == str(user_id)
+
+    def invalidate_user(self, user_id):
+        """Drop a cached user after it changed."""
+        self.users.delete(int(user_id))
+        self._request_cache('_identity_users').pop(int(user_id), None)
+
+    def invalidate_exam_owner(self, exam_id):
+        """Read the owner of an exam again after the exam was deleted or transferred."""
+        exam_versions.forget(exam_id)
+
+
+# Shared cache, bound to the app in create_app
+identity_cache = IdentityCache()
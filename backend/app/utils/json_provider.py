@@ -0,0 +1,62 @@
+import decimal
+import uuid
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class IsoJSONProvider(DefaultJSONProvider):
+    """Standard library JSON provider that writes datetimes as ISO 8601 strings."""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+
+def _orjson_default(o):
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider backed by orjson.
+
+    orjson serializes datetimes, dates, UUIDs and dataclasses natively, writing
+    naive datetimes in the same ISO 8601 form as datetime.isoformat().
+    """
+
+    option = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_orjson_default, option=self.option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_orjson_default, option=self.option | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype='application/json')
+
+
+JSON_PROVIDERS = {
+    'default': IsoJSONProvider,
+    'orjson': OrjsonProvider,
+}
+
+
+def get_json_provider_class(name):
+    """Return the provider class for a JSON_PROVIDER setting, falling back when orjson is missing."""
+    if name == 'orjson' and orjson is None:
+        return IsoJSONProvider
+    return JSON_PROVIDERS.get(name, IsoJSONProvider)
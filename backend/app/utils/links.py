@@ -0,0 +1,81 @@
+import base64
+import hashlib
+import hmac
+import struct
+from flask import current_app
+
+# Version tag of the signed link format, also covered by the signature
+LINK_VERSION = 's1'
+
+# Truncated HMAC-SHA256 length in bytes
+SIGNATURE_SIZE = 16
+
+# (candidate id, exam id, the candidate's link version); candidate ids in exam
+# shards go beyond 32 bits
+_PAYLOAD = struct.Struct('>QII')
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signing_key():
+    key = current_app.config.get('LINK_SIGNING_KEY') or current_app.config['SECRET_KEY']
+    return key.encode('utf-8') if isinstance(key, str) else key
+
+
+def _signature(version, payload):
+    digest = hmac.new(_signing_key(), version.encode('ascii') + b'.' + payload, hashlib.sha256).digest()
+    return digest[:SIGNATURE_SIZE]
+
+
+def is_signed_link(unique_link):
+    """Check if a link uses the signed format rather than a plain UUID."""
+    return unique_link.startswith(LINK_VERSION + '.')
+
+
+def sign_link(candidate_id, exam_id, link_version):
+    """
+    Build a self-contained candidate link.
+
+    Args:
+        candidate_id (int): Candidate id
+        exam_id (int): Exam id
+        link_version (int): Candidate's link version, bumped to reissue a link
+
+    Returns:
+        str: Link of the form '<version>.<payload>.<signature>'
+    """
+    payload = _PAYLOAD.pack(candidate_id, exam_id, link_version)
+    return '.'.join([LINK_VERSION, _b64encode(payload), _b64encode(_signature(LINK_VERSION, payload))])
+
+
+def verify_link(unique_link):
+    """
+    Verify a signed link without touching the database.
+
+    Args:
+        unique_link (str): Link produced by sign_link
+
+    Returns:
+        tuple: (candidate_id, exam_id, link_version), or None if the link is
+        malformed or forged
+    """
+    parts = unique_link.split('.')
+    if len(parts) != 3 or parts[0] != LINK_VERSION:
+        return None
+
+    try:
+        payload = _b64decode(parts[1])
+        signature = _b64decode(parts[2])
+    except (ValueError, TypeError):
+        return None
+
+    if len(payload) != _PAYLOAD.size or not hmac.compare_digest(signature, _signature(LINK_VERSION, payload)):
+        return None
+
+    return _PAYLOAD.unpack(payload)
@@ -0,0 +1,225 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class EndpointStats:
+    """Counters of one (endpoint, method) pair, allocated once and updated in place."""
+
+    __slots__ = ('latency_buckets', 'latency_sum', 'count', 'query_buckets', 'queries', 'sql_seconds',
+                 'serialize_seconds', 'response_bytes', 'statuses')
+
+    def __init__(self):
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.count = 0
+        self.query_buckets = [0] * (len(QUERY_COUNT_BUCKETS) + 1)
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.response_bytes = 0
+        self.statuses = {}
+
+
+class RequestState:
+    """Work done while handling one request."""
+
+    __slots__ = ('start', 'queries', 'sql_seconds', 'query_start', 'serialize_seconds', 'serializing')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.query_start = 0.0
+        self.serialize_seconds = 0.0
+        self.serializing = False
+
+
+# State of the request being handled; a context variable rather than a thread
+# local so requests interleaved on the event loop (app.asgi) stay apart
+_request_state = ContextVar('request_metrics_state', default=None)
+
+
+class RequestMetrics:
+    """
+    Per-endpoint request metrics exposed in the Prometheus text format.
+
+    Request timing comes from the Flask request hooks and SQL statement counts
+    and time from the engine's cursor events. Work done while a request is
+    handled is tracked in a RequestState holding a few numbers, and the
+    totals are folded into preallocated per-endpoint counters when the
+    response is finished.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._endpoints = {}  # (endpoint, method) -> EndpointStats
+        self._lock = threading.Lock()
+        self._collectors = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the request hooks, SQL events and JSON timing on the app."""
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        app.extensions['metrics'] = self
+        self._endpoints = {}
+        self._collectors = []
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        # Registered before other after_request hooks so it runs last and sees the final body size
+        app.after_request(self._finish_request)
+
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+        provider = app.json
+        provider.dumps = self._timed(provider.dumps)
+        provider.response = self._timed(provider.response)
+
+    def add_collector(self, collector):
+        """Register a callable returning extra (name, type, help, value) samples at scrape time."""
+        self._collectors.append(collector)
+
+    def _start_request(self):
+        _request_state.set(RequestState())
+
+    def _finish_request(self, response):
+        state = _request_state.get()
+        if state is None:
+            return response
+        _request_state.set(None)
+        elapsed = time.perf_counter() - state.start
+
+        key = (request.endpoint or 'unmatched', request.method)
+        stats = self._endpoints.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self._endpoints.setdefault(key, EndpointStats())
+
+        size = response.content_length if response.is_sequence else None
+        with self._lock:
+            stats.count += 1
+            stats.latency_sum += elapsed
+            stats.latency_buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            stats.queries += state.queries
+            stats.query_buckets[bisect_left(QUERY_COUNT_BUCKETS, state.queries)] += 1
+            stats.sql_seconds += state.sql_seconds
+            stats.serialize_seconds += state.serialize_seconds
+            if size:
+                stats.response_bytes += size
+            stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        state = _request_state.get()
+        if state is not None:
+            state.query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        state = _request_state.get()
+        if state is not None:
+            state.queries += 1
+            state.sql_seconds += time.perf_counter() - state.query_start
+
+    def _timed(self, func):
+        def timed(*args, **kwargs):
+            # The default provider's response() calls dumps(), only the outer call is timed
+            state = _request_state.get()
+            if state is None or state.serializing:
+                return func(*args, **kwargs)
+            state.serializing = True
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                state.serialize_seconds += time.perf_counter() - start
+                state.serializing = False
+
+        return timed
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            snapshot = [(key, stats.latency_buckets[:], stats.latency_sum, stats.count, stats.query_buckets[:],
+                         stats.queries, stats.sql_seconds, stats.serialize_seconds, stats.response_bytes,
+                         dict(stats.statuses))
+                        for key, stats in sorted(self._endpoints.items())]
+
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histogram(name, bounds, index, sum_index, count_index):
+            for (endpoint, method), *values in snapshot:
+                labels = f'endpoint="{endpoint}",method="{method}"'
+                cumulative = 0
+                for bound, bucket in zip(bounds + ('+Inf',), values[index]):
+                    cumulative += bucket
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {values[sum_index]}')
+                lines.append(f'{name}_count{{{labels}}} {values[count_index]}')
+
+        def counter(name, index):
+            for (endpoint, method), *values in snapshot:
+                lines.append(f'{name}{{endpoint="{endpoint}",method="{method}"}} {values[index]}')
+
+        header('exam_http_request_duration_seconds', 'histogram', 'Request latency by endpoint.')
+        histogram('exam_http_request_duration_seconds', LATENCY_BUCKETS, 0, 1, 2)
+
+        header('exam_http_requests_total', 'counter', 'Requests by endpoint and status code.')
+        for (endpoint, method), *values in snapshot:
+            for status, count in sorted(values[8].items()):
+                lines.append(f'exam_http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+        header('exam_sql_queries_per_request', 'histogram', 'SQL statements executed per request.')
+        histogram('exam_sql_queries_per_request', QUERY_COUNT_BUCKETS, 3, 4, 2)
+
+        header('exam_sql_seconds_total', 'counter', 'Time spent executing SQL statements.')
+        counter('exam_sql_seconds_total', 5)
+
+        header('exam_serialization_seconds_total', 'counter', 'Time spent serializing JSON.')
+        counter('exam_serialization_seconds_total', 6)
+
+        header('exam_response_bytes_total', 'counter', 'Bytes sent in buffered response bodies.')
+        counter('exam_response_bytes_total', 7)
+
+        for collector in self._collectors:
+            for name, kind, help_text, value in collector():
+                header(name, kind, help_text)
+                lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def runtime_samples():
+    """Gauges and counters of the app's background components."""
+    from .autosave import autosave_buffer
+    from .cache import exam_payload_cache
+    from .ratelimit import public_link_guard
+    from .scheduler import attempt_scheduler
+
+    yield 'exam_autosave_pending_candidates', 'gauge', 'Candidates with answers waiting to be flushed.', len(autosave_buffer)
+    yield 'exam_scheduled_attempts', 'gauge', 'Running attempts tracked by the exam timer.', len(attempt_scheduler)
+    yield 'exam_payload_cache_entries', 'gauge', 'Exam delivery payloads in the cache.', len(exam_payload_cache)
+    for name, value in public_link_guard.stats().items():
+        kind = 'gauge' if name.endswith('_size') else 'counter'
+        suffix = '' if kind == 'gauge' else '_total'
+        yield f'exam_public_link_{name}{suffix}', kind, f'Public link guard: {name.replace("_", " ")}.', value
+
+
+# Shared metrics registry, bound to the app in create_app
+request_metrics = RequestMetrics()
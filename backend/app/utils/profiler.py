@@ -0,0 +1,203 @@
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from flask import request
+
+PROFILE_SUFFIX = '.folded'
+PROFILE_NAME = re.compile(r'^[\w.-]+\.folded$')
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapse_stack(frame):
+    """Return a frame's stack as 'outer;...;inner' for collapsed-stack (flame graph) files."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+class SamplingProfiler:
+    """
+    Opt-in statistical profiler for requests.
+
+    While enabled, every request records its start time against its thread,
+    and a single sampler thread reads stacks every PROFILE_INTERVAL seconds.
+    A request is sampled from its start when PROFILE_SAMPLE_RATE picks it,
+    and from the moment it has been running for PROFILE_SLOW_MS otherwise,
+    so a slow request's profile covers the time past the threshold. Profiles
+    of sampled and slow requests are written by the sampler thread as
+    collapsed-stack files in a directory that holds at most
+    PROFILE_MAX_FILES of them, oldest first out.
+
+    Requests that are neither picked nor slow cost a random number, a clock
+    read and a dict insert and pop, with no lock taken.
+    Requests handled by async views (see app.asgi) share the event loop's
+    thread and are not profiled.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.interval = 0.01
+        self.sample_rate = 0.0
+        self.slow_seconds = 1.0
+        self.max_files = 200
+        self.directory = None
+        self._running = {}  # thread id -> [start, Counter of collapsed stacks or None until sampled]
+        self._busy = threading.Event()
+        self._finished = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the profiler and start the sampler thread if profiling is enabled."""
+        self.stop()
+        self.enabled = app.config.get('PROFILE_ENABLED', False)
+        self.interval = app.config.get('PROFILE_INTERVAL', 0.01)
+        self.sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+        self.slow_seconds = app.config.get('PROFILE_SLOW_MS', 1000) / 1000
+        self.max_files = app.config.get('PROFILE_MAX_FILES', 200)
+        self.directory = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        app.extensions['profiler'] = self
+        if not self.enabled:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+        if not app.config.get('DEFER_BACKGROUND_TASKS', False):
+            self.start()
+
+    def after_fork(self):
+        """Reset the state and start the sampler thread in a forked worker."""
+        if not self.enabled:
+            return
+        self._running = {}
+        self._busy = threading.Event()
+        self._finished = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._thread = None
+        self.start()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._busy.set()
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _start_request(self):
+        if request.environ.get('exam.async_view'):
+            return
+        record = [time.perf_counter(), Counter() if random.random() < self.sample_rate else None]
+        request.environ['profiler.request'] = record
+        self._running[threading.get_ident()] = record
+        self._busy.set()
+
+    def _finish_request(self, exc=None):
+        record = request.environ.pop('profiler.request', None)
+        if record is None:
+            return
+        self._running.pop(threading.get_ident(), None)
+        start, samples = record
+        if samples:
+            elapsed = time.perf_counter() - start
+            self._finished.put((time.time(), request.endpoint or 'unmatched', request.method, elapsed, samples))
+
+    def _run(self):
+        frames = sys._current_frames
+        while not self._stop.is_set():
+            self._busy.wait(timeout=1)
+            if self._stop.is_set():
+                break
+
+            running = list(self._running.items())
+            if not running:
+                self._busy.clear()
+            # Requests start and finish meanwhile (one finishing now misses this sample)
+            now = time.perf_counter()
+            stacks = frames()
+            for thread_id, record in running:
+                if record[1] is None:
+                    if now - record[0] < self.slow_seconds:
+                        continue
+                    record[1] = Counter()
+                frame = stacks.get(thread_id)
+                if frame is not None:
+                    record[1][collapse_stack(frame)] += 1
+            del stacks, running
+
+            self._write_finished()
+            time.sleep(self.interval)
+        self._write_finished()
+
+    def _write_finished(self):
+        while True:
+            try:
+                finished_at, endpoint, method, elapsed, samples = self._finished.get_nowait()
+            except queue.Empty:
+                return
+            name = f'{int(finished_at * 1000)}-{method}-{endpoint}-{int(elapsed * 1000)}ms{PROFILE_SUFFIX}'
+            try:
+                with open(os.path.join(self.directory, name), 'w') as f:
+                    for stack, count in samples.most_common():
+                        f.write(f'{stack} {count}\n')
+                self._trim()
+            except OSError:
+                pass
+
+    def _trim(self):
+        names = sorted(n for n in os.listdir(self.directory) if n.endswith(PROFILE_SUFFIX))
+        for name in names[:max(0, len(names) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def list_profiles(self):
+        """Return metadata of the stored profiles, newest first."""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not PROFILE_NAME.match(name):
+                continue
+            finished_at, method, rest = name[:-len(PROFILE_SUFFIX)].split('-', 2)
+            endpoint, duration = rest.rsplit('-', 1)
+            profiles.append({
+                'name': name,
+                'finished_at': int(finished_at) / 1000,
+                'method': method,
+                'endpoint': endpoint,
+                'duration_ms': int(duration[:-2]),
+                'size': os.path.getsize(os.path.join(self.directory, name))
+            })
+        return profiles
+
+    def profile_path(self, name):
+        """Return the path of a stored profile, or None if the name is invalid or missing."""
+        if not self.directory or not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+# Shared profiler, bound to the app in create_app
+request_profiler = SamplingProfiler()
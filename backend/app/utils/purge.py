@@ -0,0 +1,169 @@
+import atexit
+import logging
+import threading
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, select, update
+from .. import db
+from ..models.archive import ArchivedResult
+from ..models.candidate import Candidate
+from ..models.draft import DraftAnswer
+from ..models.exam import Exam
+from ..models.question import Question, Option
+from ..models.rescore import RescoreJob, ScoreAudit
+from ..models.result import Result, Answer
+from .shards import exam_shards
+
+logger = logging.getLogger(__name__)
+
+
+def _exam_rows(exam_id):
+    # Rows of an exam in the main database, children before their parents
+    results = select(Result.id).where(Result.exam_id == exam_id)
+    candidates = select(Candidate.id).where(Candidate.exam_id == exam_id)
+    questions = select(Question.id).where(Question.exam_id == exam_id)
+    jobs = select(RescoreJob.id).where(RescoreJob.exam_id == exam_id)
+    return (
+        (Answer, Answer.result_id.in_(results)),
+        (Answer, Answer.question_id.in_(questions)),
+        (DraftAnswer, DraftAnswer.candidate_id.in_(candidates)),
+        (Result, Result.exam_id == exam_id),
+        (Candidate, Candidate.exam_id == exam_id),
+        (ArchivedResult, ArchivedResult.exam_id == exam_id),
+        (ScoreAudit, ScoreAudit.job_id.in_(jobs)),
+        (RescoreJob, RescoreJob.exam_id == exam_id),
+        (Option, Option.question_id.in_(questions)),
+        (Question, Question.exam_id == exam_id),
+    )
+
+
+def delete_candidate_rows(session, candidate_id):
+    """Delete a candidate with its result, answers and drafts, in set-based statements of the caller's transaction."""
+    results = select(Result.id).where(Result.candidate_id == candidate_id)
+    for model, criterion in (
+        (Answer, Answer.result_id.in_(results)),
+        (Result, Result.candidate_id == candidate_id),
+        (DraftAnswer, DraftAnswer.candidate_id == candidate_id),
+        (Candidate, Candidate.id == candidate_id),
+    ):
+        session.execute(delete(model).where(criterion).execution_options(synchronize_session=False))
+    # Archived results stay in the main database whatever the candidate's shard
+    db.session.execute(delete(ArchivedResult).where(ArchivedResult.candidate_id == candidate_id))
+
+
+class ExamPurger:
+    """
+    Background purge of deleted exams.
+
+    Deleting an exam only sets its deleted_at, which hides it everywhere.
+    Removing its questions, candidates, results and answers in the request
+    would hold the write lock for as long as that takes (and through the
+    ORM cascade, load every question and option first). Every
+    PURGE_INTERVAL seconds, and right after a delete, this thread removes
+    the rows of deleted exams by primary key in chunks of PURGE_CHUNK_SIZE,
+    one short transaction per chunk, then the exam itself. Purging is
+    idempotent, so workers purging the same exam do not conflict.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 30
+        self.chunk_size = 1000
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the purge command and start the purge thread if enabled."""
+        self.app = app
+        self.interval = app.config.get('PURGE_INTERVAL', 30)
+        self.chunk_size = app.config.get('PURGE_CHUNK_SIZE', 1000)
+        app.extensions['exam_purger'] = self
+        app.cli.add_command(purge_command)
+        if self.interval > 0 and not app.config.get('DEFER_BACKGROUND_TASKS', False):
+            self.start()
+
+    def after_fork(self):
+        """Start the purge thread in a forked worker."""
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        if self.interval > 0:
+            self.start()
+
+    def start(self):
+        """Start the background purge thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='exam-purger', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def wake(self):
+        """Purge without waiting for the next interval, e.g. after deleting an exam."""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                with self.app.app_context():
+                    self.purge_deleted()
+            except Exception as e:
+                logger.error(f"Exam purge failed: {str(e)}")
+
+    def purge_deleted(self):
+        """Purge every deleted exam and return how many were removed."""
+        exam_ids = [exam_id for exam_id, in db.session.query(Exam.id).filter(Exam.deleted_at.isnot(None))]
+        for exam_id in exam_ids:
+            self.purge_exam(exam_id)
+        return len(exam_ids)
+
+    def purge_exam(self, exam_id):
+        """Delete a deleted exam and all its rows in chunked transactions; returns the number of rows deleted."""
+        if not db.session.query(Exam.id).filter(Exam.id == exam_id, Exam.deleted_at.isnot(None)).first():
+            return 0
+
+        # A shard only holds the exam's rows, so it goes as a whole
+        exam_shards.drop(exam_id)
+
+        deleted = 0
+        for model, criterion in _exam_rows(exam_id):
+            deleted += self._delete_chunks(model, criterion)
+        # Clones of the exam stay, without their source
+        db.session.execute(update(Exam).where(Exam.source_exam_id == exam_id).values(source_exam_id=None))
+        db.session.execute(delete(Exam).where(Exam.id == exam_id, Exam.deleted_at.isnot(None)))
+        db.session.commit()
+        logger.info(f"Purged exam {exam_id} ({deleted} rows)")
+        return deleted
+
+    def _delete_chunks(self, model, criterion):
+        deleted = 0
+        while True:
+            ids = db.session.execute(select(model.id).where(criterion).limit(self.chunk_size)).scalars().all()
+            if not ids:
+                return deleted
+            db.session.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+            db.session.commit()
+            deleted += len(ids)
+
+
+# Shared exam purger, bound to the app in create_app
+exam_purger = ExamPurger()
+
+
+@click.command('purge')
+@with_appcontext
+def purge_command():
+    """Delete the rows of deleted exams now instead of waiting for the purge thread."""
+    click.echo(f'Purged {exam_purger.purge_deleted()} deleted exams')
@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import request, jsonify
+from .cache import TTLCache
+
+
+class MemoryCounterStore:
+    """Per-process fixed-window counters, bounded to the most recently used keys."""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._counters = OrderedDict()  # key -> [window, current_count, previous_count]
+        self._lock = threading.Lock()
+
+    def incr(self, key, window):
+        """Count a hit in a window and return (current_count, previous_window_count)."""
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None:
+                entry = self._counters[key] = [window, 0, 0]
+            elif entry[0] != window:
+                entry[2] = entry[1] if entry[0] == window - 1 else 0
+                entry[0], entry[1] = window, 0
+            entry[1] += 1
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.maxsize:
+                self._counters.popitem(last=False)
+            return entry[1], entry[2]
+
+    def add_invalid(self, link, ttl):
+        pass
+
+    def is_invalid(self, link):
+        return False
+
+
+class SQLiteCounterStore:
+    """
+    Counters and invalid links kept in a small local SQLite file.
+
+    Lets the gunicorn workers of one node share rate limit state without an
+    external service.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._last_cleanup = 0
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (key TEXT, window INTEGER, count INTEGER, PRIMARY KEY (key, window))')
+            conn.execute('CREATE TABLE IF NOT EXISTS invalid_links (link TEXT PRIMARY KEY, expires_at REAL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def after_fork(self):
+        # SQLite connections must not be shared with a forked process
+        self._local = threading.local()
+
+    def incr(self, key, window):
+        conn = self._connect()
+        conn.execute(
+            'INSERT INTO counters (key, window, count) VALUES (?, ?, 1) '
+            'ON CONFLICT (key, window) DO UPDATE SET count = count + 1',
+            (key, window)
+        )
+        rows = dict(conn.execute('SELECT window, count FROM counters WHERE key = ? AND window >= ?', (key, window - 1)).fetchall())
+        self._cleanup(conn, window)
+        return rows.get(window, 0), rows.get(window - 1, 0)
+
+    def add_invalid(self, link, ttl):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO invalid_links (link, expires_at) VALUES (?, ?)',
+            (link, time.time() + ttl)
+        )
+
+    def is_invalid(self, link):
+        row = self._connect().execute('SELECT expires_at FROM invalid_links WHERE link = ?', (link,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def _cleanup(self, conn, window):
+        # Drop expired windows and links at most once a minute per process
+        now = time.monotonic()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        conn.execute('DELETE FROM counters WHERE window < ?', (window - 1,))
+        conn.execute('DELETE FROM invalid_links WHERE expires_at < ?', (time.time(),))
+
+
+class PublicLinkGuard:
+    """
+    Protects the unauthenticated exam link endpoints.
+
+    Requests are rate limited with a sliding window counter keyed by client IP
+    and by link. Links that recently failed to resolve are kept in a bounded
+    negative cache and rejected without a database lookup. Behind a reverse
+    proxy the client IP comes from ProxyFix (TRUSTED_PROXY_COUNT).
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.window = 60
+        self.ip_limit = 300
+        self.link_limit = 60
+        self.negative_ttl = 600
+        self.store = MemoryCounterStore()
+        self.negative_cache = TTLCache()
+        self._metrics = {
+            'allowed': 0,
+            'rejected_ip_rate': 0,
+            'rejected_link_rate': 0,
+            'rejected_negative_cache': 0,
+            'invalid_links_recorded': 0
+        }
+        self._metrics_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the guard from the app config."""
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', False)
+        self.window = app.config.get('RATE_LIMIT_WINDOW', 60)
+        self.ip_limit = app.config.get('RATE_LIMIT_PER_IP', 300)
+        self.link_limit = app.config.get('RATE_LIMIT_PER_LINK', 60)
+        self.negative_ttl = app.config.get('NEGATIVE_CACHE_TTL', 600)
+        self.negative_cache = TTLCache(app.config.get('NEGATIVE_CACHE_SIZE', 10000), self.negative_ttl)
+
+        if app.config.get('RATE_LIMIT_STORE') == 'sqlite':
+            os.makedirs(app.instance_path, exist_ok=True)
+            self.store = SQLiteCounterStore(os.path.join(app.instance_path, 'ratelimit.db'))
+        else:
+            self.store = MemoryCounterStore()
+
+        app.extensions['public_link_guard'] = self
+
+    def after_fork(self):
+        """Reset the locks and store connections in a forked worker."""
+        self._metrics_lock = threading.Lock()
+        if hasattr(self.store, 'after_fork'):
+            self.store.after_fork()
+
+    def _count(self, name):
+        with self._metrics_lock:
+            self._metrics[name] += 1
+
+    def _over_limit(self, key, limit, now):
+        window = int(now // self.window)
+        current, previous = self.store.incr(key, window)
+        # Weight the previous window by how much of it still overlaps the sliding window
+        overlap = 1 - (now % self.window) / self.window
+        return current + previous * overlap > limit
+
+    def check(self, unique_link):
+        """Return an error response if the request must be rejected, otherwise None."""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        ip = request.remote_addr or 'unknown'
+
+        if self._over_limit(f'ip:{ip}', self.ip_limit, now):
+            self._count('rejected_ip_rate')
+            return self._too_many_requests()
+
+        if self._over_limit(f'link:{unique_link}', self.link_limit, now):
+            self._count('rejected_link_rate')
+            return self._too_many_requests()
+
+        if self.negative_cache.get(unique_link) or self.store.is_invalid(unique_link):
+            self._count('rejected_negative_cache')
+            return jsonify({'error': 'Invalid exam link'}), 404
+
+        self._count('allowed')
+        return None
+
+    def remember_invalid(self, unique_link):
+        """Record a link that did not resolve to a candidate."""
+        if not self.enabled:
+            return
+        self.negative_cache.set(unique_link, True)
+        self.store.add_invalid(unique_link, self.negative_ttl)
+        self._count('invalid_links_recorded')
+
+    def _too_many_requests(self):
+        response = jsonify({'error': 'Too many requests, please slow down'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(self.window)
+        return response
+
+    def stats(self):
+        """Return a snapshot of the guard's counters."""
+        with self._metrics_lock:
+            stats = dict(self._metrics)
+        stats['negative_cache_size'] = len(self.negative_cache)
+        return stats
+
+
+# Shared guard, bound to the app in create_app
+public_link_guard = PublicLinkGuard()
@@ -0,0 +1,210 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+# Request header that sends the reads of a request to the primary database
+READ_YOUR_WRITES_HEADER = 'X-Read-Your-Writes'
+
+# Seconds a measured Postgres replication lag is reused
+LAG_CHECK_INTERVAL = 1.0
+
+# Replication lag of a Postgres standby, 0 when it has replayed everything it received
+_POSTGRES_LAG = text(
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+
+class ReadReplica:
+    """
+    Routing of read-only admin queries to a replica of the main database.
+
+    READ_REPLICA_URI names the replica: a Postgres standby, or a SQLite file
+    that is a snapshot of a SQLite main database. Snapshots are taken with
+    SQLite's backup API every READ_REPLICA_SNAPSHOT_INTERVAL seconds by a
+    background thread, written next to the replica and moved over it, so
+    readers always see a complete copy. The main database is switched to WAL
+    so that the copy's read transaction does not block its writers.
+
+    session() returns a session on the replica while it lags the main
+    database by at most READ_REPLICA_MAX_LAG seconds, and db.session when it
+    lags more, when no replica is configured, or when the request sends the
+    X-Read-Your-Writes header to see its own recent changes.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.engine = None
+        self.max_lag = 30
+        self.snapshot_interval = 0
+        self._snapshot_path = None
+        self._source_path = None
+        self._lag = (0.0, 0.0)  # (measured at, seconds) for Postgres replicas
+        self._stale = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Create the replica engine and start the snapshot thread if the replica is a snapshot."""
+        self.app = app
+        self.max_lag = app.config.get('READ_REPLICA_MAX_LAG', 30)
+        app.extensions['read_replica'] = self
+        uri = app.config.get('READ_REPLICA_URI')
+        if not uri:
+            self.engine = None
+            return
+
+        app.teardown_appcontext(self._close_session)
+        url = make_url(uri)
+        if url.get_backend_name() == 'sqlite':
+            # Relative paths are in the instance folder, as for the main database
+            self._snapshot_path = os.path.join(app.instance_path, url.database)
+            # Every checkout opens the file, so a refreshed snapshot is seen right away
+            self.engine = create_engine(f'sqlite:///file:{self._snapshot_path}?mode=ro&uri=true', poolclass=NullPool)
+            self.snapshot_interval = app.config.get('READ_REPLICA_SNAPSHOT_INTERVAL', 10)
+            with app.app_context():
+                main_url = db.engine.url
+            if self.snapshot_interval > 0:
+                if main_url.get_backend_name() != 'sqlite' or main_url.database in (None, '', ':memory:'):
+                    raise RuntimeError('SQLite snapshots need a SQLite file as the main database')
+                self._source_path = os.path.abspath(main_url.database)
+                if not app.config.get('DEFER_BACKGROUND_TASKS', False):
+                    self.start()
+        else:
+            self.engine = create_engine(url, pool_pre_ping=True)
+            self.snapshot_interval = 0
+
+    @property
+    def enabled(self):
+        return self.engine is not None
+
+    def after_fork(self):
+        """Drop the connections of the parent process and restart the snapshot thread."""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.engine is not None:
+            self.engine.dispose(close=False)
+            if self._source_path is not None:
+                self.start()
+
+    def start(self):
+        """Start the background snapshot thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='replica-snapshot', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        wait = 0
+        while not self._stop.wait(wait):
+            try:
+                # Workers share the snapshot, so only the first to find it due refreshes it
+                if self._snapshot_age() >= self.snapshot_interval:
+                    self.refresh()
+            except Exception as e:
+                logger.error(f"Read replica snapshot failed: {str(e)}")
+            wait = max(1.0, self.snapshot_interval - self._snapshot_age())
+
+    def refresh(self):
+        """Copy the main database into the snapshot file."""
+        started = time.time()
+        temporary = f'{self._snapshot_path}.{os.getpid()}.tmp'
+        source = sqlite3.connect(self._source_path, timeout=30)
+        try:
+            # In WAL mode a reader sees a fixed state without locking out writers (the mode persists in the file)
+            source.execute('PRAGMA journal_mode=WAL')
+            target = sqlite3.connect(temporary)
+            try:
+                # One step reads one consistent state; stepping would restart on every write made meanwhile
+                source.backup(target)
+                # A copy of a WAL database would need its -shm file to be opened read-only
+                target.execute('PRAGMA journal_mode=DELETE')
+            finally:
+                target.close()
+        finally:
+            source.close()
+        # The snapshot is as old as the state it copied
+        os.utime(temporary, (started, started))
+        os.replace(temporary, self._snapshot_path)
+        logger.debug(f"Refreshed the read replica snapshot in {time.time() - started:.3f}s")
+
+    def _snapshot_age(self):
+        try:
+            return time.time() - os.path.getmtime(self._snapshot_path)
+        except OSError:
+            return float('inf')
+
+    def lag(self):
+        """Return how many seconds the replica is behind the main database (inf if unreachable)."""
+        if self._snapshot_path is not None:
+            return self._snapshot_age()
+
+        measured_at, lag = self._lag
+        now = time.monotonic()
+        if now - measured_at < LAG_CHECK_INTERVAL:
+            return lag
+        with self._lock:
+            measured_at, lag = self._lag
+            if now - measured_at < LAG_CHECK_INTERVAL:
+                return lag
+            try:
+                with self.engine.connect() as conn:
+                    lag = float(conn.execute(_POSTGRES_LAG).scalar() or 0)
+            except Exception as e:
+                logger.warning(f"Could not measure the read replica lag: {str(e)}")
+                lag = float('inf')
+            self._lag = (now, lag)
+        return lag
+
+    def is_fresh(self):
+        """Check if the replica lags by at most READ_REPLICA_MAX_LAG seconds."""
+        stale = self.lag() > self.max_lag
+        if stale != self._stale:
+            self._stale = stale
+            if stale:
+                logger.warning(f"Read replica lags more than {self.max_lag}s, reading from the main database")
+            else:
+                logger.info("Read replica caught up, reading from it again")
+        return not stale
+
+    def session(self):
+        """Return the session for read-only queries of the current request."""
+        if self.engine is None:
+            return db.session
+        if has_request_context() and request.headers.get(READ_YOUR_WRITES_HEADER, '').lower() in ('1', 'true'):
+            return db.session
+        if 'read_replica_session' in g:
+            return g.read_replica_session
+        session = Session(bind=self.engine) if self.is_fresh() else db.session
+        # The choice holds for the whole request so its reads are consistent
+        g.read_replica_session = session
+        return session
+
+    def _close_session(self, exc=None):
+        session = g.pop('read_replica_session', None)
+        if session is not None and session is not db.session:
+            session.close()
+
+
+# Shared read replica router, bound to the app in create_app
+read_replica = ReadReplica()
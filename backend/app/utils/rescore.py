@@ -0,0 +1,271 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, bindparam, func, insert, or_, select, update
+from sqlalchemy.orm import selectinload
+from .. import db
+from ..models.exam import Exam
+from ..models.question import Question
+from ..models.rescore import RescoreJob, ScoreAudit
+from ..models.result import Result, Answer
+from .cache import KeyQuestion
+from .grading import CHOICE_TYPES, is_correct_choice
+from .shards import exam_shards
+
+logger = logging.getLogger(__name__)
+
+answers = Answer.__table__
+results = Result.__table__
+
+# Changed grades of answers, written by primary key
+_update_answers = answers.update().where(answers.c.id == bindparam('answer')).values(
+    is_correct=bindparam('is_correct'), earned_points=bindparam('earned_points'))
+
+
+def _grade_chunk(rows, key):
+    """
+    Re-grade the answers of a chunk of results in one pass.
+
+    rows are (id, result_id, question_id, selected_mask, is_correct,
+    earned_points) and key maps the exam's question ids to KeyQuestion
+    tuples; answers to other questions are left out. Returns the changed
+    answers as parameters of _update_answers, and the earned points by
+    result id.
+    """
+    changed, earned = [], {}
+    for answer_id, result_id, question_id, mask, is_correct, earned_points in rows:
+        question = key.get(question_id)
+        if question is None:
+            continue
+        if question.question_type in CHOICE_TYPES:
+            new_correct = is_correct_choice(question, mask)
+            new_points = question.points if new_correct else 0
+        else:
+            # Manually awarded points stay, up to the question's points
+            new_correct = is_correct
+            new_points = min(earned_points, question.points) if earned_points is not None else None
+        if new_correct != is_correct or new_points != earned_points:
+            changed.append({'answer': answer_id, 'is_correct': new_correct, 'earned_points': new_points})
+        if new_points:
+            earned[result_id] = earned.get(result_id, 0) + new_points
+    return changed, earned
+
+
+def _write_scores(session, rows, earned, total_points, passing_score, version, job_id):
+    # Store the new scores of a chunk of results; returns the audit rows of those that changed
+    updates, audits = [], []
+    for result_id, old_score, old_passed, old_version in rows:
+        score = (earned.get(result_id) or 0) / total_points * 100 if total_points > 0 else 0
+        passed = score >= passing_score
+        updates.append({'result': result_id, 'score': score, 'passed': passed, 'version': version})
+        if old_score is None or abs(score - old_score) > 1e-9 or passed != old_passed:
+            audits.append({'result_id': result_id, 'job_id': job_id, 'old_score': old_score, 'new_score': score,
+                           'old_passed': old_passed, 'new_passed': passed, 'old_version': old_version,
+                           'new_version': version})
+    session.execute(results.update().where(results.c.id == bindparam('result')).values(
+        score=bindparam('score'), passed=bindparam('passed'), exam_version=bindparam('version')
+    ), updates)
+    return audits
+
+
+class ExamRescorer:
+    """
+    Background re-scoring of results after an exam's grading changed.
+
+    Changing a question's points, type or options, adding or removing a
+    question, or changing the passing score leaves the scores of results
+    already graded stale. Those changes queue a RescoreJob; every
+    RESCORE_INTERVAL seconds, and right after a change, this thread
+    re-scores the exam's results RESCORE_CHUNK_SIZE at a time: one query by
+    the chunk's result ids reads their answers, which are re-graded and
+    summed per result in one pass, and the changed answers and the new
+    scores are written with one executemany each, in one transaction per
+    chunk. The job row reports progress, and a ScoreAudit row keeps the old
+    and new score of every result whose score or pass changed; it is written
+    in the chunk's transaction, or committed before it when the results live
+    in an exam shard, so no change goes unaudited.
+
+    Re-scored results take the exam's current version, so a job stopped
+    midway resumes with the results it had not reached; jobs whose worker
+    stopped updating them for RESCORE_STALE_AFTER seconds are taken over.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 60
+        self.chunk_size = 1000
+        self.stale_after = 600
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the rescore command and start the rescore thread if enabled."""
+        self.app = app
+        self.interval = app.config.get('RESCORE_INTERVAL', 60)
+        self.chunk_size = app.config.get('RESCORE_CHUNK_SIZE', 1000)
+        self.stale_after = app.config.get('RESCORE_STALE_AFTER', 600)
+        app.extensions['exam_rescorer'] = self
+        app.cli.add_command(rescore_command)
+        if self.interval > 0 and not app.config.get('DEFER_BACKGROUND_TASKS', False):
+            self.start()
+
+    def after_fork(self):
+        """Start the rescore thread in a forked worker."""
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+        if self.interval > 0:
+            self.start()
+
+    def start(self):
+        """Start the background rescore thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='exam-rescorer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def wake(self):
+        """Re-score without waiting for the next interval, e.g. after a change was committed."""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                with self.app.app_context():
+                    self.rescore_pending()
+            except Exception as e:
+                logger.error(f"Exam re-score failed: {str(e)}")
+
+    def request(self, exam_id):
+        """
+        Queue a re-score of an exam's results in the caller's transaction.
+
+        Returns the pending job, or None if the exam has no results. Call
+        wake() after the commit to start it right away.
+        """
+        job = RescoreJob.query.filter_by(exam_id=exam_id, status='pending').first()
+        if job is not None:
+            return job
+        if exam_shards.session(exam_id).query(Result.id).filter(Result.exam_id == exam_id).first() is None:
+            return None
+        job = RescoreJob(exam_id=exam_id)
+        db.session.add(job)
+        return job
+
+    def rescore_pending(self):
+        """Run queued (and abandoned) jobs until none is left; returns the number of jobs run."""
+        count = 0
+        while True:
+            job = self._claim()
+            if job is None:
+                return count
+            self.rescore_job(job)
+            count += 1
+
+    def _claim(self):
+        claimable = or_(
+            RescoreJob.status == 'pending',
+            and_(RescoreJob.status == 'running',
+                 RescoreJob.updated_at < datetime.utcnow() - timedelta(seconds=self.stale_after)),
+        )
+        for job_id in db.session.execute(select(RescoreJob.id).where(claimable).order_by(RescoreJob.id)).scalars():
+            now = datetime.utcnow()
+            claimed = db.session.execute(
+                update(RescoreJob).where(RescoreJob.id == job_id, claimable)
+                .values(status='running', started_at=func.coalesce(RescoreJob.started_at, now), updated_at=now)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(RescoreJob, job_id)
+        return None
+
+    def rescore_job(self, job):
+        """Re-score the results of a claimed job's exam in chunked transactions."""
+        exam = db.session.get(Exam, job.exam_id)
+        if exam is None or exam.deleted_at is not None:
+            self._finish(job)
+            return
+
+        # Plain values, as the commits after every chunk expire the loaded questions
+        questions = Question.query.filter_by(exam_id=exam.id).options(selectinload(Question.options)).all()
+        key = {question.id: KeyQuestion(question.id, question.question_type, question.points, question.option_ids,
+                                        question.correct_mask) for question in questions}
+        total_points = sum(question.points for question in questions)
+        passing_score = exam.passing_score
+        version = job.exam_version = exam.version
+        session = exam_shards.session(exam.id)
+        stale = and_(Result.exam_id == exam.id,
+                     or_(Result.exam_version.is_(None), Result.exam_version != version))
+        job.total = job.done + session.query(func.count(Result.id)).filter(stale).scalar()
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"Re-scoring {job.total - job.done} results of exam {exam.id} against version {version}")
+
+        exam_id = exam.id
+        last_id = None
+        while True:
+            stmt = select(Result.id, Result.score, Result.passed, Result.exam_version).where(stale)
+            if last_id is not None:
+                stmt = stmt.where(Result.id > last_id)
+            rows = session.execute(stmt.order_by(Result.id).limit(self.chunk_size)).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            # By id, as other exams' results (or results already re-scored) can share the id range
+            changed, earned = _grade_chunk(session.execute(
+                select(Answer.id, Answer.result_id, Answer.question_id, Answer.selected_mask, Answer.is_correct,
+                       Answer.earned_points).where(Answer.result_id.in_([row.id for row in rows]))
+            ).all(), key)
+            if changed:
+                session.execute(_update_answers, changed)
+            audits = _write_scores(session, rows, earned, total_points, passing_score, version, job.id)
+            if audits:
+                db.session.execute(insert(ScoreAudit), audits)
+            job.done += len(rows)
+            job.changed += len(audits)
+            job.updated_at = datetime.utcnow()
+            db.session.commit()
+            if session is not db.session:
+                session.commit()
+            logger.info(f"Re-scored {job.done}/{job.total} results of exam {exam_id}")
+
+        self._finish(job)
+        logger.info(f"Re-scored exam {exam_id}: {job.changed} of {job.done} results changed")
+
+    def _finish(self, job):
+        job.status = 'done'
+        job.finished_at = job.updated_at = datetime.utcnow()
+        db.session.commit()
+
+
+# Shared exam rescorer, bound to the app in create_app
+exam_rescorer = ExamRescorer()
+
+
+@click.command('rescore')
+@click.option('--exam', 'exam_id', type=int, help='Queue a re-score of this exam first.')
+@with_appcontext
+def rescore_command(exam_id):
+    """Run queued re-scores now instead of waiting for the rescore thread."""
+    if exam_id is not None:
+        if exam_rescorer.request(exam_id) is None:
+            click.echo(f'Exam {exam_id} has no results')
+        db.session.commit()
+    click.echo(f'Ran {exam_rescorer.rescore_pending()} re-score jobs')
@@ -0,0 +1,254 @@
+import atexit
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from .. import db
+from ..models.candidate import Candidate
+from ..models.exam import Exam
+from .autosave import load_drafts_bulk
+from .cache import answer_key_cache
+from .grading import record_submission
+from .shards import exam_shards, shard_of
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how long the scheduler sleeps when nothing is due
+MAX_IDLE_SECONDS = 60
+
+# Delay before retrying a batch that failed to finalize
+RETRY_SECONDS = 30
+
+
+def attempt_deadline(test_start_time, duration_minutes):
+    """Return the time at which an attempt started at test_start_time runs out."""
+    return test_start_time + timedelta(minutes=duration_minutes)
+
+
+class AttemptScheduler:
+    """
+    Auto-submits exam attempts whose time limit has run out.
+
+    Deadlines are kept in a min-heap that is loaded once at startup from the
+    in-progress candidates and then kept up to date as attempts start, so each
+    tick only looks at the top of the heap instead of scanning the candidates
+    table. Expired attempts are finalized in batches from their saved drafts.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.grace = timedelta(0)
+        self.batch_size = 100
+        self.enabled = False
+        self._heap = []  # (due, candidate_id), due is the deadline or a retry's equivalent
+        self._deadlines = {}  # candidate_id -> (deadline, due) of the current entry, stale heap entries are skipped
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the scheduler to an app and start it if enabled."""
+        self.app = app
+        self.grace = timedelta(seconds=app.config.get('EXAM_GRACE_SECONDS', 60))
+        self.batch_size = app.config.get('EXAM_FINALIZE_BATCH_SIZE', 100)
+        app.extensions['attempt_scheduler'] = self
+        self.enabled = app.config.get('EXAM_SCHEDULER_ENABLED', False)
+        if self.enabled and not app.config.get('DEFER_BACKGROUND_TASKS', False):
+            self.start()
+
+    def after_fork(self):
+        """Reset the state and start the scheduler thread in a forked worker."""
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._heap = []
+        self._deadlines = {}
+        self._thread = None
+        if self.enabled:
+            self.start()
+
+    def start(self):
+        """Start the background scheduler thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='attempt-scheduler', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the background scheduler thread."""
+        self._stop.set()
+        self._wakeup.set()
+
+    def is_expired(self, test_start_time, duration_minutes, now=None):
+        """Check if an attempt is past its deadline plus the grace period."""
+        if test_start_time is None:
+            return False
+        now = now or datetime.utcnow()
+        return now > attempt_deadline(test_start_time, duration_minutes) + self.grace
+
+    def load(self):
+        """Load the deadlines of all in-progress attempts into the heap."""
+        durations = dict(db.session.query(Exam.id, Exam.duration_minutes).filter(Exam.deleted_at.is_(None)).all())
+        rows = exam_shards.fan_out(durations, lambda session: session.query(
+            Candidate.id, Candidate.test_start_time, Candidate.exam_id
+        ).filter(
+            Candidate.test_start_time.isnot(None),
+            Candidate.is_test_completed == False  # noqa: E712
+        ).all())
+
+        with self._lock:
+            for candidate_id, test_start_time, exam_id in rows:
+                if exam_id not in durations:
+                    continue
+                deadline = attempt_deadline(test_start_time, durations[exam_id])
+                self._deadlines[candidate_id] = (deadline, deadline)
+                self._heap.append((deadline, candidate_id))
+            heapq.heapify(self._heap)
+
+        logger.info(f"Attempt scheduler loaded {len(rows)} in-progress attempts")
+        self._wakeup.set()
+
+    def schedule(self, candidate_id, deadline):
+        """Add or move the deadline of an attempt."""
+        with self._lock:
+            self._deadlines[candidate_id] = (deadline, deadline)
+            heapq.heappush(self._heap, (deadline, candidate_id))
+            is_next = self._heap[0] == (deadline, candidate_id)
+        if is_next:
+            self._wakeup.set()
+
+    def retry(self, entries, delay):
+        """
+        Run popped (candidate_id, deadline) entries again in delay seconds.
+
+        Only the time they run at moves, the deadline they are finalized with
+        stays; attempts scheduled anew since they were popped keep that schedule.
+        """
+        # Due times are compared with the grace period subtracted
+        due = datetime.utcnow() - self.grace + timedelta(seconds=delay)
+        with self._lock:
+            for candidate_id, deadline in entries:
+                if candidate_id in self._deadlines:
+                    continue
+                self._deadlines[candidate_id] = (deadline, due)
+                heapq.heappush(self._heap, (due, candidate_id))
+
+    def discard(self, candidate_id):
+        """Forget an attempt, e.g. after it has been submitted."""
+        with self._lock:
+            self._deadlines.pop(candidate_id, None)
+
+    def reschedule_exam(self, exam_id, duration_minutes):
+        """Recompute the deadlines of in-progress attempts after an exam's duration changed."""
+        rows = exam_shards.fan_out([exam_id], lambda session: session.query(
+            Candidate.id, Candidate.test_start_time
+        ).filter(
+            Candidate.exam_id == exam_id,
+            Candidate.test_start_time.isnot(None),
+            Candidate.is_test_completed == False  # noqa: E712
+        ).all())
+        for candidate_id, test_start_time in rows:
+            self.schedule(candidate_id, attempt_deadline(test_start_time, duration_minutes))
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def pop_due(self, now=None):
+        """Remove and return (candidate_id, deadline) for every attempt past deadline plus grace."""
+        cutoff = (now or datetime.utcnow()) - self.grace
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= cutoff:
+                at, candidate_id = heapq.heappop(self._heap)
+                # Skip entries superseded by a later schedule(), retry() or discard()
+                entry = self._deadlines.get(candidate_id)
+                if entry is None or entry[1] != at:
+                    continue
+                del self._deadlines[candidate_id]
+                due.append((candidate_id, entry[0]))
+        return due
+
+    def finalize(self, entries, session=None):
+        """
+        Submit expired attempts using their saved drafts.
+
+        Args:
+            entries (list): (candidate_id, deadline) pairs
+            session (Session, optional): Session holding the candidates, by
+                default the session of each candidate's exam shard
+
+        Returns:
+            int: Number of attempts that were finalized
+        """
+        if session is None:
+            shards = {}
+            for candidate_id, deadline in entries:
+                shards.setdefault(shard_of(candidate_id), []).append((candidate_id, deadline))
+            return sum(self.finalize(shard_entries, exam_shards.session(exam_id))
+                       for exam_id, shard_entries in shards.items())
+
+        deadlines = dict(entries)
+        candidates = session.query(Candidate).filter(
+            Candidate.id.in_(list(deadlines)),
+            Candidate.is_test_completed == False  # noqa: E712
+        ).all()
+        if not candidates:
+            return 0
+
+        exams = {exam_id: answer_key_cache.get_key(exam_id, session)
+                 for exam_id in {candidate.exam_id for candidate in candidates}}
+        drafts = load_drafts_bulk([candidate.id for candidate in candidates], session)
+
+        finalized = 0
+        for candidate in candidates:
+            exam = exams.get(candidate.exam_id)
+            if not exam:
+                continue
+            result = record_submission(candidate, exam, drafts[candidate.id], end_time=deadlines[candidate.id],
+                                       session=session)
+            if result is not None:
+                finalized += 1
+
+        session.commit()
+        return finalized
+
+    def _seconds_until_next(self):
+        with self._lock:
+            if not self._heap:
+                return MAX_IDLE_SECONDS
+            next_due = self._heap[0][0] + self.grace
+        delay = (next_due - datetime.utcnow()).total_seconds()
+        return min(max(delay, 0), MAX_IDLE_SECONDS)
+
+    def _run(self):
+        try:
+            with self.app.app_context():
+                self.load()
+        except Exception as e:
+            logger.error(f"Attempt scheduler failed to load deadlines: {str(e)}")
+
+        while not self._stop.is_set():
+            self._wakeup.wait(self._seconds_until_next())
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+
+            due = self.pop_due()
+            for start in range(0, len(due), self.batch_size):
+                batch = due[start:start + self.batch_size]
+                try:
+                    with self.app.app_context():
+                        finalized = self.finalize(batch)
+                    logger.info(f"Auto-submitted {finalized} expired attempts")
+                except Exception as e:
+                    logger.error(f"Failed to auto-submit attempts: {str(e)}")
+                    self.retry(batch, RETRY_SECONDS)
+
+
+# Shared scheduler, bound to the app in create_app
+attempt_scheduler = AttemptScheduler()
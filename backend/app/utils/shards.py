@@ -0,0 +1,231 @@
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from flask import g
+from sqlalchemy import MetaData, create_engine, event, inspect
+from sqlalchemy.orm import Session
+from .. import db
+from ..models.candidate import Candidate
+from ..models.draft import DraftAnswer
+from ..models.result import Result, Answer
+from .links import is_signed_link, verify_link
+
+logger = logging.getLogger(__name__)
+
+# Row ids in the shard of an exam start at exam_id << SHARD_ID_BITS, so the
+# shard of a candidate, result or answer can be told from its id. Smaller ids
+# are rows of the main database.
+SHARD_ID_BITS = 32
+
+# Models whose rows live in the shard of their exam
+SHARDED_MODELS = (Candidate, Result, Answer, DraftAnswer)
+
+# Plain links of sharded candidates are '<exam id>.<uuid>'
+_SHARD_LINK = re.compile(r'^(\d+)\.')
+
+
+def shard_of(row_id):
+    """Return the exam whose shard holds a row, by its id, or None for rows of the main database."""
+    return int(row_id) >> SHARD_ID_BITS or None
+
+
+def _shard_metadata():
+    # Copies of the sharded tables that assign ids from a per-shard sequence;
+    # the other tables are only copied so foreign keys resolve
+    metadata = MetaData()
+    for table in db.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    tables = [metadata.tables[model.__tablename__] for model in SHARDED_MODELS]
+    for table in tables:
+        table.dialect_kwargs['sqlite_autoincrement'] = True
+    return metadata, tables
+
+
+class ExamShards:
+    """
+    Optional per-exam SQLite storage of candidates, results, answers and drafts.
+
+    With EXAM_SHARDING on, each exam gets its own database file in
+    EXAM_SHARD_DIR for the rows of those tables, so submissions to one exam
+    do not wait for the write lock held by another. Users, exams, questions
+    and options stay in the main database.
+
+    session(exam_id) returns a session that reads and writes the sharded
+    models in the exam's shard and everything else in the main database.
+    Rows created before sharding was turned on stay in the main database and
+    are still found, since row ids and candidate links tell which database
+    a row is in. Listings across exams query the main database and each
+    shard and concatenate the rows (see fan_out).
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.directory = None
+        self.max_open = 64
+        self._engines = OrderedDict()  # exam id -> engine, least recently used first
+        self._lock = threading.Lock()
+        self._metadata = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the shard directory and close the sessions with the app context."""
+        self.dispose()
+        self.enabled = app.config.get('EXAM_SHARDING', False)
+        self.directory = app.config.get('EXAM_SHARD_DIR') or os.path.join(app.instance_path, 'shards')
+        self.max_open = app.config.get('EXAM_SHARD_MAX_OPEN', 64)
+        app.extensions['exam_shards'] = self
+        if not self.enabled:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        app.teardown_appcontext(self._close_sessions)
+
+    def after_fork(self):
+        """Drop the engines inherited from the parent process."""
+        self._lock = threading.Lock()
+        for engine in self._engines.values():
+            engine.dispose(close=False)
+        self._engines = OrderedDict()
+
+    def dispose(self):
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines = OrderedDict()
+
+    def path(self, exam_id):
+        return os.path.join(self.directory, f'exam-{int(exam_id)}.db')
+
+    def exists(self, exam_id):
+        return self.enabled and os.path.exists(self.path(exam_id))
+
+    def engine(self, exam_id, create=False):
+        """Return the engine of an exam's shard, creating the shard if asked, or None if it does not exist."""
+        with self._lock:
+            engine = self._engines.get(exam_id)
+            if engine is not None:
+                self._engines.move_to_end(exam_id)
+                return engine
+
+            path = self.path(exam_id)
+            if not create and not os.path.exists(path):
+                return None
+            engine = create_engine(f'sqlite:///{path}')
+            event.listen(engine, 'connect', _set_wal)
+            self._prepare(engine, exam_id)
+            self._engines[exam_id] = engine
+            while len(self._engines) > self.max_open:
+                # Connections in use stay open until they are returned
+                self._engines.popitem(last=False)[1].dispose()
+            return engine
+
+    def _prepare(self, engine, exam_id):
+        """Create the shard tables that do not exist yet."""
+        if self._metadata is None:
+            self._metadata = _shard_metadata()
+        metadata, tables = self._metadata
+        with engine.begin() as conn:
+            existing = set(inspect(conn).get_table_names())
+            missing = [table for table in tables if table.name not in existing]
+            metadata.create_all(conn, tables=missing)
+            if missing:
+                logger.info(f"Created the shard tables of exam {exam_id}")
+            for table in missing:
+                conn.exec_driver_sql('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)',
+                                     (table.name, int(exam_id) << SHARD_ID_BITS))
+
+    def session(self, exam_id, create=False):
+        """
+        Return the session for the rows of an exam.
+
+        Without sharding, for rows of the main database (exam_id None) and for
+        exams without a shard unless create is set, this is db.session.
+        """
+        if not self.enabled or exam_id is None:
+            return db.session
+        sessions = g.setdefault('exam_shard_sessions', {})
+        session = sessions.get(exam_id)
+        if session is None:
+            engine = self.engine(exam_id, create=create)
+            if engine is None:
+                return db.session
+            session = sessions[exam_id] = Session(bind=db.engine, binds={model: engine for model in SHARDED_MODELS})
+        return session
+
+    def session_for_id(self, row_id):
+        """Return the session holding a candidate, result or answer by its id."""
+        return self.session(shard_of(row_id))
+
+    def session_for_link(self, unique_link):
+        """Return the session holding the candidate of a link."""
+        return self.session(self.link_exam(unique_link))
+
+    def link_exam(self, unique_link):
+        """Return the exam whose shard holds the candidate of a link, or None for the main database."""
+        if not self.enabled:
+            return None
+        if is_signed_link(unique_link):
+            ids = verify_link(unique_link)
+            return shard_of(ids[0]) if ids else None
+        match = _SHARD_LINK.match(unique_link)
+        return int(match.group(1)) if match else None
+
+    def new_link(self, exam_id):
+        """Return a new plain candidate link, prefixed with the exam when sharding."""
+        return f'{int(exam_id)}.{uuid.uuid4()}' if self.enabled else str(uuid.uuid4())
+
+    def sessions(self, exam_ids, main=None):
+        """
+        Return the sessions that can hold rows of the given exams: the main
+        database's (db.session unless main is given) and each existing shard's.
+        """
+        sessions = [main if main is not None else db.session]
+        if self.enabled:
+            for exam_id in sorted(set(exam_ids)):
+                session = self.session(exam_id)
+                if session is not db.session:
+                    sessions.append(session)
+        return sessions
+
+    def fan_out(self, exam_ids, query, main=None):
+        """Run query(session) against every database holding rows of the exams and concatenate the results."""
+        rows = []
+        for session in self.sessions(exam_ids, main):
+            rows.extend(query(session))
+        return rows
+
+    def drop(self, exam_id):
+        """Delete the shard of an exam."""
+        if not self.enabled:
+            return
+        session = g.get('exam_shard_sessions', {}).pop(exam_id, None)
+        if session is not None:
+            session.close()
+        with self._lock:
+            engine = self._engines.pop(exam_id, None)
+            if engine is not None:
+                engine.dispose()
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(self.path(exam_id) + suffix)
+            except FileNotFoundError:
+                pass
+
+    def _close_sessions(self, exc=None):
+        for session in g.pop('exam_shard_sessions', {}).values():
+            session.close()
+
+
+def _set_wal(dbapi_connection, connection_record):
+    # Readers of a shard do not block its writer
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+# Shared shard router, bound to the app in create_app
+exam_shards = ExamShards()
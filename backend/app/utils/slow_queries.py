@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import queue
+import re
+import threading
+import time
+from collections import Counter
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_NAMED_PARAM = re.compile(r'%\(\w+\)s|(?<![:\w]):\w+|\$\d+|%s')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+# Statements EXPLAIN can describe without side effects
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+
+def normalize_sql(statement):
+    """Replace literals and bind parameters with '?' and collapse IN lists and whitespace."""
+    sql = _STRING.sub('?', statement)
+    sql = _NAMED_PARAM.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(?+)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def parameter_shape(parameters, executemany=False):
+    """Describe bound parameters by type, e.g. '(int, str)' or '100 x (int, str)'."""
+    if executemany:
+        rows = list(parameters or ())
+        return f'{len(rows)} x {parameter_shape(rows[0])}' if rows else '0 x ()'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in parameters.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in parameters or ()) + ')'
+
+
+class SlowQueryLog:
+    """
+    Records SQL statements slower than SLOW_QUERY_MS.
+
+    The engine hooks only time statements. Slow ones are handed to a worker
+    thread that logs them, aggregates them by fingerprint (the SQL with its
+    literals and parameters normalized) and, once per fingerprint, captures
+    the plan with EXPLAIN QUERY PLAN on SQLite or EXPLAIN on PostgreSQL over
+    a separate connection.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.threshold = 0.2
+        self.explain = True
+        self.max_fingerprints = 500
+        self._entries = {}  # fingerprint -> aggregate dict
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the log and register the engine hooks."""
+        self.enabled = app.config.get('SLOW_QUERY_ENABLED', True)
+        self.threshold = app.config.get('SLOW_QUERY_MS', 200) / 1000
+        self.explain = app.config.get('SLOW_QUERY_EXPLAIN', True)
+        self.max_fingerprints = app.config.get('SLOW_QUERY_MAX_FINGERPRINTS', 500)
+        app.extensions['slow_query_log'] = self
+        self.reset()
+        if not self.enabled:
+            return
+
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        if self._thread is None and not app.config.get('DEFER_BACKGROUND_TASKS', False):
+            self.start()
+
+    def start(self):
+        """Start the worker thread that records slow statements."""
+        self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+        self._thread.start()
+
+    def after_fork(self):
+        """Reset the state and start the worker thread in a forked worker."""
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        if self.enabled:
+            self.start()
+
+    def reset(self):
+        """Forget all recorded statements."""
+        with self._lock:
+            self._entries = {}
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            conn.info.setdefault('slow_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('slow_query_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if elapsed < self.threshold or threading.current_thread() is self._thread:
+            return
+
+        if has_request_context():
+            source = f'{request.method} {request.endpoint or request.path}'
+        else:
+            source = threading.current_thread().name
+        self._queue.put((conn.engine, statement, parameters, executemany, elapsed, source, time.time()))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._record(*item)
+            except Exception:
+                logger.exception('Failed to record a slow query')
+
+    def _record(self, engine, statement, parameters, executemany, elapsed, source, seen_at):
+        normalized = normalize_sql(statement)
+        key = fingerprint(normalized)
+        shape = parameter_shape(parameters, executemany)
+        logger.warning('Slow query %s (%.1f ms) from %s: %s params=%s', key, elapsed * 1000, source, normalized, shape)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_fingerprints:
+                    return
+                entry = self._entries[key] = {
+                    'fingerprint': key,
+                    'sql': normalized,
+                    'parameter_shapes': Counter(),
+                    'sources': Counter(),
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'last_seen': None,
+                    'plan': None
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed * 1000
+            entry['max_ms'] = max(entry['max_ms'], elapsed * 1000)
+            entry['last_seen'] = seen_at
+            entry['parameter_shapes'][shape] += 1
+            entry['sources'][source] += 1
+            needs_plan = entry['plan'] is None and self.explain and not executemany
+
+        if needs_plan:
+            plan = self._explain(engine, statement, parameters)
+            with self._lock:
+                entry['plan'] = plan
+
+    def _explain(self, engine, statement, parameters):
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return []
+        prefix = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN '}.get(engine.dialect.name)
+        # Async engines (app.asgi) cannot be used from this thread
+        if prefix is None or engine.dialect.is_async:
+            return []
+        try:
+            with engine.connect() as conn:
+                rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+                conn.rollback()
+        except Exception as e:
+            return [f'EXPLAIN failed: {e.__class__.__name__}: {e}']
+        if engine.dialect.name == 'sqlite':
+            # (id, parent, notused, detail)
+            return [row[-1] for row in rows]
+        return [row[0] for row in rows]
+
+    def summary(self):
+        """Return the recorded statements aggregated by fingerprint, costliest first."""
+        with self._lock:
+            entries = [dict(entry,
+                            parameter_shapes=dict(entry['parameter_shapes']),
+                            sources=dict(entry['sources']),
+                            total_ms=round(entry['total_ms'], 3),
+                            max_ms=round(entry['max_ms'], 3),
+                            mean_ms=round(entry['total_ms'] / entry['count'], 3))
+                       for entry in self._entries.values()]
+        return sorted(entries, key=lambda entry: entry['total_ms'], reverse=True)
+
+
+# Shared slow query log, bound to the app in create_app
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,96 @@
+"""Admin endpoint latency with and without the identity/ownership cache.
+
+Usage::
+
+    python -m benchmarks.bench_admin_endpoints [--iterations 200]
+"""
+import argparse
+from app import db
+from app.models import User, Exam, Question, Option, Candidate, Result
+from benchmarks.common import make_app, auth_headers, insert_rows, time_requests, summarize, print_report, now
+
+EXAMS = 20
+QUESTIONS_PER_EXAM = 20
+CANDIDATES_PER_EXAM = 50
+
+
+def seed(app):
+    """Seed one admin with a handful of exams, questions, candidates and results."""
+    with app.app_context():
+        user = User(email='bench@example.com', username='bench', password='benchpassword', is_admin=True)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        created = now()
+
+        insert_rows(Exam.__table__, [
+            {'id': e, 'title': f'Exam {e}', 'description': '', 'duration_minutes': 60, 'passing_score': 60.0,
+             'is_randomized': False, 'is_active': True, 'creator_id': user_id, 'created_at': created, 'updated_at': created}
+            for e in range(1, EXAMS + 1)
+        ])
+        questions, options, candidates, results = [], [], [], []
+        for e in range(1, EXAMS + 1):
+            for q in range(QUESTIONS_PER_EXAM):
+                question_id = (e - 1) * QUESTIONS_PER_EXAM + q + 1
+                questions.append({'id': question_id, 'text': f'Question {question_id}', 'question_type': 'single_choice',
+                                  'points': 1.0, 'order': q, 'explanation': '', 'exam_id': e,
+                                  'created_at': created, 'updated_at': created})
+                for o in range(4):
+                    options.append({'text': f'Option {o}', 'is_correct': o == 0, 'order': o, 'question_id': question_id,
+                                    'created_at': created, 'updated_at': created})
+            for c in range(CANDIDATES_PER_EXAM):
+                candidate_id = (e - 1) * CANDIDATES_PER_EXAM + c + 1
+                candidates.append({'id': candidate_id, 'name': f'Candidate {candidate_id}', 'email': f'c{candidate_id}@example.com',
+                                   'unique_link': f'bench-{candidate_id}', 'is_test_completed': True, 'exam_id': e,
+                                   'created_at': created, 'updated_at': created})
+                results.append({'score': 75.0, 'passed': True, 'candidate_id': candidate_id, 'exam_id': e,
+                                'created_at': created, 'updated_at': created})
+        insert_rows(Question.__table__, questions)
+        insert_rows(Option.__table__, options)
+        insert_rows(Candidate.__table__, candidates)
+        insert_rows(Result.__table__, results)
+        db.session.commit()
+        return user_id
+
+
+def run(identity_cache_ttl, iterations):
+    app = make_app(IDENTITY_CACHE_TTL=identity_cache_ttl)
+    user_id = seed(app)
+    headers = auth_headers(app, user_id)
+    client = app.test_client()
+
+    endpoints = {
+        'auth_me': '/api/auth/me',
+        'validate_token': '/api/auth/validate-token',
+        'get_candidate': '/api/candidates/7',
+        'exam_candidates': '/api/candidates/exams/3/candidates',
+        'exam_questions': '/api/exams/3/questions',
+        'get_question': '/api/questions/42',
+        'get_result': '/api/results/11',
+        'exam_results': '/api/results/exams/3',
+        'candidate_results': '/api/results/candidates/7',
+    }
+    report = {}
+    for name, url in endpoints.items():
+        # Warm up once so both runs measure steady state
+        time_requests(client, 'GET', url, 1, headers=headers)
+        report[name] = summarize(time_requests(client, 'GET', url, iterations, headers=headers))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    before = run(0, args.iterations)
+    after = run(30, args.iterations)
+    print_report({
+        'without_identity_cache': before,
+        'with_identity_cache': after,
+        'p50_speedup': {name: round(before[name]['p50_ms'] / after[name]['p50_ms'], 2) for name in before},
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""How many concurrent candidates one server process sustains, async (ASGI) versus WSGI.
+
+A database is seeded with candidates who have not opened their exam yet. A
+single uvicorn process serving asgi:app, and for comparison a single gunicorn
+worker with a thread pool serving wsgi:app, are then loaded with a growing
+number of simulated candidates. Each candidate keeps one keep-alive
+connection, opens the exam and then autosaves an answer every --think
+seconds, fetching its drafts every tenth time.
+
+Every level reports p50/p95/p99 latency, throughput and errors. The capacity
+of a server is the largest level whose p99 stays under --p99-ms (which must
+be below --think, so candidates keep their pace) with no errors.
+
+Usage::
+
+    python -m benchmarks.bench_async_candidates [--levels 50,100,200,400,800]
+        [--duration 10] [--think 1.0] [--p99-ms 250] [--threads 8] [--output report.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from benchmarks.common import make_app, summarize, print_report
+from benchmarks.dataset import seed_dataset
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client for JSON requests."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode() if body is not None else b''
+        head = f'{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(payload)}\r\n'
+        if payload:
+            head += 'Content-Type: application/json\r\n'
+        self.writer.write(head.encode() + b'\r\n' + payload)
+        try:
+            status, headers = await self._read_head()
+            if headers.get('transfer-encoding') == 'chunked':
+                await self._read_chunked()
+            else:
+                await self.reader.readexactly(int(headers.get('content-length', 0)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.close()
+            raise
+        if headers.get('connection') == 'close':
+            self.close()
+        return status
+
+    async def _read_head(self):
+        lines = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip().lower()
+        return int(lines[0].split(' ', 2)[1]), headers
+
+    async def _read_chunked(self):
+        while True:
+            size = int((await self.reader.readuntil(b'\r\n')).split(b';', 1)[0], 16)
+            await self.reader.readexactly(size + 2)
+            if size == 0:
+                return
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = self.reader = None
+
+
+async def candidate(host, port, link, question_ids, think, deadline, samples, statuses, rng):
+    """Open the exam, then autosave until the deadline."""
+    connection = Connection(host, port)
+    sent = 0
+    # Spread the first requests over one think time
+    await asyncio.sleep(rng.uniform(0, think))
+    try:
+        requests_ = [('GET', f'/api/candidates/access/{link}', None)]
+        while time.monotonic() < deadline:
+            if not requests_:
+                sent += 1
+                if sent % 10 == 0:
+                    requests_.append(('GET', f'/api/candidates/resume/{link}', None))
+                else:
+                    answer = {str(rng.choice(question_ids)): rng.randrange(4)}
+                    requests_.append(('PUT', f'/api/candidates/autosave/{link}', {'answers': answer}))
+            method, path, body = requests_.pop(0)
+            start = time.perf_counter()
+            try:
+                status = await connection.request(method, path, body)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                status = e.__class__.__name__
+            samples.append((time.perf_counter() - start) * 1000)
+            statuses[status] += 1
+            await asyncio.sleep(max(0.0, think - (time.perf_counter() - start)))
+    finally:
+        connection.close()
+
+
+async def run_level(host, port, links, question_ids, think, duration, seed):
+    samples, statuses = [], Counter()
+    rng = random.Random(seed)
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(candidate(host, port, link, question_ids, think, deadline, samples, statuses,
+                                     random.Random(rng.random())) for link in links))
+    elapsed = time.perf_counter() - started
+    report = summarize(samples, elapsed)
+    report['statuses'] = {str(status): count for status, count in sorted(statuses.items(), key=str)}
+    report['errors'] = sum(count for status, count in statuses.items() if not isinstance(status, int) or status >= 500)
+    # Requests the candidates would have sent if every response were instant
+    report['offered_rps'] = round(len(links) / think, 1)
+    return report
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('The server exited during startup')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('The server did not start')
+
+
+def benchmark_server(name, command, env, links, question_ids, args):
+    """Start a server, load it with each level of concurrent candidates and stop it."""
+    port = free_port()
+    process = subprocess.Popen([part.format(port=port) for part in command], cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    levels, capacity = {}, 0
+    offset = 0
+    try:
+        wait_for_server(port, process)
+        # Warm up the exam cache and the connection pools with the last candidate
+        asyncio.run(run_level('127.0.0.1', port, links[-1:], question_ids, 0.05, 1, args.seed))
+        for level in args.levels:
+            # Fresh candidates per level, so every level starts its attempts
+            level_links = links[offset:offset + level]
+            offset += level
+            report = asyncio.run(run_level('127.0.0.1', port, level_links, question_ids, args.think, args.duration,
+                                           args.seed + level))
+            levels[level] = report
+            print(f"{name} {level} candidates: p99 {report['p99_ms']} ms, {report['throughput_rps']} rps, "
+                  f"{report['errors']} errors", file=sys.stderr)
+            if report['p99_ms'] > args.p99_ms or report['errors']:
+                break
+            capacity = level
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {'levels': levels, 'sustained_candidates': capacity}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--levels', default='50,100,200,400,800,1600',
+                        type=lambda value: [int(level) for level in value.split(',')],
+                        help='concurrent candidates per step, comma separated')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per level')
+    parser.add_argument('--think', type=float, default=1.0, help='seconds between a candidate\'s requests')
+    parser.add_argument('--p99-ms', type=float, default=250)
+    parser.add_argument('--questions', type=int, default=50, help='questions of the exam')
+    parser.add_argument('--threads', type=int, default=8, help='threads of the gunicorn worker')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+    if args.p99_ms >= args.think * 1000:
+        parser.error('--p99-ms must be below --think')
+
+    if shutil.which('uvicorn') is None or shutil.which('gunicorn') is None:
+        parser.error('uvicorn and gunicorn must be installed')
+
+    # Both servers get their own copy of the same fresh database
+    population = sum(args.levels) + 1
+    app = make_app()
+    dataset = seed_dataset(app, exams=1, questions=args.questions, candidates=population, completed=0, seed=args.seed)
+    database = app.config['SQLALCHEMY_DATABASE_URI'].replace('sqlite:///', '', 1)
+    links = [link for link, _ in dataset['pending_links']]
+    question_ids = list(dataset['answer_keys'][1])
+
+    env = dict(os.environ, EXAM_SCHEDULER_ENABLED='True', AUTOSAVE_FLUSH_INTERVAL='2', RATE_LIMIT_ENABLED='False',
+               SLOW_QUERY_ENABLED='False', FAST_STARTUP='False', GUNICORN_PRELOAD='False')
+    servers = {
+        'asgi_uvicorn': ['uvicorn', 'asgi:app', '--port', '{port}', '--workers', '1', '--no-access-log',
+                         '--log-level', 'warning'],
+        'wsgi_gunicorn': ['gunicorn', '-c', 'gunicorn.conf.py', '--workers', '1', '--threads', str(args.threads),
+                          '--bind', '127.0.0.1:{port}', 'wsgi:app'],
+    }
+    report = {'levels': args.levels, 'duration_s': args.duration, 'think_s': args.think, 'p99_ms': args.p99_ms,
+              'questions': args.questions, 'threads': args.threads}
+    for name, command in servers.items():
+        copy = os.path.join(tempfile.mkdtemp(prefix='exam-bench-'), 'async.db')
+        shutil.copy(database, copy)
+        report[name] = benchmark_server(name, command, dict(env, DATABASE_URL=f'sqlite:///{copy}'), links,
+                                        question_ids, args)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Cloning a 1,000-question exam: server-side copy versus re-posting every question.
+
+The previous way to reuse an exam was to create a new one and post each of
+its questions (with options) through the questions API. The clone endpoint
+copies the questions and options with two INSERT ... SELECT statements in
+one transaction. Both are timed end to end, along with taking a version
+snapshot.
+
+Usage::
+
+    python -m benchmarks.bench_clone [--questions 1000] [--iterations 10]
+"""
+import argparse
+import time
+from app import db
+from app.models import Question
+from benchmarks.common import make_app, auth_headers, time_requests, summarize, print_report
+from benchmarks.dataset import seed_dataset
+
+
+def repost_exam(client, headers, exam_id, questions):
+    """Copy an exam the old way, one create_question request per question."""
+    start = time.perf_counter()
+    response = client.post('/api/exams', json={'title': 'Reposted copy', 'duration_minutes': 90, 'passing_score': 60},
+                           headers=headers)
+    copy_id = response.get_json()['exam']['id']
+    for question in questions:
+        client.post('/api/questions', json=dict(question, exam_id=copy_id), headers=headers)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    app = make_app()
+    dataset = seed_dataset(app, exams=1, questions=args.questions, candidates=0)
+    headers = auth_headers(app, dataset['user_id'])
+    client = app.test_client()
+
+    with app.app_context():
+        questions = [{
+            'question_text': question.text, 'question_type': question.question_type, 'points': question.points,
+            'options': [{'option_text': option.text, 'is_correct': option.is_correct} for option in question.options]
+        } for question in db.session.query(Question).filter_by(exam_id=1)]
+
+    report = {'questions': args.questions}
+    report['clone'] = summarize(time_requests(client, 'POST', '/api/exams/1/clone', args.iterations,
+                                              expected_status=201, headers=headers))
+    report['repost'] = summarize([repost_exam(client, headers, 1, questions) for _ in range(min(args.iterations, 3))])
+
+    samples = []
+    for _ in range(args.iterations):
+        # Each snapshot needs a new version of the exam
+        client.put('/api/exams/1', json={'description': f'Edited {len(samples)}'}, headers=headers)
+        samples += time_requests(client, 'POST', '/api/exams/1/versions', 1, expected_status=201, headers=headers)
+    report['snapshot'] = summarize(samples)
+
+    print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""Load test of the candidate and admin hot paths on a realistic dataset.
+
+Simulated candidates open their exam, autosave and submit concurrently, then
+the admin listings, question search and result export are driven with the
+same concurrency. Every endpoint is reported with p50/p95/p99 latency,
+throughput, status codes and the mean number of SQL statements per request
+(taken from /api/metrics), as JSON that can be diffed between commits.
+
+By default requests go through the WSGI test client. To load a real server,
+seed a fresh database and point the benchmark at the server using it::
+
+    python -m benchmarks.bench_hot_paths --database-uri sqlite:////tmp/bench.db --seed-only
+    DATABASE_URL=sqlite:////tmp/bench.db gunicorn -w 4 'app:create_app()'
+    python -m benchmarks.bench_hot_paths --url http://127.0.0.1:8000
+
+Usage::
+
+    python -m benchmarks.bench_hot_paths [--exams 5] [--questions 300] [--population 20000]
+        [--candidates 200] [--concurrency 16] [--iterations 20] [--output report.json]
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import make_app, auth_headers, summarize, print_report
+from benchmarks.dataset import seed_dataset
+
+METRIC_LINE = re.compile(r'^exam_sql_queries_per_request_(sum|count)\{endpoint="([^"]+)",method="([^"]+)"\} (\S+)$')
+
+
+class TestClientDriver:
+    """Sends requests through the WSGI test client, one client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, json_body=None, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=json_body, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class HttpDriver:
+    """Sends requests to a running server."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, json_body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if json_body is not None:
+            data = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class Recorder:
+    """Collects latencies and status codes per step."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def timed(self, driver, name, method, path, **kwargs):
+        start = time.perf_counter()
+        status, body = driver.request(method, path, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.samples[name].append(elapsed)
+            self.statuses[name][status] += 1
+        return status, body
+
+
+def query_counts(driver, headers):
+    """Return {endpoint: (sql statements, requests)} from /api/metrics, read as the admin."""
+    status, body = driver.request('GET', '/api/metrics', headers=headers)
+    counts = defaultdict(lambda: [0.0, 0])
+    if status != 200:
+        return counts
+    for line in body.decode('utf-8').splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            kind, endpoint, method, value = match.groups()
+            counts[f'{method} {endpoint}'][0 if kind == 'sum' else 1] = float(value)
+    return counts
+
+
+def queries_per_request(before, after):
+    report = {}
+    for key, (statements, requests) in after.items():
+        old_statements, old_requests = before.get(key, (0.0, 0))
+        if requests > old_requests:
+            report[key] = round((statements - old_statements) / (requests - old_requests), 2)
+    return report
+
+
+def run_phase(driver, recorder, jobs, concurrency):
+    """Run callables on a thread pool and return the wall time in seconds."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(job) for job in jobs]:
+            future.result()
+    return time.perf_counter() - start
+
+
+def candidate_jobs(driver, recorder, dataset, count):
+    """One job per simulated candidate: open the exam, autosave half the answers, submit."""
+    def attempt(link, exam_id):
+        status, _ = recorder.timed(driver, 'access_exam', 'GET', f'/api/candidates/access/{link}')
+        if status != 200:
+            return
+        answers = dataset['answer_keys'][exam_id]
+        half = dict(list(answers.items())[:len(answers) // 2])
+        recorder.timed(driver, 'autosave', 'PUT', f'/api/candidates/autosave/{link}', json_body={'answers': half})
+        recorder.timed(driver, 'submit_exam', 'POST', f'/api/candidates/submit/{link}', json_body={'answers': answers})
+
+    return [lambda link=link, exam_id=exam_id: attempt(link, exam_id)
+            for link, exam_id in dataset['pending_links'][:count]]
+
+
+def admin_jobs(driver, recorder, dataset, headers, iterations):
+    """Listing, search and export requests, `iterations` of each."""
+    exam_ids = dataset['exam_ids']
+    result_ids = dataset['result_ids'] or [1]
+    words = dataset['search_words']
+    requests = {
+        'list_exams': lambda i: '/api/exams',
+        'exam_candidates': lambda i: f'/api/candidates/exams/{exam_ids[i % len(exam_ids)]}/candidates',
+        'exam_results': lambda i: f'/api/results/exams/{exam_ids[i % len(exam_ids)]}',
+        'exam_questions': lambda i: f'/api/exams/{exam_ids[i % len(exam_ids)]}/questions',
+        'question_search': lambda i: f'/api/questions?search={words[i % len(words)]}',
+        'export_result': lambda i: f'/api/results/results/{result_ids[i % len(result_ids)]}/export',
+    }
+    return [lambda name=name, path=path(i): recorder.timed(driver, name, 'GET', path, headers=headers)
+            for i in range(iterations) for name, path in requests.items()]
+
+
+def login_headers(driver):
+    status, body = driver.request('POST', '/api/auth/login', json_body={'email': 'bench@example.com', 'password': 'benchpassword'})
+    if status != 200:
+        raise RuntimeError(f'Login failed with {status}: {body[:200]!r}')
+    return {'Authorization': f"Bearer {json.loads(body)['access_token']}"}
+
+
+def report_phase(recorder, wall_seconds, before, after):
+    return {
+        'wall_seconds': round(wall_seconds, 3),
+        'endpoints': {name: {**summarize(samples, wall_seconds), 'statuses': dict(recorder.statuses[name])}
+                      for name, samples in sorted(recorder.samples.items())},
+        'queries_per_request': queries_per_request(before, after),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exams', type=int, default=5)
+    parser.add_argument('--questions', type=int, default=300, help='questions per exam')
+    parser.add_argument('--population', type=int, default=20000, help='seeded candidates')
+    parser.add_argument('--candidates', type=int, default=200, help='simulated candidates taking the exam')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--iterations', type=int, default=20, help='requests per admin endpoint')
+    parser.add_argument('--url', help='benchmark a running server instead of the test client')
+    parser.add_argument('--database-uri', help='database to seed (defaults to a temporary SQLite file)')
+    parser.add_argument('--seed-only', action='store_true', help='seed the database and exit')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    overrides = {'SQLALCHEMY_DATABASE_URI': args.database_uri} if args.database_uri else {}
+    app = make_app(**overrides)
+    dataset = seed_dataset(app, args.exams, args.questions, args.population)
+    if args.seed_only:
+        return
+
+    if args.url:
+        driver = HttpDriver(args.url)
+        headers = login_headers(driver)
+    else:
+        driver = TestClientDriver(app)
+        headers = auth_headers(app, dataset['user_id'])
+
+    report = {
+        'dataset': {'exams': args.exams, 'questions_per_exam': args.questions, 'population': args.population},
+        'concurrency': args.concurrency,
+        'target': args.url or 'test-client',
+    }
+
+    recorder = Recorder()
+    before = query_counts(driver, headers)
+    wall = run_phase(driver, recorder, candidate_jobs(driver, recorder, dataset, args.candidates), args.concurrency)
+    report['candidates'] = report_phase(recorder, wall, before, query_counts(driver, headers))
+
+    recorder = Recorder()
+    before = query_counts(driver, headers)
+    wall = run_phase(driver, recorder, admin_jobs(driver, recorder, dataset, headers, args.iterations), args.concurrency)
+    report['admin'] = report_phase(recorder, wall, before, query_counts(driver, headers))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
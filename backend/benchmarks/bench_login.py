@@ -0,0 +1,87 @@
+"""Login latency under concurrency, inline hashing versus the bounded hashing pool.
+
+Each simulated client logs in repeatedly while a probe thread measures a cheap
+unauthenticated endpoint to show how much logins slow down other traffic.
+
+Usage::
+
+    python -m benchmarks.bench_login [--clients 32] [--logins 8] [--method pbkdf2:sha256:600000]
+"""
+import argparse
+import threading
+import time
+from app import db
+from app.models import User
+from benchmarks.common import make_app, percentile, summarize, print_report
+
+
+def run(method, workers, queue, clients, logins):
+    app = make_app(PASSWORD_HASH_METHOD=method, PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_QUEUE=queue)
+    with app.app_context():
+        db.session.add(User(email='bench@example.com', username='bench', password='benchpassword'))
+        db.session.commit()
+
+    login_samples, probe_samples, statuses = [], [], {}
+    lock = threading.Lock()
+    done = threading.Event()
+    barrier = threading.Barrier(clients + 1)
+
+    def client_loop():
+        client = app.test_client()
+        barrier.wait()
+        for _ in range(logins):
+            start = time.perf_counter()
+            response = client.post('/api/auth/login', json={'email': 'bench@example.com', 'password': 'benchpassword'})
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    login_samples.append(elapsed)
+
+    def probe_loop():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/api/auth/test')
+            probe_samples.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+    probe = threading.Thread(target=probe_loop)
+    for thread in threads:
+        thread.start()
+    probe.start()
+    started = time.perf_counter()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe.join()
+
+    return {
+        'login': summarize(login_samples, elapsed),
+        'status_counts': {str(code): count for code, count in sorted(statuses.items())},
+        'probe_p99_ms': round(percentile(probe_samples, 99), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--logins', type=int, default=8)
+    parser.add_argument('--method', default='pbkdf2:sha256:600000')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--queue', type=int, default=16)
+    args = parser.parse_args()
+
+    print_report({
+        'method': args.method,
+        'clients': args.clients,
+        'inline': run(args.method, 0, 0, args.clients, args.logins),
+        'bounded_pool': run(args.method, args.workers, args.queue, args.clients, args.logins),
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Latency and memory of 10k-row listings, ORM entities versus the DTO read path.
+
+The candidate and result listings are loaded and serialized two ways: as ORM
+entities converted with to_dict() (the previous read path) and as the
+slotted dataclasses of app.utils.dto. Each way reports the latency and the
+peak memory traced by tracemalloc while loading and serializing, and the
+listing endpoints are timed end to end.
+
+Usage::
+
+    python -m benchmarks.bench_read_path [--rows 10000] [--iterations 10]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from app import db
+from app.models import Candidate, Exam, Result
+from app.utils.dto import CandidateRow, ResultRow, exam_titles
+from benchmarks.common import make_app, auth_headers, time_requests, summarize, print_report
+from benchmarks.dataset import seed_dataset
+
+
+def orm_candidates(session):
+    title = session.get(Exam, 1).title
+    return [candidate.to_dict(exam_title=title) for candidate in session.query(Candidate).all()]
+
+
+def dto_candidates(session):
+    return CandidateRow.load(session, titles=exam_titles(session, [1]))
+
+
+def orm_results(session):
+    return [result.to_dict() for result in session.query(Result).all()]
+
+
+def dto_results(session):
+    return ResultRow.load(session)
+
+
+def measure(app, load, iterations):
+    """Time load-and-serialize in fresh sessions, then trace the peak memory of one more run."""
+    samples = []
+    for _ in range(iterations):
+        with app.app_context():
+            start = time.perf_counter()
+            app.json.dumps(load(db.session))
+            samples.append((time.perf_counter() - start) * 1000)
+
+    with app.app_context():
+        gc.collect()
+        tracemalloc.start()
+        rows = load(db.session)
+        app.json.dumps(rows)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    report = summarize(samples)
+    report['peak_mib'] = round(peak / 2 ** 20, 2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    app = make_app()
+    dataset = seed_dataset(app, exams=1, questions=20, candidates=args.rows, completed=1.0)
+    headers = auth_headers(app, dataset['user_id'])
+
+    report = {'rows': args.rows}
+    for name, (orm, dto) in {'candidates': (orm_candidates, dto_candidates),
+                             'results': (orm_results, dto_results)}.items():
+        report[name] = {'orm': measure(app, orm, args.iterations), 'dto': measure(app, dto, args.iterations)}
+
+    client = app.test_client()
+    for name, url in {'candidates': '/api/candidates', 'results': '/api/results'}.items():
+        time_requests(client, 'GET', url, 1, headers=headers)
+        report[name]['endpoint'] = summarize(time_requests(client, 'GET', url, args.iterations, headers=headers))
+
+    print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Re-scoring an exam's results after its answer key changed: per-result ORM versus the rescore job.
+
+The per-result way loads every result with its answers, re-evaluates each
+choice answer and calls Result.calculate_score, one result at a time. The
+rescore job reads the answers of a chunk of results with one query,
+re-grades them and sums the earned points in one pass in Python, and writes
+the changed answers and the new scores with one executemany each. The
+per-result pass is timed on a sample and extrapolated.
+
+Usage::
+
+    python -m benchmarks.bench_rescore [--results 5000] [--questions 100] [--sample 200]
+"""
+import argparse
+import random
+import time
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models import Question, Result, Answer
+from app.utils.rescore import exam_rescorer
+from benchmarks.common import make_app, auth_headers, insert_rows, now, print_report
+from benchmarks.dataset import seed_dataset
+
+
+def seed_answers(app, questions, correct_rate=0.7, seed=1):
+    """Give every seeded result one answer per question, in the mask format of the grading."""
+    rng = random.Random(seed)
+    created = now()
+    with app.app_context():
+        rows = []
+        for result_id, in db.session.query(Result.id):
+            for question_id, question_type, points, count, correct in questions:
+                if question_type == 'text':
+                    rows.append({'result_id': result_id, 'question_id': question_id, 'selected_mask': None,
+                                 'text_response': 'Answer', 'is_correct': None, 'earned_points': None,
+                                 'created_at': created, 'updated_at': created})
+                    continue
+                is_correct = rng.random() < correct_rate
+                mask = correct if is_correct else 1 << rng.randrange(1, count)
+                rows.append({'result_id': result_id, 'question_id': question_id, 'selected_mask': mask,
+                             'text_response': None, 'is_correct': is_correct, 'earned_points': points if is_correct else 0.0,
+                             'created_at': created, 'updated_at': created})
+        insert_rows(Answer.__table__, rows)
+        db.session.commit()
+        return len(rows)
+
+
+def rescore_per_result(app, sample):
+    """Re-score `sample` results the ORM way; returns milliseconds per result."""
+    with app.app_context():
+        result_ids = [result_id for result_id, in db.session.query(Result.id).order_by(Result.id).limit(sample)]
+        start = time.perf_counter()
+        for result_id in result_ids:
+            result = db.session.query(Result).options(
+                selectinload(Result.answers).selectinload(Answer.question).selectinload(Question.options)
+            ).get(result_id)
+            for answer in result.answers:
+                if answer.selected_mask is not None:
+                    answer.evaluate_choice()
+            result.calculate_score()
+            db.session.commit()
+        return (time.perf_counter() - start) * 1000 / len(result_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--results', type=int, default=5000)
+    parser.add_argument('--questions', type=int, default=100)
+    parser.add_argument('--sample', type=int, default=200)
+    args = parser.parse_args()
+
+    app = make_app(RESCORE_INTERVAL=0)
+    dataset = seed_dataset(app, exams=1, questions=args.questions, candidates=args.results, completed=1.0)
+    headers = auth_headers(app, dataset['user_id'])
+    client = app.test_client()
+
+    with app.app_context():
+        questions = [(question.id, question.question_type, question.points, len(question.options),
+                      question.correct_mask)
+                     for question in Question.query.filter_by(exam_id=1).options(selectinload(Question.options))]
+    answers = seed_answers(app, questions)
+    results = len(dataset['result_ids'])
+
+    # Change the answer key of the first choice question, which queues a re-score
+    first = next(question for question in questions if question[1] == 'single_choice')
+    client.put(f'/api/questions/{first[0]}', json={'points': first[2] + 1}, headers=headers)
+
+    report = {'results': results, 'answers': answers}
+    per_result_ms = rescore_per_result(app, min(args.sample, results))
+    report['per_result'] = {'ms_per_result': round(per_result_ms, 3),
+                            'estimated_total_s': round(per_result_ms * results / 1000, 2)}
+
+    with app.app_context():
+        start = time.perf_counter()
+        exam_rescorer.rescore_pending()
+        elapsed = time.perf_counter() - start
+    report['rescore_job'] = {'total_s': round(elapsed, 3), 'ms_per_result': round(elapsed * 1000 / results, 4)}
+
+    print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Listing endpoint latency with 10k rows across JSON providers.
+
+For each provider this times whole listing requests and, separately, just the
+serialization of the same rows, so the share spent in JSON encoding is visible.
+
+Usage::
+
+    python -m benchmarks.bench_serialization [--rows 10000] [--iterations 10]
+"""
+import argparse
+import time
+from app import db
+from app.models import User, Exam, Question, Option, Candidate, Result
+from app.utils.json_provider import JSON_PROVIDERS, orjson
+from benchmarks.common import make_app, auth_headers, insert_rows, time_requests, summarize, print_report, now
+
+
+def seed(app, rows):
+    """Seed one exam with `rows` candidates/results and rows // 5 questions."""
+    with app.app_context():
+        user = User(email='bench@example.com', username='bench', password='benchpassword')
+        db.session.add(user)
+        db.session.commit()
+        created = now()
+
+        insert_rows(Exam.__table__, [{
+            'id': 1, 'title': 'Exam', 'description': '', 'duration_minutes': 60, 'passing_score': 60.0,
+            'is_randomized': False, 'is_active': True, 'creator_id': user.id, 'created_at': created, 'updated_at': created
+        }])
+        question_count = max(1, rows // 5)
+        insert_rows(Question.__table__, [
+            {'id': q, 'text': f'Question {q} ' * 4, 'question_type': 'single_choice', 'points': 1.0, 'order': q,
+             'explanation': '', 'exam_id': 1, 'created_at': created, 'updated_at': created}
+            for q in range(1, question_count + 1)
+        ])
+        insert_rows(Option.__table__, [
+            {'text': f'Option {o}', 'is_correct': o == 0, 'order': o, 'question_id': q, 'created_at': created, 'updated_at': created}
+            for q in range(1, question_count + 1) for o in range(4)
+        ])
+        insert_rows(Candidate.__table__, [
+            {'id': c, 'name': f'Candidate {c}', 'email': f'c{c}@example.com', 'unique_link': f'bench-{c}',
+             'is_test_completed': True, 'test_start_time': created, 'test_end_time': created, 'exam_id': 1,
+             'created_at': created, 'updated_at': created}
+            for c in range(1, rows + 1)
+        ])
+        insert_rows(Result.__table__, [
+            {'score': 42.5, 'passed': False, 'candidate_id': c, 'exam_id': 1, 'created_at': created, 'updated_at': created}
+            for c in range(1, rows + 1)
+        ])
+        db.session.commit()
+        return user.id
+
+
+def run(provider, rows, iterations):
+    app = make_app(JSON_PROVIDER=provider)
+    user_id = seed(app, rows)
+    headers = auth_headers(app, user_id)
+    client = app.test_client()
+
+    report = {}
+    for name, url in {'results': '/api/results', 'exam_results': '/api/results/exams/1', 'exam_questions': '/api/exams/1/questions'}.items():
+        time_requests(client, 'GET', url, 1, headers=headers)
+        report[name] = summarize(time_requests(client, 'GET', url, iterations, headers=headers))
+
+    # Serialization alone, on rows that are already converted to dictionaries
+    with app.app_context():
+        result_rows = [result.to_dict() for result in Result.query.all()]
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            app.json.dumps(result_rows)
+            samples.append((time.perf_counter() - start) * 1000)
+    report['dumps_only_results'] = summarize(samples)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    providers = [name for name in JSON_PROVIDERS if name != 'orjson' or orjson is not None]
+    print_report({'rows': args.rows, **{provider: run(provider, args.rows, args.iterations) for provider in providers}})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Application startup time with and without FAST_STARTUP, and worker start after a preload fork.
+
+Each run starts a fresh interpreter, so module imports are included. The
+database is created and stamped once with init_db.py beforehand.
+
+Usage::
+
+    python -m benchmarks.bench_startup [--runs 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from benchmarks.common import summarize, print_report
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prints {"import_ms": ..., "create_ms": ..., "after_fork_ms": ...}
+PROBE = """
+import json, os, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+report = {'import_ms': (imported - start) * 1000, 'create_ms': (created - imported) * 1000}
+if os.environ.get('DEFER_BACKGROUND_TASKS') == 'True':
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        forked = time.perf_counter()
+        app.after_fork(application)
+        os.write(write_end, str((time.perf_counter() - forked) * 1000).encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    report['after_fork_ms'] = float(os.read(read_end, 64))
+print(json.dumps(report))
+"""
+
+
+def run_probe(env, runs):
+    samples = {}
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', PROBE], cwd=BACKEND_DIR, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        for key, value in json.loads(output.strip().splitlines()[-1]).items():
+            samples.setdefault(key, []).append(value)
+    samples['total_ms'] = [imported + created for imported, created in zip(samples['import_ms'], samples['create_ms'])]
+    return {key: summarize(values) for key, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    database = os.path.join(tempfile.mkdtemp(prefix='exam-bench-'), 'startup.db')
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database}', EXAM_SCHEDULER_ENABLED='True',
+               AUTOSAVE_FLUSH_INTERVAL='3', FAST_STARTUP='False', DEFER_BACKGROUND_TASKS='False')
+    subprocess.run([sys.executable, 'init_db.py'], cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+
+    print_report({
+        'runs': args.runs,
+        'create_all': run_probe(env, args.runs),
+        'fast_startup': run_probe(dict(env, FAST_STARTUP='True'), args.runs),
+        'fast_startup_preload': run_probe(dict(env, FAST_STARTUP='True', DEFER_BACKGROUND_TASKS='True'), args.runs),
+    })
+
+
+if __name__ == '__main__':
+    main()
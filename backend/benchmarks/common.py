@@ -0,0 +1,89 @@
+"""Shared helpers for the benchmark scripts.
+
+Run the scripts from the backend directory, e.g.::
+
+    python -m benchmarks.bench_admin_endpoints
+"""
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.config import Config
+
+
+def make_config(**overrides):
+    """Build a config class backed by a throwaway SQLite file with background threads off."""
+    workdir = tempfile.mkdtemp(prefix='exam-bench-')
+    attrs = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'AUTOSAVE_FLUSH_INTERVAL': 0,
+        'EXAM_SCHEDULER_ENABLED': False,
+        'RATE_LIMIT_ENABLED': False,
+        'JWT_SECRET_KEY': 'benchmark-jwt-secret-key-with-enough-bytes',
+    }
+    attrs.update(overrides)
+    return type('BenchmarkConfig', (Config,), attrs)
+
+
+def make_app(**overrides):
+    """Create an app for benchmarking."""
+    return create_app(make_config(**overrides))
+
+
+def auth_headers(app, user_id):
+    """Return Authorization headers for a user."""
+    with app.app_context():
+        token = create_access_token(identity=str(user_id))
+    return {'Authorization': f'Bearer {token}'}
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of a list of numbers (nearest rank)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples_ms, elapsed_seconds=None):
+    """Summarize latency samples in milliseconds."""
+    elapsed_seconds = elapsed_seconds or sum(samples_ms) / 1000
+    return {
+        'count': len(samples_ms),
+        'mean_ms': round(sum(samples_ms) / len(samples_ms), 3) if samples_ms else 0.0,
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'throughput_rps': round(len(samples_ms) / elapsed_seconds, 1) if elapsed_seconds else 0.0,
+    }
+
+
+def time_requests(client, method, url, iterations, expected_status=200, **kwargs):
+    """Issue the same request repeatedly and return per-request latencies in milliseconds."""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        samples.append((time.perf_counter() - start) * 1000)
+        if response.status_code != expected_status:
+            raise RuntimeError(f'{method} {url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return samples
+
+
+def insert_rows(table, rows, chunk_size=5000):
+    """Insert dictionaries into a table with Core executemany in chunks."""
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(table.insert(), rows[start:start + chunk_size])
+
+
+def now():
+    return datetime.utcnow()
+
+
+def print_report(report):
+    """Print a benchmark report as JSON."""
+    print(json.dumps(report, indent=2, sort_keys=True))
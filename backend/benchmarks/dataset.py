@@ -0,0 +1,97 @@
+"""Realistic benchmark dataset: a few large exams with many candidates and results."""
+import random
+from app import db
+from app.models import User, Exam, Question, Option, Candidate, Result
+from benchmarks.common import insert_rows, now
+
+QUESTION_TYPES = ('single_choice', 'single_choice', 'multiple_choice', 'true_false', 'text')
+SEARCH_WORDS = ('photosynthesis', 'integral', 'renaissance', 'polymorphism', 'tectonic', 'sonnet')
+
+
+def seed_dataset(app, exams=5, questions=300, candidates=20000, completed=0.5, seed=1):
+    """
+    Seed one admin owning `exams` exams of `questions` questions each, with
+    `candidates` candidates spread over the exams.
+
+    A `completed` fraction of the candidates has finished the exam and has a
+    result; the others have not opened their link yet. Returns the ids and
+    links the benchmarks need.
+    """
+    rng = random.Random(seed)
+    with app.app_context():
+        user = User(email='bench@example.com', username='bench', password='benchpassword', is_admin=True)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        created = now()
+
+        insert_rows(Exam.__table__, [
+            {'id': e, 'title': f'Benchmark exam {e}', 'description': 'Seeded for benchmarks', 'duration_minutes': 90,
+             'passing_score': 60.0, 'is_randomized': False, 'is_active': True, 'version': 1, 'creator_id': user_id,
+             'created_at': created, 'updated_at': created}
+            for e in range(1, exams + 1)
+        ])
+
+        question_rows, option_rows = [], []
+        answer_keys = {}  # exam id -> {question id (str): correct answer}
+        option_id = 0
+        for e in range(1, exams + 1):
+            answer_keys[e] = {}
+            for q in range(questions):
+                question_id = (e - 1) * questions + q + 1
+                question_type = QUESTION_TYPES[q % len(QUESTION_TYPES)]
+                word = SEARCH_WORDS[question_id % len(SEARCH_WORDS)]
+                question_rows.append({
+                    'id': question_id, 'text': f'Question {question_id} about {word}: ' + 'lorem ipsum ' * rng.randint(5, 30),
+                    'question_type': question_type, 'points': float(rng.choice((1, 1, 2, 5))), 'order': q,
+                    'explanation': 'Seeded explanation', 'exam_id': e, 'created_at': created, 'updated_at': created
+                })
+                if question_type == 'text':
+                    answer_keys[e][str(question_id)] = 'A free text answer'
+                    continue
+
+                count = 2 if question_type == 'true_false' else 4
+                correct = []
+                for o in range(count):
+                    option_id += 1
+                    is_correct = o == 0 or (question_type == 'multiple_choice' and o == 1)
+                    if is_correct:
+                        correct.append(option_id)
+                    option_rows.append({
+                        'id': option_id, 'text': f'Option {o} of question {question_id}', 'is_correct': is_correct,
+                        'order': o, 'question_id': question_id, 'created_at': created, 'updated_at': created
+                    })
+                answer_keys[e][str(question_id)] = correct if question_type == 'multiple_choice' else correct[0]
+        insert_rows(Question.__table__, question_rows)
+        insert_rows(Option.__table__, option_rows)
+
+        candidate_rows, result_rows, pending, finished = [], [], [], []
+        for c in range(1, candidates + 1):
+            exam_id = (c - 1) % exams + 1
+            done = rng.random() < completed
+            link = f'bench-{c:08d}'
+            candidate_rows.append({
+                'id': c, 'name': f'Candidate {c}', 'email': f'candidate{c}@example.com', 'unique_link': link,
+                'is_test_completed': done, 'test_start_time': created if done else None,
+                'test_end_time': created if done else None, 'invitation_sent': True, 'exam_id': exam_id,
+                'created_at': created, 'updated_at': created
+            })
+            if done:
+                score = rng.uniform(20, 100)
+                result_rows.append({'score': score, 'passed': score >= 60, 'candidate_id': c, 'exam_id': exam_id,
+                                    'created_at': created, 'updated_at': created})
+                finished.append(c)
+            else:
+                pending.append((link, exam_id))
+        insert_rows(Candidate.__table__, candidate_rows)
+        insert_rows(Result.__table__, result_rows)
+        db.session.commit()
+
+    return {
+        'user_id': user_id,
+        'exam_ids': list(range(1, exams + 1)),
+        'pending_links': pending,
+        'result_ids': list(range(1, len(result_rows) + 1)),
+        'answer_keys': answer_keys,
+        'search_words': SEARCH_WORDS,
+    }
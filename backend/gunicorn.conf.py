@@ -0,0 +1,24 @@
+"""Gunicorn settings, used with ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+The app is preloaded in the master by default, so workers fork with the code,
+models and exam timer already loaded instead of importing and building the app
+each. Background threads are started in each worker after the fork.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+if preload_app:
+    # Threads do not survive fork(), start them in the workers instead of the master
+    os.environ['DEFER_BACKGROUND_TASKS'] = 'True'
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import after_fork
+        after_fork(worker.app.wsgi())
@@ -1,12 +1,61 @@
+import argparse
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+from flask_migrate import Migrate, stamp, upgrade
+from sqlalchemy import func, inspect, select
 from app import create_app, db
-from app.models.user import User
+from app.config import Config
+from app.models import User, Exam, Question, Option, Candidate, Result, Answer
+from app.utils.hashing import password_hasher
+from app.utils.slow_queries import slow_query_log
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Revision of the schema that create_all built before the database was migrated
+BASELINE_REVISION = '706de44aab47'
+
+# Fast startup leaves creating the tables to this script, which also brings the
+# schema to the migration head before the app checks it; the background threads
+# would query the schema before that, or race the seeder
+InitConfig = type('InitConfig', (Config,), {
+    'FAST_STARTUP': True,
+    'SCHEMA_CHECK': False,
+    'DEFER_BACKGROUND_TASKS': True,
+    'EXAM_SCHEDULER_ENABLED': False,
+})
+
+# Question types cycled through by the seeder
+SEED_QUESTION_TYPES = ('single_choice', 'multiple_choice', 'single_choice', 'true_false', 'text')
 
 def init_db():
     """Initialize the database with initial data."""
-    app = create_app()
+    app = create_app(InitConfig)
     with app.app_context():
+        inspector = inspect(db.engine)
+        fresh = not inspector.get_table_names()
+        migrated = inspector.has_table('alembic_version')
+        Migrate(app, db, directory=MIGRATIONS_DIR)
+
+        # Existing databases are upgraded first, as create_all would create the
+        # tables of pending migrations without their columns or data changes;
+        # ones built by create_all before migrations were run have the baseline schema
+        if not fresh:
+            if not migrated:
+                stamp(revision=BASELINE_REVISION)
+            upgrade()
+
         # Create tables
         db.create_all()
+
+        # Only a new database has the latest schema, so only it is marked as
+        # migrated to the head revision
+        if fresh:
+            stamp()
         
         # Check if admin user exists
         admin = User.query.filter_by(email='admin@example.com').first()
@@ -26,5 +75,251 @@ def init_db():
         
         print("Database initialized successfully.")
 
+
+@contextmanager
+def relaxed_durability(conn):
+    """Trade crash safety for insert speed while seeding, restoring the settings afterwards."""
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        synchronous = conn.exec_driver_sql('PRAGMA synchronous').scalar()
+        journal_mode = conn.exec_driver_sql('PRAGMA journal_mode').scalar()
+        conn.exec_driver_sql('PRAGMA synchronous = OFF')
+        conn.exec_driver_sql('PRAGMA journal_mode = MEMORY')
+        conn.exec_driver_sql('PRAGMA temp_store = MEMORY')
+        conn.exec_driver_sql('PRAGMA cache_size = -262144')
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.rollback()
+            conn.exec_driver_sql(f'PRAGMA journal_mode = {journal_mode}')
+            conn.exec_driver_sql(f'PRAGMA synchronous = {synchronous}')
+            conn.commit()
+    elif dialect == 'postgresql':
+        conn.exec_driver_sql('SET synchronous_commit TO OFF')
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.rollback()
+            conn.exec_driver_sql('RESET synchronous_commit')
+            conn.commit()
+    else:
+        yield
+
+
+class BulkInserter:
+    """
+    Inserts tuples into a table in large executemany chunks.
+
+    The INSERT is compiled once by Core and executed through the driver, so
+    rows skip per-row parameter processing. Values must already be in the
+    form the driver expects (see `datetime_value`).
+    """
+
+    def __init__(self, conn, table, columns, chunk_size):
+        compiled = table.insert().compile(dialect=conn.dialect, column_keys=columns)
+        self.conn = conn
+        self.sql = str(compiled)
+        self.columns = columns
+        self.positional = compiled.positional
+        order = [columns.index(name) for name in compiled.positiontup] if compiled.positional else None
+        # Core orders the columns as the table does, rows are reordered to match
+        self.reorder = itemgetter(*order) if order and order != sorted(order) else None
+        self.chunk_size = chunk_size
+        self.pending = []
+        self.count = 0
+
+    def add(self, row):
+        self.pending.append(row)
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            self.pending.extend(chunk)
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.positional:
+            rows = list(map(self.reorder, self.pending)) if self.reorder else self.pending
+        else:
+            rows = [dict(zip(self.columns, row)) for row in self.pending]
+        self.conn.exec_driver_sql(self.sql, rows)
+        self.count += len(self.pending)
+        self.pending = []
+
+
+def datetime_value(dialect, value):
+    """Convert a datetime the way the DateTime column type would for this dialect."""
+    processor = db.DateTime().bind_processor(dialect)
+    return processor(value) if processor else value
+
+
+def next_id(conn, model):
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def seed_database(users=5, exams=50, questions=50, options=4, candidates=20000, completed=0.8,
+                  correct_rate=0.7, chunk_size=50000, seed=1):
+    """
+    Fill the database with synthetic data for load and performance testing.
+
+    Users own the exams round robin, candidates are spread over the exams and a
+    `completed` fraction of them has a result with an answer to every question.
+    Ids continue after the existing rows, so seeding can be repeated. Every
+    seeded user has the password 'password'.
+    """
+    rng = random.Random(seed)
+    app = create_app(InitConfig)
+    with app.app_context():
+        db.create_all()
+        password_hash = password_hasher.hash('password')
+        # Every chunk would be logged as a slow query
+        slow_query_log.enabled = False
+
+        with db.engine.connect() as conn, relaxed_durability(conn):
+            dialect = conn.dialect
+            now = datetime_value(dialect, datetime.utcnow())
+            started = time.perf_counter()
+
+            def inserter(model, columns):
+                return BulkInserter(conn, model.__table__, columns, chunk_size)
+
+            def report(name, inserter_):
+                elapsed = time.perf_counter() - started
+                print(f'{name}: {inserter_.count} rows ({elapsed:.1f}s elapsed)')
+
+            # Users, exams, questions and options in the first transaction
+            with conn.begin():
+                first_user = next_id(conn, User)
+                user_ids = list(range(first_user, first_user + users))
+                rows = inserter(User, ['id', 'email', 'username', 'password_hash', 'is_admin', 'created_at', 'updated_at'])
+                rows.extend((uid, f'seed-user-{uid}@example.com', f'seed-user-{uid}', password_hash, True, now, now)
+                            for uid in user_ids)
+                rows.flush()
+                report('users', rows)
+
+                first_exam = next_id(conn, Exam)
+                exam_ids = list(range(first_exam, first_exam + exams))
+                rows = inserter(Exam, ['id', 'title', 'description', 'duration_minutes', 'passing_score', 'is_randomized',
+                                       'is_active', 'version', 'creator_id', 'created_at', 'updated_at'])
+                rows.extend((eid, f'Seeded exam {eid}', 'Synthetic exam', 60, 60.0, False, True, 1,
+                             user_ids[i % users], now, now) for i, eid in enumerate(exam_ids))
+                rows.flush()
+                report('exams', rows)
+
+                # exam id -> [(question id, type, points, [option ids], [correct option ids])]
+                exam_questions = {}
+                question_rows = inserter(Question, ['id', 'text', 'question_type', 'points', 'order', 'explanation',
+                                                    'exam_id', 'created_at', 'updated_at'])
+                option_rows = inserter(Option, ['id', 'text', 'is_correct', 'order', 'question_id', 'created_at', 'updated_at'])
+                question_id = next_id(conn, Question) - 1
+                option_id = next_id(conn, Option) - 1
+                for eid in exam_ids:
+                    exam_questions[eid] = []
+                    for position in range(questions):
+                        question_id += 1
+                        question_type = SEED_QUESTION_TYPES[position % len(SEED_QUESTION_TYPES)]
+                        points = float(rng.choice((1, 1, 2, 5)))
+                        question_rows.add((question_id, f'Seeded question {question_id}', question_type, points, position,
+                                           '', eid, now, now))
+                        count = 0 if question_type == 'text' else 2 if question_type == 'true_false' else options
+                        option_ids, correct = [], []
+                        for o in range(count):
+                            option_id += 1
+                            is_correct = o == 0 or (question_type == 'multiple_choice' and o == 1)
+                            option_ids.append(option_id)
+                            if is_correct:
+                                correct.append(option_id)
+                            option_rows.add((option_id, f'Option {o}', is_correct, o, question_id, now, now))
+                        exam_questions[eid].append((question_id, question_type, points, option_ids, correct))
+                question_rows.flush()
+                option_rows.flush()
+                report('questions', question_rows)
+                report('options', option_rows)
+
+            # Candidates, results and answers in the second transaction
+            with conn.begin():
+                candidate_rows = inserter(Candidate, ['id', 'name', 'email', 'unique_link', 'is_test_completed',
+                                                      'test_start_time', 'test_end_time', 'invitation_sent', 'link_version',
+                                                      'exam_id', 'created_at', 'updated_at'])
+                result_rows = inserter(Result, ['id', 'score', 'passed', 'candidate_id', 'exam_id', 'created_at', 'updated_at'])
+                answer_rows = inserter(Answer, ['id', 'selected_mask', 'text_response', 'is_correct', 'earned_points',
+                                                'result_id', 'question_id', 'created_at', 'updated_at'])
+                first_candidate = next_id(conn, Candidate)
+                result_id = next_id(conn, Result) - 1
+                answer_id = next_id(conn, Answer) - 1
+                for cid in range(first_candidate, first_candidate + candidates):
+                    eid = exam_ids[cid % exams]
+                    done = rng.random() < completed
+                    candidate_rows.add((cid, f'Candidate {cid}', f'candidate-{cid}@example.com', f'seed-{cid}', done,
+                                        now if done else None, now if done else None, True, 0, eid, now, now))
+                    if not done:
+                        continue
+
+                    result_id += 1
+                    earned = total = 0.0
+                    answers = []
+                    for qid, question_type, points, option_ids, correct in exam_questions[eid]:
+                        total += points
+                        answer_id += 1
+                        if question_type == 'text':
+                            answers.append((answer_id, None, 'Seeded answer', None, None, result_id, qid, now, now))
+                            continue
+                        is_correct = rng.random() < correct_rate
+                        # Options were seeded in order, so option positions are list positions
+                        positions = [i for i, o in enumerate(option_ids) if o in correct]
+                        if question_type == 'multiple_choice':
+                            # One option is never the full answer, which has two
+                            selected = sum(1 << i for i in positions) if is_correct else 1 << rng.randrange(len(option_ids))
+                        else:
+                            selected = 1 << (positions[0] if is_correct else
+                                             rng.choice([i for i in range(len(option_ids)) if i not in positions]))
+                        earned += points if is_correct else 0
+                        answers.append((answer_id, selected, None, is_correct, points if is_correct else 0.0, result_id, qid, now, now))
+
+                    score = earned / total * 100 if total else 0.0
+                    result_rows.add((result_id, score, score >= 60.0, cid, eid, now, now))
+                    if len(answer_rows.pending) + len(answers) >= chunk_size:
+                        # Parents first, so foreign keys hold on databases that enforce them
+                        candidate_rows.flush()
+                        result_rows.flush()
+                    for answer in answers:
+                        answer_rows.add(answer)
+                candidate_rows.flush()
+                result_rows.flush()
+                answer_rows.flush()
+                report('candidates', candidate_rows)
+                report('results', result_rows)
+                report('answers', answer_rows)
+
+            if dialect.name == 'sqlite':
+                conn.exec_driver_sql('ANALYZE')
+                conn.commit()
+
+        print("Database seeded successfully.")
+
+
 if __name__ == '__main__':
-    init_db() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Initialize the database, optionally with synthetic data.')
+    parser.add_argument('--seed', action='store_true', help='add synthetic users, exams, candidates and results')
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--exams', type=int, default=50)
+    parser.add_argument('--questions', type=int, default=50, help='questions per exam')
+    parser.add_argument('--options', type=int, default=4, help='options per choice question')
+    parser.add_argument('--candidates', type=int, default=20000)
+    parser.add_argument('--completed', type=float, default=0.8, help='fraction of candidates with a result')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    init_db()
+    if args.seed:
+        seed_database(args.users, args.exams, args.questions, args.options, args.candidates, args.completed,
+                      chunk_size=args.chunk_size)
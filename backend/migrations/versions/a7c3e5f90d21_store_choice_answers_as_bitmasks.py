@@ -0,0 +1,128 @@
+"""store choice answers as option bitmasks
+
+Revision ID: a7c3e5f90d21
+Revises: f3b6a2d8e1c4
+Create Date: 2026-10-19 19:12:36.482915
+
+"""
+import json
+import zlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f90d21'
+down_revision = 'f3b6a2d8e1c4'
+branch_labels = None
+depends_on = None
+
+# Archived results converted per transaction round trip
+CHUNK_SIZE = 500
+
+answers = sa.table('answers', sa.column('id', sa.BigInteger), sa.column('question_id', sa.Integer),
+                   sa.column('selected_option_id', sa.Integer), sa.column('selected_mask', sa.BigInteger))
+options = sa.table('options', sa.column('id', sa.Integer), sa.column('question_id', sa.Integer),
+                   sa.column('order', sa.Integer))
+archived_results = sa.table('archived_results', sa.column('id', sa.BigInteger), sa.column('answers', sa.LargeBinary))
+
+
+def _ordered_options(bind, question_ids=None):
+    """Return option ids by question id, in the order of Question.ordered_options."""
+    stmt = sa.select(options.c.id, options.c.question_id, options.c.order)
+    if question_ids is not None:
+        stmt = stmt.where(options.c.question_id.in_(question_ids))
+    questions = {}
+    for option_id, question_id, order in bind.execute(stmt):
+        questions.setdefault(question_id, []).append((order is None, order, option_id))
+    return {question_id: [option[2] for option in sorted(rows)] for question_id, rows in questions.items()}
+
+
+def _convert_archived(bind, convert):
+    """Rewrite the packed answers of archived results; convert(question options, value) maps position 1."""
+    last_id = None
+    while True:
+        stmt = sa.select(archived_results.c.id, archived_results.c.answers).where(
+            archived_results.c.answers.isnot(None)).order_by(archived_results.c.id).limit(CHUNK_SIZE)
+        if last_id is not None:
+            stmt = stmt.where(archived_results.c.id > last_id)
+        chunk = bind.execute(stmt).all()
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+        rows = {result_id: json.loads(zlib.decompress(blob)) for result_id, blob in chunk}
+        question_ids = {answer[-1] for answers_ in rows.values() for answer in answers_}
+        ordered = _ordered_options(bind, question_ids)
+        updates = []
+        for result_id, answers_ in rows.items():
+            for answer in answers_:
+                if answer[1] is not None:
+                    answer[1] = convert(ordered.get(answer[-1], []), answer[1])
+            updates.append({'result_id': result_id, 'answers': zlib.compress(
+                json.dumps(answers_, separators=(',', ':')).encode('utf-8'))})
+        bind.execute(archived_results.update().where(archived_results.c.id == sa.bindparam('result_id'))
+                     .values(answers=sa.bindparam('answers')), updates)
+
+
+def _option_mask(option_ids, option_id):
+    return 1 << option_ids.index(option_id) if option_id in option_ids else None
+
+
+def _mask_option(option_ids, mask):
+    # Only a single selection had a place in selected_option_id
+    position = mask.bit_length() - 1
+    return option_ids[position] if mask == 1 << position and position < len(option_ids) else None
+
+
+def upgrade():
+    with op.batch_alter_table('answers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('selected_mask', sa.BigInteger(), nullable=True))
+
+    # The bit of the selected option is its position among the options of its question,
+    # that is the number of options ordered before it, in one statement for every answer
+    selected = options.alias('selected')
+    before = options.alias('before')
+    ordered_before = sa.or_(
+        sa.and_(before.c.order.isnot(None), selected.c.order.is_(None)),
+        sa.and_(before.c.order.is_(None), selected.c.order.is_(None), before.c.id < selected.c.id),
+        sa.and_(before.c.order.isnot(None), selected.c.order.isnot(None), sa.or_(
+            before.c.order < selected.c.order,
+            sa.and_(before.c.order == selected.c.order, before.c.id < selected.c.id))),
+    )
+    position = (sa.select(sa.func.count(before.c.id))
+                .where(selected.c.id == answers.c.selected_option_id,
+                       before.c.question_id == selected.c.question_id, ordered_before)
+                .scalar_subquery())
+    op.execute(answers.update()
+               .where(answers.c.selected_option_id.isnot(None),
+                      sa.exists().where(options.c.id == answers.c.selected_option_id))
+               .values(selected_mask=sa.cast(sa.literal(1), sa.BigInteger).op('<<')(position)))
+
+    _convert_archived(op.get_bind(), _option_mask)
+
+    with op.batch_alter_table('answers', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_answers_selected_option_id_options', type_='foreignkey')
+        batch_op.drop_column('selected_option_id')
+
+
+def downgrade():
+    with op.batch_alter_table('answers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('selected_option_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_answers_selected_option_id_options', 'options', ['selected_option_id'],
+                                    ['id'], ondelete='SET NULL')
+
+    # One statement per option, matching the answers that selected just that option
+    bind = op.get_bind()
+    updates = [{'question': question_id, 'mask': 1 << position, 'option': option_id}
+               for question_id, option_ids in _ordered_options(bind).items()
+               for position, option_id in enumerate(option_ids) if position < 63]
+    if updates:
+        bind.execute(answers.update()
+                     .where(answers.c.question_id == sa.bindparam('question'),
+                            answers.c.selected_mask == sa.bindparam('mask'))
+                     .values(selected_option_id=sa.bindparam('option')), updates)
+
+    _convert_archived(bind, _mask_option)
+
+    with op.batch_alter_table('answers', schema=None) as batch_op:
+        batch_op.drop_column('selected_mask')
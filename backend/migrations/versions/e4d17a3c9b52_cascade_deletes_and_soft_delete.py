@@ -0,0 +1,71 @@
+"""cascade deletes and soft delete of exams
+
+Revision ID: e4d17a3c9b52
+Revises: b52e9d7c4a10
+Create Date: 2026-10-19 16:02:47.120391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4d17a3c9b52'
+down_revision = 'b52e9d7c4a10'
+branch_labels = None
+depends_on = None
+
+# Foreign keys recreated with an ON DELETE action, by table: (column, referred table, action)
+FOREIGN_KEYS = {
+    'questions': [('exam_id', 'exams', 'CASCADE')],
+    'options': [('question_id', 'questions', 'CASCADE')],
+    'candidates': [('exam_id', 'exams', 'CASCADE')],
+    'results': [('candidate_id', 'candidates', 'CASCADE'), ('exam_id', 'exams', 'CASCADE')],
+    'answers': [('result_id', 'results', 'CASCADE'), ('question_id', 'questions', 'CASCADE'),
+                ('selected_option_id', 'options', 'SET NULL')],
+    'draft_answers': [('candidate_id', 'candidates', 'CASCADE'), ('question_id', 'questions', 'CASCADE')],
+    'archived_results': [('exam_id', 'exams', 'CASCADE')],
+}
+
+# Foreign key columns without an index, which cascades and the purge look rows up by
+INDEXES = [('questions', 'exam_id'), ('options', 'question_id'), ('candidates', 'exam_id'),
+           ('results', 'candidate_id'), ('results', 'exam_id'), ('answers', 'result_id'),
+           ('answers', 'question_id')]
+
+# Names the unnamed foreign keys of SQLite tables, so batch mode can drop them
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def _replace_foreign_keys(with_actions):
+    inspector = sa.inspect(op.get_bind())
+    for table, foreign_keys in FOREIGN_KEYS.items():
+        existing = {tuple(fk['constrained_columns']): fk['name'] for fk in inspector.get_foreign_keys(table)}
+        # One batch per table, so SQLite copies each table once
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            for column, referred, action in foreign_keys:
+                name = f'fk_{table}_{column}_{referred}'
+                batch_op.drop_constraint(existing.get((column,)) or name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred, [column], ['id'],
+                                            ondelete=action if with_actions else None)
+
+
+def upgrade():
+    with op.batch_alter_table('exams', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_exams_deleted_at'), ['deleted_at'], unique=False)
+
+    _replace_foreign_keys(with_actions=True)
+
+    for table, column in INDEXES:
+        op.create_index(op.f(f'ix_{table}_{column}'), table, [column], unique=False)
+
+
+def downgrade():
+    for table, column in INDEXES:
+        op.drop_index(op.f(f'ix_{table}_{column}'), table_name=table)
+
+    _replace_foreign_keys(with_actions=False)
+
+    with op.batch_alter_table('exams', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_exams_deleted_at'))
+        batch_op.drop_column('deleted_at')
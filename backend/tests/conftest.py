@@ -0,0 +1,48 @@
+import pytest
+from app import create_app
+from app.config import TestingConfig
+
+
+@pytest.fixture(params=[False, True], ids=['main', 'sharded'])
+def app(request, tmp_path):
+    """App on a throwaway SQLite file, with background threads off, with and without exam shards."""
+    config = type('Config', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'EXAM_SHARDING': request.param,
+        'EXAM_SHARD_DIR': str(tmp_path / 'shards'),
+    })
+    return create_app(config)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def headers(client):
+    """Authorization headers of a registered admin."""
+    response = client.post('/api/auth/register', json={'email': 'admin@example.com', 'username': 'admin',
+                                                       'password': 'password', 'is_admin': True})
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+@pytest.fixture
+def graded_exam(client, headers):
+    """An exam with two single choice questions and one submitted result; returns (exam id, questions, result)."""
+    exam_id = client.post('/api/exams', json={'title': 'Exam', 'duration_minutes': 30, 'passing_score': 50},
+                          headers=headers).get_json()['exam']['id']
+    client.post('/api/questions/bulk', json={'exam_id': exam_id, 'questions': [
+        {'question_text': f'Question {i}', 'question_type': 'single_choice', 'points': 1,
+         'options': [{'option_text': 'Right', 'is_correct': True}, {'option_text': 'Wrong'}]}
+        for i in range(2)
+    ]}, headers=headers)
+    questions = client.get(f'/api/exams/{exam_id}/questions', headers=headers).get_json()
+    candidate = client.post('/api/candidates', json={'exam_id': exam_id, 'name': 'Candidate',
+                                                     'email': 'candidate@example.com'},
+                            headers=headers).get_json()['candidate']
+    client.get(f"/api/candidates/access/{candidate['unique_link']}")
+    result = client.post(f"/api/candidates/submit/{candidate['unique_link']}", json={'answers': {
+        str(question['id']): question['options'][0]['id'] for question in questions
+    }}).get_json()['result']
+    return exam_id, questions, result
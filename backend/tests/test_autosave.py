@@ -0,0 +1,49 @@
+import pytest
+from app.models.draft import DraftAnswer
+from app.utils.autosave import MAX_FLUSH_ATTEMPTS, AnswerBuffer
+from app.utils.shards import exam_shards
+
+
+def test_autosave_rejects_unknown_questions(app, client, headers, graded_exam):
+    exam_id, questions, result = graded_exam
+    candidate = client.post('/api/candidates', json={'exam_id': exam_id, 'name': 'Other',
+                                                     'email': 'other@example.com'},
+                            headers=headers).get_json()['candidate']
+    link = candidate['unique_link']
+    client.get(f'/api/candidates/access/{link}')
+
+    assert client.put(f'/api/candidates/autosave/{link}', json={'answers': {'999999': 1}}).status_code == 400
+    assert client.put(f'/api/candidates/autosave/{link}', json={'answers': {
+        str(questions[0]['id']): questions[0]['options'][0]['id']}}).status_code == 202
+    assert list(client.get(f'/api/candidates/resume/{link}').get_json()['answers']) == [str(questions[0]['id'])]
+
+
+def test_failed_flushes_drop_answers(app, monkeypatch):
+    buffer = AnswerBuffer()
+    buffer.put(1, {'7': 'answer'}, {7})
+
+    def fail(session, rows):
+        raise RuntimeError('write failed')
+
+    monkeypatch.setattr(buffer, '_upsert', fail)
+    with app.app_context():
+        for _ in range(MAX_FLUSH_ATTEMPTS - 1):
+            with pytest.raises(RuntimeError):
+                buffer.flush()
+            assert buffer.pending_for(1) == {'7': 'answer'}
+        with pytest.raises(RuntimeError):
+            buffer.flush()
+    assert buffer.pending_for(1) == {}
+
+
+def test_flush_discards_drafts_of_submitted_candidates(app, graded_exam):
+    exam_id, questions, result = graded_exam
+    question = questions[0]
+    # Buffered by another worker before the submission and flushed after it
+    buffer = AnswerBuffer()
+    buffer.put(result['candidate_id'], {str(question['id']): question['options'][1]['id']}, {question['id']})
+
+    with app.app_context():
+        assert buffer.flush() == 0
+        session = exam_shards.session(exam_id)
+        assert session.query(DraftAnswer).filter_by(candidate_id=result['candidate_id']).count() == 0
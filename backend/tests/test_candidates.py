@@ -0,0 +1,55 @@
+from app import create_app
+from app.config import TestingConfig
+from app.utils.links import sign_link, verify_link
+
+
+def test_guard_stats_requires_admin(client, headers):
+    response = client.post('/api/auth/register', json={'email': 'user@example.com', 'username': 'user',
+                                                       'password': 'password'})
+    user_headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    assert client.get('/api/candidates/guard/stats', headers=user_headers).status_code == 403
+    assert client.get('/api/candidates/guard/stats', headers=headers).status_code == 200
+
+
+def test_rate_limit_per_client_behind_proxy(tmp_path):
+    config = type('Config', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'TRUSTED_PROXY_COUNT': 1,
+        'RATE_LIMIT_ENABLED': True,
+        'RATE_LIMIT_PER_IP': 2,
+    })
+    client = create_app(config).test_client()
+
+    def access(client_ip):
+        # The proxy appends the address it saw to whatever the client sent
+        return client.get('/api/candidates/access/missing', headers={'X-Forwarded-For': f'10.0.0.9, {client_ip}'},
+                          environ_base={'REMOTE_ADDR': '10.1.1.1'}).status_code
+
+    assert [access('192.0.2.1') for _ in range(3)] == [404, 404, 429]
+    assert access('192.0.2.2') == 404
+
+
+def test_reissued_link_revokes_old_one(app, client, headers, graded_exam):
+    exam_id, questions, result = graded_exam
+    app.config['SIGNED_LINKS'] = True
+    candidate = client.post('/api/candidates', json={'exam_id': exam_id, 'name': 'Other',
+                                                     'email': 'other@example.com'},
+                            headers=headers).get_json()['candidate']
+    old_link = candidate['unique_link']
+
+    response = client.post(f"/api/candidates/{candidate['id']}/reissue-link", headers=headers)
+
+    new_link = response.get_json()['candidate']['unique_link']
+    assert response.status_code == 200 and new_link != old_link
+    assert client.get(f'/api/candidates/access/{old_link}').status_code == 404
+    assert client.get(f'/api/candidates/access/{new_link}').status_code == 200
+
+
+
+def test_signed_link_round_trip(app):
+    with app.app_context():
+        link = sign_link(5 << 32 | 9, 7, 2)
+        assert verify_link(link) == (5 << 32 | 9, 7, 2)
+        version, payload, signature = link.split('.')
+        assert verify_link('.'.join([version, payload, signature[::-1]])) is None
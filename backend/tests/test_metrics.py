@@ -0,0 +1,16 @@
+def test_metrics_require_admin(client, headers):
+    response = client.post('/api/auth/register', json={'email': 'user@example.com', 'username': 'user',
+                                                       'password': 'password'})
+    user_headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    assert client.get('/api/metrics').status_code == 401
+    assert client.get('/api/metrics', headers=user_headers).status_code == 403
+    assert client.get('/api/metrics', headers=headers).status_code == 200
+
+
+def test_metrics_token(app, client, headers):
+    app.config['METRICS_TOKEN'] = 'scrape-token'
+
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer other'}).status_code == 401
+    assert client.get('/api/metrics', headers=headers).status_code == 401
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer scrape-token'}).status_code == 200
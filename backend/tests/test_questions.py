@@ -0,0 +1,49 @@
+from sqlalchemy import update
+from app import db
+from app.models import Answer, Question, Result
+from app.utils.shards import exam_shards
+
+
+def answers_of(app, exam_id, result_id):
+    with app.app_context():
+        return exam_shards.session(exam_id).query(Answer).filter_by(result_id=result_id).all()
+
+
+def test_delete_graded_question(app, client, headers, graded_exam):
+    exam_id, questions, result = graded_exam
+
+    response = client.delete(f"/api/questions/{questions[0]['id']}", headers=headers)
+
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.get(Question, questions[0]['id']) is None
+    # The result keeps both answers, the deleted question's on the snapshot of its version
+    versions = client.get(f'/api/exams/{exam_id}/versions', headers=headers).get_json()
+    assert [version['source_version'] for version in versions] == [result['exam_version']]
+    with app.app_context():
+        copy = Question.query.filter_by(exam_id=versions[0]['id'], source_question_id=questions[0]['id']).one()
+        moved = {answer.question_id for answer in answers_of(app, exam_id, result['id'])}
+        assert moved == {copy.id, questions[1]['id']}
+
+
+def test_delete_question_answered_before_versions(app, client, headers, graded_exam):
+    exam_id, questions, result = graded_exam
+    with app.app_context():
+        session = exam_shards.session(exam_id)
+        session.execute(update(Result).where(Result.id == result['id']).values(exam_version=None))
+        session.commit()
+
+    response = client.delete(f"/api/questions/{questions[0]['id']}", headers=headers)
+
+    assert response.status_code == 409
+    assert len(answers_of(app, exam_id, result['id'])) == 2
+    with app.app_context():
+        assert db.session.get(Question, questions[0]['id']) is not None
+
+
+def test_delete_question_without_answers(app, client, headers, graded_exam):
+    exam_id, questions, result = graded_exam
+    question = client.post('/api/questions', json={'exam_id': exam_id, 'question_text': 'New', 'question_type': 'text',
+                                                   'points': 1}, headers=headers).get_json()['question']
+
+    assert client.delete(f"/api/questions/{question['id']}", headers=headers).status_code == 200
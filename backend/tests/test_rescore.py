@@ -0,0 +1,18 @@
+from app.models import Result, ScoreAudit
+from app.utils.rescore import exam_rescorer
+from app.utils.shards import exam_shards
+
+
+def test_rescore_after_answer_key_change(app, client, headers, graded_exam):
+    exam_id, questions, result = graded_exam
+    response = client.put(f"/api/questions/{questions[0]['id']}", json={'options': [
+        {'option_text': 'Right'}, {'option_text': 'Wrong', 'is_correct': True}
+    ]}, headers=headers)
+    assert response.status_code == 200
+
+    with app.app_context():
+        assert exam_rescorer.rescore_pending() == 1
+        rescored = exam_shards.session(exam_id).get(Result, result['id'])
+        assert rescored.score == 50
+        audit = ScoreAudit.query.filter_by(result_id=result['id']).one()
+        assert (audit.old_score, audit.new_score) == (100, 50)
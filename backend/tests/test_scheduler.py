@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+from app.utils.scheduler import AttemptScheduler
+
+
+def test_retry_keeps_deadline():
+    scheduler = AttemptScheduler()
+    deadline = datetime.utcnow() - timedelta(minutes=5)
+    scheduler.schedule(1, deadline)
+    batch = scheduler.pop_due()
+    assert batch == [(1, deadline)]
+
+    scheduler.retry(batch, 30)
+
+    assert scheduler.pop_due() == []
+    assert scheduler.pop_due(datetime.utcnow() + timedelta(seconds=31)) == [(1, deadline)]
+
+
+def test_retry_keeps_newer_schedule():
+    scheduler = AttemptScheduler()
+    deadline = datetime.utcnow() - timedelta(minutes=5)
+    scheduler.schedule(1, deadline)
+    batch = scheduler.pop_due()
+    later = datetime.utcnow() + timedelta(minutes=5)
+    scheduler.schedule(1, later)
+
+    scheduler.retry(batch, 30)
+
+    assert scheduler.pop_due(datetime.utcnow() + timedelta(seconds=31)) == []
+    assert scheduler.pop_due(later) == [(1, later)]
@@ -18,9 +18,17 @@ const api = axios.create({
   },
 });
 
+// Reads shortly after a write ask the backend to skip its read replica, so
+// lists include what was just saved (matches READ_REPLICA_MAX_LAG)
+const READ_YOUR_WRITES_MS = 30000;
+let lastWriteAt = 0;
+
 // Add request interceptor to add auth token to requests
 api.interceptors.request.use(
   (config) => {
+    if ((config.method || 'get').toLowerCase() === 'get' && Date.now() - lastWriteAt < READ_YOUR_WRITES_MS) {
+      config.headers['X-Read-Your-Writes'] = 'true';
+    }
     const token = Cookies.get('token');
     console.log('Request interceptor - Token exists:', !!token);
     if (token) {
@@ -39,6 +47,9 @@ api.interceptors.request.use(
 // Add response interceptor to handle errors
 api.interceptors.response.use(
   (response) => {
+    if ((response.config.method || 'get').toLowerCase() !== 'get') {
+      lastWriteAt = Date.now();
+    }
     return response;
   },
   (error) => {